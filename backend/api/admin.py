@@ -0,0 +1,158 @@
+"""
+Admin (operator) API endpoints
+"""
+import io
+import marshal
+import os
+from flask import Blueprint, Response, current_app, request, jsonify, send_file
+from auth import admin_required
+from services.backup_service import start_backup_job, load_backup_job, export_tenant, import_tenant
+from services.profiler import profiler, MAX_SECONDS, MAX_REQUESTS, MIN_INTERVAL_MS
+
+admin_bp = Blueprint('admin', __name__)
+
+# Tenant export/restore hands out and overwrites whole accounts: off unless
+# TENANT_TRANSFER_ENABLED=1 (the CLI in services/backup_service.py always works)
+TENANT_TRANSFER_ENABLED = os.environ.get('TENANT_TRANSFER_ENABLED') == '1'
+
+
+@admin_bp.route('/profile', methods=['POST'])
+@admin_required
+def start_profile():
+    """
+    Start a profiling job on every worker
+    {"mode": "sample", "seconds": 10, "interval_ms": 5} samples stacks;
+    {"mode": "requests", "endpoint": "invoices.download_invoice_pdf", "count": 20}
+    profiles the next requests to that endpoint (within `seconds`, default 300).
+    """
+    data = request.get_json(silent=True) or {}
+    mode = data.get('mode', 'sample')
+    
+    try:
+        if mode == 'sample':
+            seconds = int(data.get('seconds', 10))
+            interval_ms = int(data.get('interval_ms', 5))
+            if not 1 <= seconds <= MAX_SECONDS or interval_ms < MIN_INTERVAL_MS:
+                return jsonify({'error': f'seconds must be 1-{MAX_SECONDS} and interval_ms at least {MIN_INTERVAL_MS}'}), 400
+            job = profiler.start('sample', seconds, interval_ms=interval_ms)
+        elif mode == 'requests':
+            endpoint = data.get('endpoint')
+            count = int(data.get('count', 10))
+            seconds = int(data.get('seconds', 300))
+            if endpoint not in current_app.view_functions:
+                return jsonify({'error': 'Unknown endpoint'}), 400
+            if not 1 <= count <= MAX_REQUESTS or seconds < 1:
+                return jsonify({'error': f'count must be 1-{MAX_REQUESTS}'}), 400
+            job = profiler.start('requests', seconds, endpoint=endpoint, count=count)
+        else:
+            return jsonify({'error': 'mode must be sample or requests'}), 400
+    except (TypeError, ValueError):
+        return jsonify({'error': 'seconds, count and interval_ms must be integers'}), 400
+    except PermissionError as e:
+        return jsonify({'error': str(e)}), 500
+    
+    return jsonify(profiler.status(job)), 201
+
+
+@admin_bp.route('/profile', methods=['DELETE'])
+@admin_required
+def stop_profile():
+    """Stop the running job (workers write what they have)"""
+    profiler.stop()
+    return jsonify({'message': 'Profiling stopped'}), 200
+
+
+@admin_bp.route('/profile/<job_id>', methods=['GET'])
+@admin_required
+def get_profile(job_id):
+    """
+    Job status, or its merged output with ?format=
+      collapsed - folded stacks of all workers (sample mode)
+      pstats    - merged cProfile stats file (requests mode)
+      text      - top functions by cumulative time (requests mode)
+    """
+    job = profiler.load_job(job_id)
+    if not job:
+        return jsonify({'error': 'Profile not found'}), 404
+    
+    output = request.args.get('format')
+    if not output:
+        return jsonify(profiler.status(job)), 200
+    
+    if output == 'collapsed':
+        return Response(profiler.collapsed(job), mimetype='text/plain')
+    
+    if output not in ('pstats', 'text'):
+        return jsonify({'error': 'format must be collapsed, pstats or text'}), 400
+    stats = profiler.merged_stats(job)
+    if stats is None:
+        return jsonify({'error': 'No profiled requests yet'}), 404
+    
+    if output == 'text':
+        try:
+            limit = int(request.args.get('limit', 40))
+            if limit < 1:
+                raise ValueError(limit)
+        except ValueError:
+            return jsonify({'error': 'limit must be a positive integer'}), 400
+        stats.sort_stats('cumulative').print_stats(limit)
+        return Response(stats.stream.getvalue(), mimetype='text/plain')
+    
+    # Same format as Profile.dump_stats (loads in pstats, snakeviz, ...)
+    return send_file(io.BytesIO(marshal.dumps(stats.stats)), mimetype='application/octet-stream',
+                     as_attachment=True, download_name=f"profile-{job_id}.pstats")
+
+
+@admin_bp.route('/backup', methods=['POST'])
+@admin_required
+def start_backup():
+    """Back up every shard in a background process (SQLite online backup / pg_dump)"""
+    job = start_backup_job()
+    if job is None:
+        return jsonify({'error': 'A backup is already running'}), 409
+    return jsonify(job), 202
+
+
+@admin_bp.route('/backup/<job_id>', methods=['GET'])
+@admin_required
+def get_backup(job_id):
+    """Backup job progress; when done, files with sizes and MB/s"""
+    job = load_backup_job(job_id)
+    if not job:
+        return jsonify({'error': 'Backup not found'}), 404
+    return jsonify(job), 200
+
+
+@admin_bp.route('/tenants/<int:user_id>/export', methods=['GET'])
+@admin_required
+def export_tenant_data(user_id):
+    """Stream one user's data as gzip'd JSON lines"""
+    if not TENANT_TRANSFER_ENABLED:
+        return jsonify({'error': 'Not found'}), 404
+    return Response(
+        export_tenant(user_id),
+        mimetype='application/gzip',
+        headers={'Content-Disposition': f'attachment; filename=tenant-{user_id}.jsonl.gz'}
+    )
+
+
+@admin_bp.route('/tenants/<int:user_id>/restore', methods=['POST'])
+@admin_required
+def restore_tenant_data(user_id):
+    """Replace one user's data with an export (raw body or multipart field "file")"""
+    if not TENANT_TRANSFER_ENABLED:
+        return jsonify({'error': 'Not found'}), 404
+    if request.mimetype == 'multipart/form-data':
+        upload = request.files.get('file')
+        if upload is None:
+            return jsonify({'error': 'Export file is required'}), 400
+        stream = upload.stream
+    else:
+        stream = request.stream
+    
+    try:
+        stats = import_tenant(stream, expected_user_id=user_id)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    return jsonify(dict(stats, message='Tenant restored successfully')), 200
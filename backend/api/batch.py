@@ -0,0 +1,76 @@
+"""
+Batch API endpoint
+Runs several GET requests in one round trip. Sub-requests are dispatched
+in-process through the normal routes, share one database session and reuse
+the user the batch was authenticated as.
+"""
+import json
+from flask import Blueprint, current_app, request, jsonify
+from flask_login import login_required
+from models import shared_session
+
+batch_bp = Blueprint('batch', __name__)
+
+MAX_REQUESTS = 20
+
+# Streaming / binary routes that cannot be embedded in a JSON envelope
+EXCLUDED_ENDPOINTS = {
+    'batch.run_batch', 'events.stream_events', 'invoices.download_invoice_pdf', 'customers.download_customer_statement',
+    'admin.export_tenant_data'
+}
+
+
+def _dispatch(path, cookie):
+    """Run one GET sub-request; returns (status, body)"""
+    headers = {'Cookie': cookie} if cookie else {}
+    with current_app.test_request_context(path, method='GET', headers=headers):
+        if request.url_rule is not None and request.endpoint in EXCLUDED_ENDPOINTS:
+            return 400, {'error': 'Endpoint cannot be batched'}
+        response = current_app.full_dispatch_request()
+        if not response.is_json:
+            return 400, {'error': 'Endpoint cannot be batched'}
+        return response.status_code, json.loads(response.get_data())
+
+
+@batch_bp.route('', methods=['POST'])
+@login_required
+def run_batch():
+    """
+    Execute {"requests": [{"id": "...", "path": "/api/..."}, ...]}
+    Each entry gets {"id", "status", "body"} in the same order. A failing
+    sub-request only fails its own entry.
+    """
+    data = request.get_json(silent=True) or {}
+    entries = data.get('requests')
+    
+    if not isinstance(entries, list) or not entries:
+        return jsonify({'error': 'requests must be a non-empty list'}), 400
+    if len(entries) > MAX_REQUESTS:
+        return jsonify({'error': f'At most {MAX_REQUESTS} requests per batch'}), 400
+    
+    cookie = request.headers.get('Cookie')
+    responses = []
+    with shared_session() as db:
+        for index, entry in enumerate(entries):
+            entry = entry if isinstance(entry, dict) else {}
+            entry_id = entry.get('id', index)
+            path = entry.get('path')
+            method = str(entry.get('method', 'GET')).upper()
+            
+            if not isinstance(path, str) or not path.startswith('/api/'):
+                status, body = 400, {'error': 'path must start with /api/'}
+            elif method != 'GET':
+                status, body = 405, {'error': 'Only GET requests can be batched'}
+            else:
+                try:
+                    status, body = _dispatch(path, cookie)
+                except Exception:
+                    current_app.logger.exception("batched request %s failed", path)
+                    status, body = 500, {'error': 'Internal server error'}
+                if status >= 500:
+                    # Don't let a broken transaction leak into the next entry
+                    db.rollback()
+            
+            responses.append({'id': entry_id, 'status': status, 'body': body})
+    
+    return jsonify({'responses': responses}), 200
@@ -4,31 +4,27 @@ Business settings API endpoints
 from flask import Blueprint, request, jsonify
 from flask_login import login_required, current_user
 from models import get_db, BusinessInfo
+from services.http_cache import make_etag, not_modified, add_validators
+from services.serializers import BUSINESS, json_response
+from services.tenant_context import get_context, invalidate
 
 business_bp = Blueprint('business', __name__)
 
 @business_bp.route('', methods=['GET'])
 @login_required
 def get_business_info():
-    """Get business settings for current user"""
-    db = get_db()
-    try:
-        business = db.query(BusinessInfo).filter_by(user_id=current_user.id).first()
-        
-        if not business:
-            return jsonify({'error': 'Business info not found'}), 404
-        
-        return jsonify({
-            'id': business.id,
-            'company_name': business.company_name,
-            'address': business.address,
-            'phone': business.phone,
-            'email': business.email,
-            'tax_id': business.tax_id,
-            'logo_url': business.logo_url
-        }), 200
-    finally:
-        db.close()
+    """Get business settings for current user (served from the tenant context cache)"""
+    business = get_context(current_user.id).business
+    
+    if not business:
+        return jsonify({'error': 'Business info not found'}), 404
+    
+    etag = make_etag('business', current_user.id, business.id, business.updated_at)
+    cached = not_modified(etag, business.updated_at)
+    if cached:
+        return cached
+    
+    return add_validators(json_response(BUSINESS.obj(business)), etag, business.updated_at)
 
 
 @business_bp.route('', methods=['PUT', 'POST'])
@@ -68,19 +64,12 @@ def upsert_business_info():
         
         db.commit()
         db.refresh(business)
+        invalidate(current_user.id)
         
-        return jsonify({
+        return json_response({
             'message': 'Business info saved successfully',
-            'data': {
-                'id': business.id,
-                'company_name': business.company_name,
-                'address': business.address,
-                'phone': business.phone,
-                'email': business.email,
-                'tax_id': business.tax_id,
-                'logo_url': business.logo_url
-            }
-        }), 200
+            'data': BUSINESS.obj(business)
+        })
     except Exception as e:
         db.rollback()
         return jsonify({'error': str(e)}), 500
@@ -1,28 +1,124 @@
 """
 Customers CRUD API endpoints
 """
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, send_file
 from flask_login import login_required, current_user
+from datetime import datetime
+from functools import lru_cache
+from sqlalchemy import bindparam, select, tuple_
 from models import get_db, Customer
+from services.archive_service import customer_has_invoices
+from services.events import publish
+from services.http_cache import make_etag, list_version, not_modified, add_validators
+from services.import_service import import_customers
+from services.metrics import observe_pdf
+from services.serializers import CUSTOMER, CUSTOMER_LIST, Schema, json_response
+from services.shared_cache import cached
+from services.tenant_context import get_context
+import base64
+import json
+import time
 
 customers_bp = Blueprint('customers', __name__)
 
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+
+# Projectable columns for ?fields=
+LIST_FIELDS = CUSTOMER_LIST.names + ('has_invoices',)
+
+# Built once: bound parameters keep it a compiled cache hit on every call
+CUSTOMER_BY_ID = select(Customer).where(Customer.id == bindparam('id'), Customer.user_id == bindparam('user_id'))
+
+
+@lru_cache(maxsize=64)
+def list_schema(names):
+    """Schema for a ?fields= projection (id is always included)"""
+    fields = ['id'] + [n for n in dict.fromkeys(names) if n not in ('id', 'has_invoices')]
+    extra = {'has_invoices': customer_has_invoices} if 'has_invoices' in names else {}
+    return Schema(Customer, *fields, **extra)
+
+
+def encode_cursor(position):
+    """(name, id) of the last row -> opaque cursor"""
+    return base64.urlsafe_b64encode(json.dumps(list(position)).encode()).decode()
+
+
+def decode_cursor(cursor):
+    """Opaque cursor -> (name, id), None for the first page; ValueError if malformed"""
+    if not cursor:
+        return None
+    try:
+        name, customer_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (TypeError, ValueError, UnicodeDecodeError):
+        raise ValueError('Invalid cursor')
+    if not isinstance(name, str) or not isinstance(customer_id, int):
+        raise ValueError('Invalid cursor')
+    return name, customer_id
+
+
+# Every customer write moves the sync counter (the version), so entries never go stale
+@cached('customers', ttl=600, key=lambda db, user_id, version, names, page: (user_id, version, names, page))
+def customer_list(db, user_id, version, names, page):
+    """
+    One list response (shared by all workers until the next write)
+    names is the ?fields= projection or None; page is (limit, after) or None.
+    """
+    schema = list_schema(names) if names else CUSTOMER_LIST
+    query = db.query(*schema.columns).filter(
+        Customer.user_id == user_id
+    ).order_by(Customer.name, Customer.id)
+    
+    if page is None:
+        return schema.rows(query)
+    
+    # Trailing (name, id) columns carry the cursor position
+    limit, after = page
+    query = query.add_columns(Customer.name, Customer.id)
+    if after:
+        query = query.filter(tuple_(Customer.name, Customer.id) > tuple_(*after))
+    rows = query.limit(limit + 1).all()
+    next_cursor = encode_cursor(rows[limit - 1][-2:]) if len(rows) > limit else None
+    
+    return {
+        'data': schema.rows(row[:-2] for row in rows[:limit]),
+        'next_cursor': next_cursor
+    }
+
+
 @customers_bp.route('', methods=['GET'])
 @login_required
 def list_customers():
-    """List all customers for current user"""
+    """
+    List customers for current user, ordered by name
+    ?fields=id,name projects columns (has_invoices is available on request).
+    ?limit= or ?cursor= switch to keyset pages: {"data": [...], "next_cursor": ...}.
+    """
+    fields = request.args.get('fields')
+    names = None
+    if fields:
+        names = tuple(f.strip() for f in fields.split(',') if f.strip())
+        unknown = [f for f in names if f not in LIST_FIELDS]
+        if unknown:
+            return jsonify({'error': f"Unknown fields: {', '.join(unknown)}"}), 400
+    
+    page = None
+    if 'limit' in request.args or 'cursor' in request.args:
+        try:
+            limit = min(max(int(request.args.get('limit', DEFAULT_PAGE_SIZE)), 1), MAX_PAGE_SIZE)
+            page = (limit, decode_cursor(request.args.get('cursor')))
+        except ValueError:
+            return jsonify({'error': 'Invalid limit or cursor'}), 400
+    
     db = get_db()
     try:
-        customers = db.query(Customer).filter_by(user_id=current_user.id).order_by(Customer.name).all()
+        version = list_version(db, current_user.id)
+        etag = make_etag('customers', current_user.id, version, request.query_string)
+        cached_response = not_modified(etag)
+        if cached_response:
+            return cached_response
         
-        return jsonify([{
-            'id': c.id,
-            'name': c.name,
-            'address': c.address,
-            'phone': c.phone,
-            'email': c.email,
-            'created_at': c.created_at.isoformat() if c.created_at else None
-        } for c in customers]), 200
+        return add_validators(json_response(customer_list(db, current_user.id, version, names, page)), etag)
     finally:
         db.close()
 
@@ -50,16 +146,10 @@ def create_customer():
         db.commit()
         db.refresh(customer)
         
-        return jsonify({
+        return json_response({
             'message': 'Customer created successfully',
-            'data': {
-                'id': customer.id,
-                'name': customer.name,
-                'address': customer.address,
-                'phone': customer.phone,
-                'email': customer.email
-            }
-        }), 201
+            'data': CUSTOMER.obj(customer)
+        }, 201)
     except Exception as e:
         db.rollback()
         return jsonify({'error': str(e)}), 500
@@ -67,6 +157,32 @@ def create_customer():
         db.close()
 
 
+@customers_bp.route('/import', methods=['POST'])
+@login_required
+def import_customers_csv():
+    """
+    Import customers from CSV (raw text/csv body or multipart field "file")
+    Rows matching an existing customer on normalized name/phone/email are skipped.
+    """
+    if request.mimetype == 'multipart/form-data':
+        upload = request.files.get('file')
+        if upload is None:
+            return jsonify({'error': 'CSV file is required'}), 400
+        stream = upload.stream
+    else:
+        stream = request.stream
+    
+    try:
+        summary = import_customers(stream, current_user.id)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    if summary['inserted']:
+        publish(current_user.id, 'customers.imported', {'inserted': summary['inserted']})
+    
+    return json_response(dict(summary, message='Customers imported successfully'), 200)
+
+
 @customers_bp.route('/<int:customer_id>', methods=['PUT'])
 @login_required
 def update_customer(customer_id):
@@ -78,7 +194,7 @@ def update_customer(customer_id):
     
     db = get_db()
     try:
-        customer = db.query(Customer).filter_by(id=customer_id, user_id=current_user.id).first()
+        customer = db.scalars(CUSTOMER_BY_ID, {'id': customer_id, 'user_id': current_user.id}).first()
         
         if not customer:
             return jsonify({'error': 'Customer not found'}), 404
@@ -91,16 +207,10 @@ def update_customer(customer_id):
         db.commit()
         db.refresh(customer)
         
-        return jsonify({
+        return json_response({
             'message': 'Customer updated successfully',
-            'data': {
-                'id': customer.id,
-                'name': customer.name,
-                'address': customer.address,
-                'phone': customer.phone,
-                'email': customer.email
-            }
-        }), 200
+            'data': CUSTOMER.obj(customer)
+        }, 200)
     except Exception as e:
         db.rollback()
         return jsonify({'error': str(e)}), 500
@@ -114,13 +224,16 @@ def delete_customer(customer_id):
     """Delete customer (only if no invoices)"""
     db = get_db()
     try:
-        customer = db.query(Customer).filter_by(id=customer_id, user_id=current_user.id).first()
+        customer = db.scalars(CUSTOMER_BY_ID, {'id': customer_id, 'user_id': current_user.id}).first()
         
         if not customer:
             return jsonify({'error': 'Customer not found'}), 404
         
-        # Check if customer has invoices
-        if customer.invoices:
+        # Check if customer has invoices (hot or archived) without loading them
+        has_invoices = db.query(customer_has_invoices).select_from(Customer).filter(
+            Customer.id == customer.id
+        ).scalar()
+        if has_invoices:
             return jsonify({'error': 'Cannot delete customer with existing invoices'}), 400
         
         db.delete(customer)
@@ -132,3 +245,49 @@ def delete_customer(customer_id):
         return jsonify({'error': str(e)}), 500
     finally:
         db.close()
+
+
+@customers_bp.route('/<int:customer_id>/statement', methods=['GET'])
+@login_required
+def download_customer_statement(customer_id):
+    """
+    Statement PDF for one month (?month=YYYY-MM, default last month): every
+    invoice with a running balance, plus an aging summary
+    """
+    from services.pdf_service import generate_statement_pdf, statement_period
+    
+    try:
+        start, end = statement_period(request.args.get('month'))
+    except ValueError:
+        return jsonify({'error': 'month must be YYYY-MM'}), 400
+    
+    business = get_context(current_user.id).business
+    if not business:
+        return jsonify({'error': 'Business info not configured'}), 400
+    
+    db = get_db()
+    try:
+        # Any invoice/customer write moves the version; the statement date moves daily
+        as_of = min(end, datetime.utcnow()).date()
+        etag = make_etag('statement', current_user.id, customer_id, list_version(db, current_user.id),
+                         business.updated_at, start.date(), as_of)
+        cached_response = not_modified(etag)
+        if cached_response:
+            return cached_response
+        
+        started = time.perf_counter()
+        pdf_file = generate_statement_pdf(db, current_user.id, customer_id, business, start, end)
+        if pdf_file is None:
+            return jsonify({'error': 'Customer not found'}), 404
+        observe_pdf('statement', started, pdf_file.seek(0, 2))
+        pdf_file.seek(0)
+        
+        response = send_file(
+            pdf_file,
+            mimetype='application/pdf',
+            as_attachment=True,
+            download_name=f"Statement_{customer_id}_{start.strftime('%Y-%m')}.pdf"
+        )
+        return add_validators(response, etag)
+    finally:
+        db.close()
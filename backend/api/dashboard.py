@@ -1,75 +1,102 @@
 """
 Dashboard analytics API endpoints
 """
-from flask import Blueprint, jsonify
+from flask import Blueprint
 from flask_login import login_required, current_user
 from datetime import datetime, timedelta
-from sqlalchemy import func, extract
+from sqlalchemy import bindparam, func, extract, select
 from models import get_db, Invoice, InvoiceLineItem
+from services.http_cache import list_version
+from services.serializers import json_response
+from services.shared_cache import cached
 
 dashboard_bp = Blueprint('dashboard', __name__)
 
+# Aggregates are built once; user and dates are bound per call so every
+# request reuses the statement and its compiled SQL
+OVERVIEW = select(
+    func.coalesce(func.sum(Invoice.total), 0.0),
+    func.count(Invoice.id)
+).where(
+    Invoice.user_id == bindparam('user_id'),
+    Invoice.invoice_date >= bindparam('start'),
+    Invoice.invoice_date < bindparam('end')
+)
+
+MONTHLY_SALES = select(
+    extract('year', Invoice.invoice_date).label('year'),
+    extract('month', Invoice.invoice_date).label('month'),
+    func.sum(Invoice.total).label('total')
+).where(
+    Invoice.user_id == bindparam('user_id'),
+    Invoice.invoice_date >= bindparam('since')
+).group_by('year', 'month').order_by('year', 'month')
+
+TOP_PRODUCTS = select(
+    InvoiceLineItem.product_name,
+    func.sum(InvoiceLineItem.line_total).label('revenue')
+).join(Invoice).where(
+    Invoice.user_id == bindparam('user_id'),
+    Invoice.invoice_date >= bindparam('since')
+).group_by(InvoiceLineItem.product_name).order_by(func.sum(InvoiceLineItem.line_total).desc()).limit(10)
+
+def compute_overview(db, user_id):
+    """Last month's sales overview (also pushed to live dashboards on writes)"""
+    now = datetime.utcnow()
+    first_day_this_month = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    first_day_last_month = (first_day_this_month - timedelta(days=1)).replace(day=1)
+    
+    total_sales, num_invoices = db.execute(
+        OVERVIEW, {'user_id': user_id, 'start': first_day_last_month, 'end': first_day_this_month}
+    ).one()
+    
+    return {
+        'total_sales': round(total_sales, 2),
+        'num_invoices': num_invoices,
+        'avg_order_value': round(total_sales / num_invoices, 2) if num_invoices > 0 else 0,
+        'period': 'Last Month'
+    }
+
+
+# Invoice writes move the sync counter (the version); the day bounds the 12-month window
+@cached('dashboard', ttl=300, key=lambda db, user_id, version, day: (user_id, version, day))
+def compute_stats(db, user_id, version, day):
+    """Overview, monthly sales and top products (shared by all workers until the next write)"""
+    now = datetime.utcnow()
+    overview = compute_overview(db, user_id)
+    
+    # Monthly sales for last 12 months (bar chart data)
+    twelve_months_ago = now - timedelta(days=365)
+    params = {'user_id': user_id, 'since': twelve_months_ago}
+    monthly_sales = db.execute(MONTHLY_SALES, params).all()
+    
+    monthly_chart_data = [{
+        'month': f"{int(row.year)}-{int(row.month):02d}",
+        'total': float(row.total)
+    } for row in monthly_sales]
+    
+    # Top products by revenue (pie chart data)
+    top_products = db.execute(TOP_PRODUCTS, params).all()
+    
+    product_chart_data = [{
+        'product': row.product_name,
+        'revenue': float(row.revenue)
+    } for row in top_products]
+    
+    return {
+        'overview': overview,
+        'monthly_sales': monthly_chart_data,
+        'top_products': product_chart_data
+    }
+
+
 @dashboard_bp.route('/stats', methods=['GET'])
 @login_required
 def get_dashboard_stats():
     """Get sales statistics for dashboard"""
     db = get_db()
     try:
-        # Previous month stats
-        now = datetime.utcnow()
-        first_day_this_month = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-        first_day_last_month = (first_day_this_month - timedelta(days=1)).replace(day=1)
-        
-        # Total sales last month
-        last_month_invoices = db.query(Invoice).filter(
-            Invoice.user_id == current_user.id,
-            Invoice.invoice_date >= first_day_last_month,
-            Invoice.invoice_date < first_day_this_month
-        ).all()
-        
-        total_sales = sum(inv.total for inv in last_month_invoices)
-        num_invoices = len(last_month_invoices)
-        avg_order_value = round(total_sales / num_invoices, 2) if num_invoices > 0 else 0
-        
-        # Monthly sales for last 12 months (bar chart data)
-        twelve_months_ago = now - timedelta(days=365)
-        monthly_sales = db.query(
-            extract('year', Invoice.invoice_date).label('year'),
-            extract('month', Invoice.invoice_date).label('month'),
-            func.sum(Invoice.total).label('total')
-        ).filter(
-            Invoice.user_id == current_user.id,
-            Invoice.invoice_date >= twelve_months_ago
-        ).group_by('year', 'month').order_by('year', 'month').all()
-        
-        monthly_chart_data = [{
-            'month': f"{int(row.year)}-{int(row.month):02d}",
-            'total': float(row.total)
-        } for row in monthly_sales]
-        
-        # Top products by revenue (pie chart data)
-        top_products = db.query(
-            InvoiceLineItem.product_name,
-            func.sum(InvoiceLineItem.line_total).label('revenue')
-        ).join(Invoice).filter(
-            Invoice.user_id == current_user.id,
-            Invoice.invoice_date >= twelve_months_ago
-        ).group_by(InvoiceLineItem.product_name).order_by(func.sum(InvoiceLineItem.line_total).desc()).limit(10).all()
-        
-        product_chart_data = [{
-            'product': row.product_name,
-            'revenue': float(row.revenue)
-        } for row in top_products]
-        
-        return jsonify({
-            'overview': {
-                'total_sales': round(total_sales, 2),
-                'num_invoices': num_invoices,
-                'avg_order_value': avg_order_value,
-                'period': 'Last Month'
-            },
-            'monthly_sales': monthly_chart_data,
-            'top_products': product_chart_data
-        }), 200
+        version = list_version(db, current_user.id)
+        return json_response(compute_stats(db, current_user.id, version, datetime.utcnow().date()))
     finally:
         db.close()
@@ -0,0 +1,58 @@
+"""
+Server-Sent Events endpoint for live dashboard/invoice updates
+Each open stream holds a worker thread, so streams are capped per worker
+(SSE_MAX_STREAMS; gunicorn_config.py sets 0 for sync workers, where the
+frontend should keep polling).
+"""
+import json
+import os
+import queue
+import time
+from flask import Blueprint, Response, jsonify, stream_with_context
+from flask_login import login_required, current_user
+from services.events import broker
+
+events_bp = Blueprint('events', __name__)
+
+MAX_STREAMS = int(os.environ.get('SSE_MAX_STREAMS', '8'))
+KEEPALIVE_SECONDS = 15
+# Streams end after this long; EventSource reconnects on its own
+STREAM_LIFETIME_SECONDS = 300
+
+
+def format_event(event_type, data):
+    return f"event: {event_type}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+@events_bp.route('', methods=['GET'])
+@login_required
+def stream_events():
+    """Stream invoice.created, invoice.status_changed and dashboard.overview events"""
+    if broker.stream_count() >= MAX_STREAMS:
+        response = jsonify({'error': 'Live updates unavailable, poll instead'})
+        response.status_code = 503
+        response.headers['Retry-After'] = '30'
+        return response
+    
+    user_id = current_user.id
+    subscription = broker.subscribe(user_id)
+    
+    def generate():
+        try:
+            yield "retry: 3000\n\n"
+            # Measured from stream start, so a steady flow of events cannot keep it open
+            deadline = time.monotonic() + STREAM_LIFETIME_SECONDS
+            while time.monotonic() < deadline:
+                try:
+                    message = subscription.get(timeout=max(0, min(KEEPALIVE_SECONDS, deadline - time.monotonic())))
+                except queue.Empty:
+                    yield ": keepalive\n\n"
+                    continue
+                yield format_event(message['type'], message['data'])
+        finally:
+            broker.unsubscribe(user_id, subscription)
+    
+    return Response(stream_with_context(generate()), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
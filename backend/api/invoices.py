@@ -4,26 +4,73 @@ Invoices API endpoints
 from flask import Blueprint, request, jsonify, send_file
 from flask_login import login_required, current_user
 from datetime import datetime
-from models import get_db, Invoice, InvoiceLineItem, Customer, BusinessInfo
-from services.pdf_service import generate_invoice_pdf
+from functools import lru_cache
+from sqlalchemy import bindparam, case, func, or_, select, update
+from api.customers import CUSTOMER_BY_ID
+from api.dashboard import compute_overview
+from models import get_db, Invoice, InvoiceLineItem, InvoiceArchive, InvoiceLineItemArchive, Customer
+from services.archive_service import find_invoice
+from services.events import publish
+from services.http_cache import make_etag, list_version, not_modified, add_validators
+from services.metrics import observe_pdf
+from services.serializers import (
+    CUSTOMER, INVOICE_LIST, INVOICE_DETAIL, LINE_ITEM,
+    ARCHIVED_INVOICE_LIST, ARCHIVED_INVOICE_DETAIL, ARCHIVED_LINE_ITEM, json_response
+)
+from services.sync_service import allocate_change_seq
+from services.tenant_context import get_context
 import io
+import time
 
 invoices_bp = Blueprint('invoices', __name__)
 
+# Bulk updates: cap on explicit id lists, ids per UPDATE statement
+BULK_MAX_IDS = 5000
+BULK_CHUNK_SIZE = 500
+
+# Hot statements are built once with bound parameters: requests reuse the
+# statement (and its memoized cache key) and get the SQL from the compiled cache
+LAST_INVOICE_NUMBER = select(Invoice.invoice_number).where(
+    Invoice.user_id == bindparam('user_id'),
+    Invoice.invoice_number.like(bindparam('pattern'))
+).order_by(Invoice.invoice_number.desc()).limit(1)
+
+# Trailing updated_at columns validate the cached copy
+DETAIL_STATEMENTS = tuple(
+    (model, schema, item_model, item_schema,
+     select(*schema.columns, model.updated_at, Customer.updated_at).join(
+         Customer, Customer.id == model.customer_id
+     ).where(model.id == bindparam('invoice_id'), model.user_id == bindparam('user_id')),
+     select(*item_schema.columns).where(item_model.invoice_id == bindparam('invoice_id')).order_by(item_model.id))
+    for model, schema, item_model, item_schema in (
+        (Invoice, INVOICE_DETAIL, InvoiceLineItem, LINE_ITEM),
+        (InvoiceArchive, ARCHIVED_INVOICE_DETAIL, InvoiceLineItemArchive, ARCHIVED_LINE_ITEM)
+    )
+)
+CUSTOMER_DETAIL = select(*CUSTOMER.columns).where(Customer.id == bindparam('customer_id'))
+
+INVOICE_BY_ID = select(Invoice).where(Invoice.id == bindparam('id'), Invoice.user_id == bindparam('user_id'))
+
+# list_invoices filters: parser, condition (values are strings; customer_id may be an int)
+FILTERS = {
+    'start_date': (datetime.fromisoformat, lambda model, value: model.invoice_date >= value),
+    'end_date': (datetime.fromisoformat, lambda model, value: model.invoice_date <= value),
+    'customer_id': (int, lambda model, value: model.customer_id == value),
+    'status': (str, lambda model, value: model.status == value),
+}
+
+
 def generate_invoice_number(db, user_id):
     """Generate invoice number in format YYYYMMDD-001"""
     today = datetime.utcnow().strftime('%Y%m%d')
     prefix = f"{today}-"
     
     # Find max invoice number for today
-    last_invoice = db.query(Invoice).filter(
-        Invoice.user_id == user_id,
-        Invoice.invoice_number.like(f"{prefix}%")
-    ).order_by(Invoice.invoice_number.desc()).first()
+    last_number = db.execute(LAST_INVOICE_NUMBER, {'user_id': user_id, 'pattern': f"{prefix}%"}).scalar()
     
-    if last_invoice:
+    if last_number:
         # Extract sequence number and increment
-        last_seq = int(last_invoice.invoice_number.split('-')[1])
+        last_seq = int(last_number.split('-')[1])
         new_seq = last_seq + 1
     else:
         new_seq = 1
@@ -31,54 +78,76 @@ def generate_invoice_number(db, user_id):
     return f"{prefix}{new_seq:03d}"
 
 
+def filter_values(args):
+    """
+    Parsed list_invoices filters (start_date, end_date, customer_id, status) that are set
+    Raises:
+        TypeError/ValueError for a value of the wrong type or format
+    """
+    values = {}
+    for name, (parse, _) in FILTERS.items():
+        value = args.get(name)
+        if not value:
+            continue
+        if not isinstance(value, str) and not (parse is int and type(value) is int):
+            raise TypeError(f"{name} must be a string")
+        values[name] = parse(value)
+    return values
+
+
+def filter_invoices(query, model, args):
+    """Apply the list_invoices filters to a query"""
+    return query.filter(*(FILTERS[name][1](model, value) for name, value in filter_values(args).items()))
+
+
+@lru_cache(maxsize=64)
+def list_statements(model, schema, filters):
+    """(page, count) statements for a model and set of filter names, values left as bound parameters"""
+    conditions = [model.user_id == bindparam('user_id')]
+    conditions += [FILTERS[name][1](model, bindparam(name)) for name in filters]
+    page = select(*schema.columns).join(
+        Customer, Customer.id == model.customer_id
+    ).where(*conditions).order_by(model.invoice_date.desc()).offset(bindparam('offset')).limit(bindparam('limit'))
+    count = select(func.count()).select_from(model).where(*conditions)
+    return page, count
+
+
 @invoices_bp.route('', methods=['GET'])
 @login_required
 def list_invoices():
-    """List invoices with optional filters"""
+    """List invoices with optional filters (archived=1 lists the cold archive)"""
     db = get_db()
     try:
-        query = db.query(Invoice).filter_by(user_id=current_user.id)
-        
-        # Filter by date range
-        start_date = request.args.get('start_date')
-        end_date = request.args.get('end_date')
-        if start_date:
-            query = query.filter(Invoice.invoice_date >= datetime.fromisoformat(start_date))
-        if end_date:
-            query = query.filter(Invoice.invoice_date <= datetime.fromisoformat(end_date))
-        
-        # Filter by customer
-        customer_id = request.args.get('customer_id')
-        if customer_id:
-            query = query.filter_by(customer_id=int(customer_id))
+        etag = make_etag('invoices', current_user.id, list_version(db, current_user.id), request.query_string)
+        cached = not_modified(etag)
+        if cached:
+            return cached
         
-        # Filter by status
-        status = request.args.get('status')
-        if status:
-            query = query.filter_by(status=status)
+        # Default listing only touches the hot table
+        if request.args.get('archived') == '1':
+            model, schema = InvoiceArchive, ARCHIVED_INVOICE_LIST
+        else:
+            model, schema = Invoice, INVOICE_LIST
+        try:
+            params = filter_values(request.args)
+        except (TypeError, ValueError) as e:
+            return jsonify({'error': f'Invalid filter: {e}'}), 400
+        page_statement, count_statement = list_statements(model, schema, tuple(params))
+        params['user_id'] = current_user.id
         
         # Pagination
         page = int(request.args.get('page', 1))
         per_page = int(request.args.get('per_page', 20))
         
-        invoices = query.order_by(Invoice.invoice_date.desc()).offset((page - 1) * per_page).limit(per_page).all()
-        total = query.count()
+        rows = db.execute(page_statement, dict(params, offset=(page - 1) * per_page, limit=per_page)).all()
+        total = db.execute(count_statement, params).scalar()
         
-        return jsonify({
-            'data': [{
-                'id': inv.id,
-                'invoice_number': inv.invoice_number,
-                'invoice_date': inv.invoice_date.isoformat(),
-                'customer_name': inv.customer.name,
-                'customer_id': inv.customer_id,
-                'total': inv.total,
-                'status': inv.status,
-                'notes': inv.notes
-            } for inv in invoices],
+        return add_validators(json_response({
+            'data': schema.rows(rows),
             'total': total,
             'page': page,
             'per_page': per_page
-        }), 200
+        }), etag)
     finally:
         db.close()
 
@@ -86,40 +155,30 @@ def list_invoices():
 @invoices_bp.route('/<int:invoice_id>', methods=['GET'])
 @login_required
 def get_invoice(invoice_id):
-    """Get invoice details with line items"""
+    """Get invoice details with line items (falls back to the archive)"""
     db = get_db()
     try:
-        invoice = db.query(Invoice).filter_by(id=invoice_id, user_id=current_user.id).first()
-        
-        if not invoice:
+        params = {'invoice_id': invoice_id, 'user_id': current_user.id}
+        for model, schema, item_model, item_schema, statement, items_statement in DETAIL_STATEMENTS:
+            row = db.execute(statement, params).first()
+            if row:
+                break
+        else:
             return jsonify({'error': 'Invoice not found'}), 404
         
-        return jsonify({
-            'id': invoice.id,
-            'invoice_number': invoice.invoice_number,
-            'invoice_date': invoice.invoice_date.isoformat(),
-            'customer': {
-                'id': invoice.customer.id,
-                'name': invoice.customer.name,
-                'address': invoice.customer.address,
-                'phone': invoice.customer.phone,
-                'email': invoice.customer.email
-            },
-            'line_items': [{
-                'id': item.id,
-                'product_name': item.product_name,
-                'part_number': item.part_number,
-                'quantity': item.quantity,
-                'unit_price': item.unit_price,
-                'line_total': item.line_total
-            } for item in invoice.line_items],
-            'subtotal': invoice.subtotal,
-            'tax_rate': invoice.tax_rate,
-            'tax_amount': invoice.tax_amount,
-            'total': invoice.total,
-            'status': invoice.status,
-            'notes': invoice.notes
-        }), 200
+        last_modified = max(filter(None, row[-2:]), default=None)
+        etag = make_etag(model.__tablename__, current_user.id, invoice_id, *row[-2:])
+        cached = not_modified(etag, last_modified)
+        if cached:
+            return cached
+        
+        invoice = schema.row(row[:-2])
+        customer = db.execute(CUSTOMER_DETAIL, {'customer_id': invoice.pop('customer_id')}).first()
+        items = db.execute(items_statement, {'invoice_id': invoice_id}).all()
+        invoice['customer'] = CUSTOMER.row(customer)
+        invoice['line_items'] = item_schema.rows(items)
+        
+        return add_validators(json_response(invoice), etag, last_modified)
     finally:
         db.close()
 
@@ -150,13 +209,13 @@ def create_invoice():
     db = get_db()
     try:
         # Verify customer exists and belongs to user
-        customer = db.query(Customer).filter_by(id=data['customer_id'], user_id=current_user.id).first()
+        customer = db.scalars(CUSTOMER_BY_ID, {'id': data['customer_id'], 'user_id': current_user.id}).first()
         if not customer:
             return jsonify({'error': 'Customer not found'}), 404
         
         # Calculate totals
         subtotal = sum(item['quantity'] * item['unit_price'] for item in line_items)
-        tax_rate = 8.25  # Fixed tax rate
+        tax_rate = get_context(current_user.id).tax_rate
         tax_amount = round(subtotal * tax_rate / 100, 2)
         total = round(subtotal + tax_amount, 2)
         
@@ -198,14 +257,26 @@ def create_invoice():
         db.commit()
         db.refresh(invoice)
         
-        return jsonify({
+        # Live updates for open Dashboard/Invoices pages
+        publish(current_user.id, 'invoice.created', {
+            'id': invoice.id,
+            'invoice_number': invoice.invoice_number,
+            'invoice_date': invoice.invoice_date.isoformat(),
+            'customer_id': invoice.customer_id,
+            'customer_name': customer.name,
+            'total': invoice.total,
+            'status': invoice.status
+        })
+        publish(current_user.id, 'dashboard.overview', compute_overview(db, current_user.id))
+        
+        return json_response({
             'message': 'Invoice created successfully',
             'data': {
                 'id': invoice.id,
                 'invoice_number': invoice.invoice_number,
                 'total': invoice.total
             }
-        }), 201
+        }, 201)
     except Exception as e:
         db.rollback()
         return jsonify({'error': str(e)}), 500
@@ -221,12 +292,14 @@ def update_invoice(invoice_id):
     
     db = get_db()
     try:
-        invoice = db.query(Invoice).filter_by(id=invoice_id, user_id=current_user.id).first()
+        invoice = db.scalars(INVOICE_BY_ID, {'id': invoice_id, 'user_id': current_user.id}).first()
         
         if not invoice:
             return jsonify({'error': 'Invoice not found'}), 404
         
         # Update allowed fields
+        old_status = invoice.status
+        invoice_number = invoice.invoice_number
         if 'status' in data:
             if data['status'] not in ['paid', 'unpaid']:
                 return jsonify({'error': 'Invalid status'}), 400
@@ -235,8 +308,16 @@ def update_invoice(invoice_id):
         if 'notes' in data:
             invoice.notes = data['notes'].strip()
         
+        new_status = invoice.status
         db.commit()
         
+        if new_status != old_status:
+            publish(current_user.id, 'invoice.status_changed', {
+                'id': invoice_id,
+                'invoice_number': invoice_number,
+                'status': new_status
+            })
+        
         return jsonify({'message': 'Invoice updated successfully'}), 200
     except Exception as e:
         db.rollback()
@@ -245,30 +326,126 @@ def update_invoice(invoice_id):
         db.close()
 
 
+@invoices_bp.route('/bulk', methods=['PATCH'])
+@login_required
+def bulk_update_invoices():
+    """
+    Set status and/or notes on many invoices at once
+    Body: {"ids": [...]} or {"filter": {list_invoices filters}}, plus
+    "status" and/or "notes". Returns how many invoices matched and changed.
+    """
+    data = request.get_json(silent=True) or {}
+    
+    values = {}
+    if 'status' in data:
+        if data['status'] not in ['paid', 'unpaid']:
+            return jsonify({'error': 'Invalid status'}), 400
+        values['status'] = data['status']
+    if 'notes' in data:
+        values['notes'] = (data['notes'] or '').strip()
+    if not values:
+        return jsonify({'error': 'Nothing to update (status or notes required)'}), 400
+    
+    ids = data.get('ids')
+    filters = data.get('filter')
+    if (ids is None) == (filters is None):
+        return jsonify({'error': 'Provide either ids or filter'}), 400
+    if ids is not None and (not isinstance(ids, list) or not all(isinstance(i, int) for i in ids)):
+        return jsonify({'error': 'ids must be a list of invoice ids'}), 400
+    if ids is not None and len(ids) > BULK_MAX_IDS:
+        return jsonify({'error': f'At most {BULK_MAX_IDS} ids per request'}), 400
+    if filters is not None and not isinstance(filters, dict):
+        return jsonify({'error': 'filter must be an object'}), 400
+    
+    db = get_db()
+    try:
+        query = db.query(Invoice.id).filter(Invoice.user_id == current_user.id)
+        if ids is not None:
+            query = query.filter(Invoice.id.in_(ids))
+        else:
+            query = filter_invoices(query, Invoice, filters)
+        matched = query.count()
+        
+        # Only rows whose values actually change get a new change_seq
+        changes = [getattr(Invoice, field).is_distinct_from(value) for field, value in values.items()]
+        changed_ids = [row.id for row in query.filter(or_(*changes)).order_by(Invoice.id)]
+        
+        # Set-based update in chunks; each row still gets its own change_seq
+        # for delta sync (the ORM flush hook doesn't see Core updates)
+        if changed_ids:
+            conn = db.connection()
+            seq = allocate_change_seq(conn, current_user.id, len(changed_ids))
+            for start in range(0, len(changed_ids), BULK_CHUNK_SIZE):
+                chunk = changed_ids[start:start + BULK_CHUNK_SIZE]
+                stamps = {invoice_id: seq + start + offset for offset, invoice_id in enumerate(chunk)}
+                conn.execute(
+                    update(Invoice)
+                    .where(Invoice.user_id == current_user.id, Invoice.id.in_(chunk))
+                    .values(change_seq=case(stamps, value=Invoice.id), **values)
+                )
+        db.commit()
+        
+        if changed_ids:
+            # No id list (thousands of ids outgrow a NOTIFY payload): clients
+            # re-fetch; version is the sync counter after the update
+            event = {'fields': sorted(values), 'count': len(changed_ids), 'version': seq + len(changed_ids) - 1}
+            if 'status' in values:
+                event['status'] = values['status']
+            publish(current_user.id, 'invoice.bulk_updated', event)
+            if 'status' in values:
+                publish(current_user.id, 'dashboard.overview', compute_overview(db, current_user.id))
+        
+        return jsonify({
+            'message': 'Invoices updated successfully',
+            'matched': matched,
+            'updated': len(changed_ids)
+        }), 200
+    except (TypeError, ValueError) as e:
+        db.rollback()
+        return jsonify({'error': f'Invalid filter: {e}'}), 400
+    except Exception as e:
+        db.rollback()
+        return jsonify({'error': str(e)}), 500
+    finally:
+        db.close()
+
+
 @invoices_bp.route('/<int:invoice_id>/pdf', methods=['GET'])
 @login_required
 def download_invoice_pdf(invoice_id):
     """Generate and download invoice PDF"""
     db = get_db()
     try:
-        invoice = db.query(Invoice).filter_by(id=invoice_id, user_id=current_user.id).first()
+        invoice = find_invoice(db, invoice_id, current_user.id)
         
         if not invoice:
             return jsonify({'error': 'Invoice not found'}), 404
         
-        # Get business info
-        business = db.query(BusinessInfo).filter_by(user_id=current_user.id).first()
+        # Get business info (cached per tenant)
+        business = get_context(current_user.id).business
         if not business:
             return jsonify({'error': 'Business info not configured'}), 400
         
-        # Generate PDF
+        # Rendering is the expensive part; revalidate before it
+        versions = (invoice.updated_at, invoice.customer.updated_at, business.updated_at)
+        last_modified = max(filter(None, versions), default=None)
+        etag = make_etag('pdf', invoice.__tablename__, current_user.id, invoice.id, *versions)
+        cached = not_modified(etag, last_modified)
+        if cached:
+            return cached
+        
+        # Generate PDF (ReportLab is imported on first use)
+        from services.pdf_service import generate_invoice_pdf
+        started = time.perf_counter()
         pdf_buffer = generate_invoice_pdf(invoice, business)
+        observe_pdf('invoice', started, pdf_buffer.getbuffer().nbytes)
         
-        return send_file(
+        response = send_file(
             pdf_buffer,
             mimetype='application/pdf',
             as_attachment=True,
             download_name=f"Invoice_{invoice.invoice_number}.pdf"
         )
+        return add_validators(response, etag, last_modified)
     finally:
         db.close()
@@ -0,0 +1,74 @@
+"""
+Delta sync API endpoint
+Lets the frontend keep a local copy of customers and invoices and refresh
+it with only what changed since its last watermark.
+"""
+from flask import Blueprint, request, jsonify
+from flask_login import login_required, current_user
+from models import get_db, Customer, Invoice, SyncTombstone
+from services.serializers import SYNC_CUSTOMER, SYNC_INVOICE, json_response
+from services.sync_service import encode_token, decode_token
+
+sync_bp = Blueprint('sync', __name__)
+
+MAX_LIMIT = 2000
+
+
+@sync_bp.route('', methods=['GET'])
+@login_required
+def get_changes():
+    """
+    Customers/invoices created, updated or deleted after ?since=<token>
+    Without a token this is a full sync. At most `limit` rows per kind are
+    returned; has_more=true means call again with the returned token.
+    """
+    try:
+        since = decode_token(request.args.get('since'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    try:
+        limit = min(max(int(request.args.get('limit', 500)), 1), MAX_LIMIT)
+    except ValueError:
+        return jsonify({'error': 'limit must be an integer'}), 400
+    
+    db = get_db()
+    try:
+        customers = db.query(*SYNC_CUSTOMER.columns).filter(
+            Customer.user_id == current_user.id,
+            Customer.change_seq > since
+        ).order_by(Customer.change_seq).limit(limit + 1).all()
+        
+        invoices = db.query(*SYNC_INVOICE.columns).join(
+            Customer, Customer.id == Invoice.customer_id
+        ).filter(
+            Invoice.user_id == current_user.id,
+            Invoice.change_seq > since
+        ).order_by(Invoice.change_seq).limit(limit + 1).all()
+        
+        tombstones = db.query(SyncTombstone.entity, SyncTombstone.entity_id, SyncTombstone.change_seq).filter(
+            SyncTombstone.user_id == current_user.id,
+            SyncTombstone.change_seq > since
+        ).order_by(SyncTombstone.change_seq).limit(limit + 1).all()
+        
+        # If any kind was truncated, stop every kind at the same watermark so
+        # the next call resumes without skipping rows
+        truncated = [rows[limit - 1].change_seq for rows in (customers, invoices, tombstones) if len(rows) > limit]
+        has_more = bool(truncated)
+        if has_more:
+            watermark = min(truncated)
+        else:
+            watermark = max([since] + [rows[-1].change_seq for rows in (customers, invoices, tombstones) if rows])
+        
+        return json_response({
+            'customers': SYNC_CUSTOMER.rows(r for r in customers if r.change_seq <= watermark),
+            'invoices': SYNC_INVOICE.rows(r for r in invoices if r.change_seq <= watermark),
+            'deleted': {
+                'customers': [t.entity_id for t in tombstones if t.entity == 'customer' and t.change_seq <= watermark],
+                'invoices': [t.entity_id for t in tombstones if t.entity == 'invoice' and t.change_seq <= watermark]
+            },
+            'full': since < 0,
+            'has_more': has_more,
+            'next': encode_token(max(watermark, 0))
+        })
+    finally:
+        db.close()
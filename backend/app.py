@@ -3,10 +3,17 @@ Flask application entry point
 Optimized for low-resource environments (old MacBook Pro)
 """
 import os
-from flask import Flask, jsonify
-from flask_login import LoginManager
+from flask import Flask, Response, jsonify, request
+from flask_login import LoginManager, current_user
 from flask_cors import CORS
-from models import init_db, get_db, User
+from sqlalchemy import bindparam, select
+from sqlalchemy.exc import OperationalError
+from models import (
+    init_db, ensure_db, get_db, engine, User, set_statement_timeout, reset_statement_timeout, is_statement_timeout,
+    set_current_tenant, reset_current_tenant, tenant_shard
+)
+from services import metrics, profiler, rate_limit
+from middleware.compression import CompressionMiddleware
 
 # Initialize Flask app
 app = Flask(__name__)
@@ -31,47 +38,133 @@ CORS(app,
      origins=allowed_origins,
      allow_headers=['Content-Type', 'Authorization'],
      expose_headers=['Content-Type'],
-     methods=['GET', 'POST', 'PUT', 'DELETE', 'OPTIONS'])
+     methods=['GET', 'POST', 'PUT', 'PATCH', 'DELETE', 'OPTIONS'])
 
 # Initialize Flask-Login
 login_manager = LoginManager()
 login_manager.init_app(app)
 login_manager.login_view = 'auth.login'
 
+# Every authenticated request loads its user: one prebuilt statement
+USER_BY_ID = select(User).where(User.id == bindparam('user_id'))
+
 @login_manager.user_loader
 def load_user(user_id):
     """Load user by ID for Flask-Login"""
     db = get_db()
     try:
-        return db.query(User).get(int(user_id))
+        return db.scalars(USER_BY_ID, {'user_id': int(user_id)}).first()
     finally:
         db.close()
 
+# Route get_db() to the signed-in user's shard for the rest of the request
+@app.before_request
+def bind_tenant():
+    if not current_user.is_authenticated:
+        return None
+    request.environ['autoparts.tenant_token'] = set_current_tenant(current_user.id)
+    if request.method not in ('GET', 'HEAD', 'OPTIONS') and tenant_shard(current_user.id)[1] == 'moving':
+        # Writes pause for the few seconds a tenant move takes to catch up
+        response = jsonify({'error': 'Account maintenance in progress, please retry shortly'})
+        response.status_code = 503
+        response.headers['Retry-After'] = '5'
+        return response
+    return None
+
+@app.teardown_request
+def unbind_tenant(exc):
+    token = request.environ.pop('autoparts.tenant_token', None)
+    if token is not None:
+        reset_current_tenant(token)
+
 # Register blueprints
 from auth import auth_bp
 from api.business import business_bp
 from api.customers import customers_bp
 from api.invoices import invoices_bp
 from api.dashboard import dashboard_bp
+from api.sync import sync_bp
+from api.events import events_bp
+from api.batch import batch_bp
+from api.admin import admin_bp
 
 app.register_blueprint(auth_bp, url_prefix='/api/auth')
 app.register_blueprint(business_bp, url_prefix='/api/business')
 app.register_blueprint(customers_bp, url_prefix='/api/customers')
 app.register_blueprint(invoices_bp, url_prefix='/api/invoices')
 app.register_blueprint(dashboard_bp, url_prefix='/api/dashboard')
+app.register_blueprint(sync_bp, url_prefix='/api/sync')
+app.register_blueprint(events_bp, url_prefix='/api/events')
+app.register_blueprint(batch_bp, url_prefix='/api/batch')
+app.register_blueprint(admin_bp, url_prefix='/api/admin')
+
+# ReportLab is imported on first PDF download; PDF_PREWARM=1 loads it at
+# boot instead (with gunicorn preload_app the pages are shared by workers)
+if os.environ.get('PDF_PREWARM') == '1':
+    import services.pdf_service  # noqa: F401
+
+# Request latency/count metrics for every blueprint
+metrics.init_app(app, engine)
+
+# Per-user/IP token buckets and caps on concurrent PDF/bulk/dashboard requests
+rate_limit.init_app(app)
+
+# Per-statement time budget (ms) by endpoint class, well inside the 30s
+# worker timeout (0 = none, for admin tenant export/restore);
+# STATEMENT_TIMEOUTS="default=5000,dashboard=10000" overrides
+STATEMENT_TIMEOUTS = {'default': 5000, 'dashboard': 10000, 'pdf': 10000, 'bulk': 20000, 'admin': 0}
+STATEMENT_TIMEOUTS.update(
+    (name.strip(), int(ms)) for name, _, ms in
+    (item.partition('=') for item in os.environ.get('STATEMENT_TIMEOUTS', '').split(',') if item.strip())
+)
+
+# Admin-started profiling jobs (POST /api/admin/profile)
+profiler.init_app(app)
+
+@app.before_request
+def apply_statement_timeout():
+    endpoint_class = rate_limit.ENDPOINT_CLASSES.get(request.endpoint, 'default')
+    request.environ['autoparts.timeout_token'] = set_statement_timeout(
+        STATEMENT_TIMEOUTS.get(endpoint_class, STATEMENT_TIMEOUTS['default'])
+    )
+
+# Threads outlive requests: drop the budget so later work on this thread
+# (CLI jobs, background tasks) doesn't inherit it
+@app.teardown_request
+def clear_statement_timeout(exc):
+    token = request.environ.pop('autoparts.timeout_token', None)
+    if token is not None:
+        reset_statement_timeout(token)
+
+# Compress JSON/CSV/NDJSON/PDF responses for slow branch-office links
+app.wsgi_app = CompressionMiddleware(
+    app.wsgi_app,
+    min_size=int(os.environ.get('COMPRESS_MIN_SIZE', '1024')),
+    level=int(os.environ.get('COMPRESS_LEVEL', '6')),
+    cache_bytes=int(os.environ.get('COMPRESS_CACHE_BYTES', str(8 * 1024 * 1024)))
+)
 
 # Health check endpoint
 @app.route('/api/health', methods=['GET'])
 def health_check():
     return jsonify({'status': 'ok', 'message': 'AutoParts Invoice Manager API'}), 200
 
+# Prometheus metrics endpoint (aggregated across gunicorn workers);
+# METRICS_TOKEN guards it, production without a token serves nothing
+@app.route('/api/metrics', methods=['GET'])
+def prometheus_metrics():
+    if not metrics.scrape_allowed():
+        return jsonify({'error': 'Not found'}), 404
+    payload, content_type = metrics.render_latest()
+    return Response(payload, mimetype=content_type)
+
 # Database status endpoint
 @app.route('/api/db-status', methods=['GET'])
 def db_status():
     """Check database status and user count"""
     try:
-        # First ensure tables exist
-        init_db()
+        # First ensure tables exist (once per worker)
+        ensure_db()
         
         db = get_db()
         try:
@@ -97,7 +190,7 @@ def manual_seed():
     """Manually seed the database"""
     try:
         # Ensure tables exist first
-        init_db()
+        ensure_db()
         from seed import seed_database
         seed_database()
         return jsonify({'message': 'Database seeded successfully'}), 200
@@ -123,6 +216,13 @@ def not_found(error):
 def internal_error(error):
     return jsonify({'error': 'Internal server error'}), 500
 
+@app.errorhandler(OperationalError)
+def database_error(error):
+    if is_statement_timeout(error):
+        return jsonify({'error': 'Query took too long, please narrow the request'}), 503
+    app.logger.exception("database error")
+    return jsonify({'error': 'Internal server error'}), 500
+
 if __name__ == '__main__':
     # Initialize database on first run
     init_db()
@@ -1,12 +1,36 @@
 """
 Authentication routes using Flask-Login
 """
+import os
+from functools import wraps
 from flask import Blueprint, request, jsonify
 from flask_login import login_user, logout_user, login_required, current_user
 from models import get_db, User
+from services.passwords import PasswordHashingBusy
+from services.serializers import USER, json_response
 
 auth_bp = Blueprint('auth', __name__)
 
+# Accounts allowed to use the operator endpoints under /api/admin. Empty
+# unless set: the seeded demo account must never be an operator.
+ADMIN_EMAILS = {
+    email.strip().lower()
+    for email in os.environ.get('ADMIN_EMAILS', '').split(',')
+    if email.strip()
+}
+
+
+def admin_required(view):
+    """login_required plus membership in ADMIN_EMAILS"""
+    @wraps(view)
+    @login_required
+    def wrapper(*args, **kwargs):
+        if current_user.email.lower() not in ADMIN_EMAILS:
+            return jsonify({'error': 'Admin access required'}), 403
+        return view(*args, **kwargs)
+    return wrapper
+
+
 @auth_bp.route('/login', methods=['POST'])
 def login():
     """Login endpoint"""
@@ -22,20 +46,27 @@ def login():
     try:
         user = db.query(User).filter_by(email=email).first()
         
-        if not user or not user.check_password(password):
-            return jsonify({'error': 'Invalid email or password'}), 401
+        try:
+            if not user or not user.check_password(password):
+                return jsonify({'error': 'Invalid email or password'}), 401
+        except PasswordHashingBusy:
+            # Login storm: shed load rather than tie up every worker hashing
+            response = jsonify({'error': 'Server busy, please retry shortly'})
+            response.status_code = 503
+            response.headers['Retry-After'] = '1'
+            return response
+        
+        # Hash upgraded to the configured method/cost
+        if db.is_modified(user):
+            db.commit()
         
         # Log user in (creates session)
         login_user(user, remember=True)
         
-        return jsonify({
+        return json_response({
             'message': 'Login successful',
-            'user': {
-                'id': user.id,
-                'email': user.email,
-                'name': user.name
-            }
-        }), 200
+            'user': USER.obj(user)
+        })
     finally:
         db.close()
 
@@ -52,24 +83,16 @@ def logout():
 @login_required
 def get_current_user():
     """Get current authenticated user"""
-    return jsonify({
-        'id': current_user.id,
-        'email': current_user.email,
-        'name': current_user.name
-    }), 200
+    return json_response(USER.obj(current_user))
 
 
 @auth_bp.route('/check', methods=['GET'])
 def check_auth():
     """Check if user is authenticated (no @login_required to avoid redirect)"""
     if current_user.is_authenticated:
-        return jsonify({
+        return json_response({
             'authenticated': True,
-            'user': {
-                'id': current_user.id,
-                'email': current_user.email,
-                'name': current_user.name
-            }
-        }), 200
+            'user': USER.obj(current_user)
+        })
     else:
         return jsonify({'authenticated': False}), 200
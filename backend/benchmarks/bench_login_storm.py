@@ -0,0 +1,169 @@
+"""
+Login storm benchmark
+Starts gunicorn (gunicorn_config.py, seeded SQLite file) and fires
+concurrent logins at it for a while, as at shift start across branches
+(shed clients wait out Retry-After), while a signed-in client keeps
+loading the invoice list. Reports login throughput, shed logins (429/503)
+and the invoice list latency before and during the storm.
+
+Runs twice: "unbounded" lifts the login concurrency cap and the hashing
+queue (every worker may sit in a password hash, like before), "bounded"
+uses the defaults. Per-IP rate limits are lifted in both so only the
+backpressure is measured.
+
+Usage (from backend/):
+    python benchmarks/bench_login_storm.py [--clients 24] [--seconds 10]
+"""
+import argparse
+import contextlib
+import http.client
+import io
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+CREDENTIALS = {'email': 'admin@autoparts.com', 'password': 'admin123'}
+
+MODES = [
+    ('unbounded', {'CONCURRENCY_LIMITS': 'login=1000', 'PASSWORD_HASH_QUEUE': '1000'}),
+    ('bounded', {}),
+]
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def _request(port, method, path, body=None, cookie=None):
+    """(status, seconds, response headers) of one request on a fresh connection"""
+    headers = {'Content-Type': 'application/json'}
+    if cookie:
+        headers['Cookie'] = cookie
+    started = time.perf_counter()
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+    try:
+        conn.request(method, path, body=json.dumps(body) if body is not None else None, headers=headers)
+        response = conn.getresponse()
+        response.read()
+        return response.status, time.perf_counter() - started, response.msg
+    finally:
+        conn.close()
+
+
+def _probe(port, cookie, stop, latencies):
+    while not stop.is_set():
+        status, seconds, _ = _request(port, 'GET', '/api/invoices', cookie=cookie)
+        latencies.append(seconds if status == 200 else float('inf'))
+        time.sleep(0.05)
+
+
+def _storm(port, stop, statuses):
+    while not stop.is_set():
+        status, _, headers = _request(port, 'POST', '/api/auth/login', CREDENTIALS)
+        statuses.append(status)
+        if status in (429, 503):
+            stop.wait(float(headers.get('Retry-After', 1)))
+
+
+def _summary(latencies):
+    ordered = sorted(latencies)
+    p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+    return f"p50 {statistics.median(ordered) * 1000:6.0f}ms  p95 {p95 * 1000:6.0f}ms  max {ordered[-1] * 1000:6.0f}ms"
+
+
+def run(mode, overrides, workdir, clients, seconds):
+    port = _free_port()
+    env = dict(
+        os.environ,
+        PORT=str(port),
+        RATE_LIMITS='ip=1000/1000,user=1000/1000,login=1000/1000',
+        RATE_LIMIT_DB=os.path.join(workdir, f"ratelimit-{mode}.db"),
+        PROMETHEUS_MULTIPROC_DIR=os.path.join(workdir, f"metrics-{mode}"),
+        **overrides
+    )
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn_config.py', 'app:app'],
+        cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        for _ in range(100):
+            try:
+                if _request(port, 'GET', '/api/health')[0] == 200:
+                    break
+            except OSError:
+                time.sleep(0.1)
+        else:
+            raise RuntimeError('gunicorn did not start')
+
+        status, _, headers = _request(port, 'POST', '/api/auth/login', CREDENTIALS)
+        assert status == 200, status
+        cookie = '; '.join(value.split(';')[0] for value in headers.get_all('Set-Cookie'))
+
+        stop = threading.Event()
+        idle = []
+        probe = threading.Thread(target=_probe, args=(port, cookie, stop, idle))
+        probe.start()
+        time.sleep(2)
+        stop.set()
+        probe.join()
+
+        stop = threading.Event()
+        busy, statuses = [], []
+        threads = [threading.Thread(target=_storm, args=(port, stop, statuses)) for _ in range(clients)]
+        threads.append(threading.Thread(target=_probe, args=(port, cookie, stop, busy)))
+        for thread in threads:
+            thread.start()
+        time.sleep(seconds)
+        stop.set()
+        for thread in threads:
+            thread.join()
+
+        ok = statuses.count(200)
+        shed = sum(1 for s in statuses if s in (429, 503))
+        print(f"{mode}:")
+        print(f"  logins        {ok / seconds:6.1f}/s ok, {shed} shed (429/503), "
+              f"{len(statuses) - ok - shed} other")
+        print(f"  invoice list  idle   {_summary(idle)}")
+        print(f"  invoice list  storm  {_summary(busy)}")
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--clients', type=int, default=24, help='concurrent login clients')
+    parser.add_argument('--seconds', type=float, default=10)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='bench-login-')
+    os.environ.update(
+        DATABASE_URL=f"sqlite:///{workdir}/bench.db",
+        SHARED_CACHE_DB=os.path.join(workdir, 'cache.db'),
+        TENANT_CONTEXT_DIR=os.path.join(workdir, 'context'),
+        EVENTS_DIR=os.path.join(workdir, 'events'),
+    )
+    os.chdir(BACKEND_DIR)
+
+    from seed import seed_database
+    with contextlib.redirect_stdout(io.StringIO()):
+        seed_database()
+
+    print(f"{args.clients} login clients for {args.seconds:.0f}s, {os.cpu_count()} CPUs")
+    for mode, overrides in MODES:
+        run(mode, overrides, workdir, args.clients, args.seconds)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,132 @@
+"""
+Gunicorn concurrency profile benchmark
+Boots gunicorn with gunicorn_config.py once per GUNICORN_PROFILE against
+the same seeded SQLite database and drives a mixed read/PDF workload
+(~80% JSON reads, ~20% PDF downloads) from concurrent clients.
+
+Usage (from backend/):
+    python benchmarks/bench_profiles.py [--profiles sync,gthread] [--clients 16] [--duration 15]
+"""
+import argparse
+import http.cookiejar
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+WORKLOAD = [
+    (0.25, '/api/invoices'),
+    (0.20, '/api/customers'),
+    (0.15, '/api/dashboard/stats'),
+    (0.20, '/api/invoices/{invoice_id}'),
+    (0.20, '/api/invoices/{invoice_id}/pdf'),
+]
+
+
+def seed(db_url):
+    """Seed a fresh database in a child process (models binds the URL at import)"""
+    code = 'import contextlib, io\nfrom seed import seed_database\nwith contextlib.redirect_stdout(io.StringIO()):\n    seed_database()'
+    subprocess.run([sys.executable, '-c', code], cwd=BACKEND_DIR, check=True,
+                   env=dict(os.environ, DATABASE_URL=db_url))
+
+
+def wait_ready(base, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            with urllib.request.urlopen(f"{base}/api/health", timeout=1):
+                return
+        except OSError:
+            time.sleep(0.05)
+    raise RuntimeError('server did not start')
+
+
+def client_loop(base, stop, results, rng):
+    opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()))
+    login = urllib.request.Request(f"{base}/api/auth/login", method='POST',
+                                   data=json.dumps({'email': 'admin@autoparts.com', 'password': 'admin123'}).encode(),
+                                   headers={'Content-Type': 'application/json'})
+    opener.open(login).read()
+    weights = [w for w, _ in WORKLOAD]
+    paths = [p for _, p in WORKLOAD]
+    while not stop.is_set():
+        path = rng.choices(paths, weights)[0].format(invoice_id=rng.randint(1, 3))
+        kind = 'pdf' if path.endswith('/pdf') else 'read'
+        start = time.perf_counter()
+        try:
+            with opener.open(f"{base}{path}", timeout=35) as resp:
+                resp.read()
+            ok = True
+        except OSError:
+            ok = False
+        results.append((kind, time.perf_counter() - start, ok))
+
+
+def percentile(values, pct):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+def run_profile(profile, db_url, port, clients, duration):
+    env = dict(os.environ, DATABASE_URL=db_url, PORT=str(port), GUNICORN_PROFILE=profile)
+    env['PROMETHEUS_MULTIPROC_DIR'] = tempfile.mkdtemp(prefix='bench-metrics-')
+    env.setdefault('RATE_LIMIT_ENABLED', '0')
+    proc = subprocess.Popen([sys.executable, '-m', 'gunicorn', '-c', 'gunicorn_config.py', 'app:app'],
+                            cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    base = f"http://127.0.0.1:{port}"
+    try:
+        wait_ready(base)
+        stop = threading.Event()
+        results = []
+        threads = [threading.Thread(target=client_loop, args=(base, stop, results, random.Random(i)))
+                   for i in range(clients)]
+        for t in threads:
+            t.start()
+        time.sleep(duration)
+        stop.set()
+        for t in threads:
+            t.join()
+    finally:
+        proc.terminate()
+        proc.wait()
+
+    report = {'profile': profile, 'requests': len(results), 'rps': round(len(results) / duration, 1),
+              'errors': sum(1 for r in results if not r[2])}
+    for kind in ('read', 'pdf'):
+        latencies = [r[1] for r in results if r[0] == kind and r[2]]
+        report[kind] = {
+            'count': len(latencies),
+            'p50_ms': round(percentile(latencies, 50) * 1000, 1) if latencies else None,
+            'p95_ms': round(percentile(latencies, 95) * 1000, 1) if latencies else None,
+            'p99_ms': round(percentile(latencies, 99) * 1000, 1) if latencies else None,
+        }
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--profiles', default='sync,gthread')
+    parser.add_argument('--clients', type=int, default=16)
+    parser.add_argument('--duration', type=float, default=15)
+    parser.add_argument('--port', type=int, default=5097)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_url = f"sqlite:///{tmp}/bench.db"
+        seed(db_url)
+        reports = [run_profile(p, db_url, args.port, args.clients, args.duration)
+                   for p in args.profiles.split(',')]
+    print(json.dumps(reports, indent=2))
+
+
+if __name__ == '__main__':
+    main()
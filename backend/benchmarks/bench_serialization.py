@@ -0,0 +1,135 @@
+"""
+Serialization micro-benchmark
+Compares the old hand-built dicts + jsonify path against the shared
+schemas in services/serializers.py for a 1k-invoice page and a
+10k-customer list. No database needed.
+
+Usage (from backend/):
+    python benchmarks/bench_serialization.py [--repeat 20]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask, jsonify
+from services import serializers
+from services.serializers import CUSTOMER_LIST, INVOICE_LIST
+
+
+def make_customers(n):
+    """Row tuples in CUSTOMER_LIST column order"""
+    now = datetime(2024, 1, 1)
+    return [
+        (i, f"Customer {i:05d}", f"{i} Main Street\nSpringfield, IL 627{i % 100:02d}",
+         f"(555) {i % 1000:03d}-{i % 10000:04d}", f"customer{i}@example.com", now + timedelta(minutes=i))
+        for i in range(1, n + 1)
+    ]
+
+
+def make_invoices(n):
+    """Row tuples in INVOICE_LIST column order"""
+    now = datetime(2024, 1, 1)
+    return [
+        (i, f"20240101-{i:03d}", now + timedelta(hours=i), i % 97, round(100 + i * 1.37, 2),
+         'paid' if i % 3 else 'unpaid', 'Net 30 payment terms', f"Customer {i % 97}")
+        for i in range(1, n + 1)
+    ]
+
+
+def legacy_customers(rows):
+    """Per-attribute dict building as the endpoints did before"""
+    objs = [SimpleNamespace(id=r[0], name=r[1], address=r[2], phone=r[3], email=r[4], created_at=r[5]) for r in rows]
+    return lambda: jsonify([{
+        'id': c.id,
+        'name': c.name,
+        'address': c.address,
+        'phone': c.phone,
+        'email': c.email,
+        'created_at': c.created_at.isoformat() if c.created_at else None
+    } for c in objs]).get_data()
+
+
+def legacy_invoices(rows):
+    objs = [SimpleNamespace(id=r[0], invoice_number=r[1], invoice_date=r[2], customer_id=r[3],
+                            total=r[4], status=r[5], notes=r[6], customer=SimpleNamespace(name=r[7])) for r in rows]
+    return lambda: jsonify({
+        'data': [{
+            'id': inv.id,
+            'invoice_number': inv.invoice_number,
+            'invoice_date': inv.invoice_date.isoformat(),
+            'customer_name': inv.customer.name,
+            'customer_id': inv.customer_id,
+            'total': inv.total,
+            'status': inv.status,
+            'notes': inv.notes
+        } for inv in objs],
+        'total': len(objs),
+        'page': 1,
+        'per_page': len(objs)
+    }).get_data()
+
+
+def stdlib_dumps(payload):
+    return json.dumps(payload, default=serializers._default, separators=(',', ':')).encode('utf-8')
+
+
+def schema_path(schema, rows, dumps, wrap):
+    def run():
+        data = schema.rows(rows)
+        return dumps(wrap(data) if wrap else data)
+    return run
+
+
+def timeit(fn, repeat):
+    fn()  # warm up
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    app = Flask(__name__)
+    customers = make_customers(10_000)
+    invoices = make_invoices(1_000)
+    wrap_page = lambda data: {'data': data, 'total': len(data), 'page': 1, 'per_page': len(data)}
+
+    cases = [
+        ('10k customers', len(customers), [
+            ('legacy jsonify', legacy_customers(customers)),
+            ('schema + stdlib', schema_path(CUSTOMER_LIST, customers, stdlib_dumps, None)),
+            ('schema + dumps', schema_path(CUSTOMER_LIST, customers, serializers.dumps, None)),
+        ]),
+        ('1k invoices', len(invoices), [
+            ('legacy jsonify', legacy_invoices(invoices)),
+            ('schema + stdlib', schema_path(INVOICE_LIST, invoices, stdlib_dumps, wrap_page)),
+            ('schema + dumps', schema_path(INVOICE_LIST, invoices, serializers.dumps, wrap_page)),
+        ]),
+    ]
+
+    backend = 'orjson' if serializers.orjson is not None else 'stdlib json'
+    print(f"JSON backend for dumps(): {backend}")
+    with app.app_context():
+        for title, count, variants in cases:
+            print(f"\n{title}")
+            baseline = None
+            for label, fn in variants:
+                best = timeit(fn, args.repeat)
+                baseline = baseline or best
+                print(f"  {label:<16} {best * 1000:8.2f} ms  {count / best:12,.0f} rows/s  x{baseline / best:.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+"""
+Worker cold-start benchmark
+Each run happens in a fresh interpreter against a throwaway seeded SQLite
+database and reports:
+  - import_s:      time to `import app`
+  - first_api_s:   first /api/invoices request after import
+  - first_pdf_s:   first PDF download (includes the lazy ReportLab import)
+With --gunicorn it also boots gunicorn with gunicorn_config.py and reports
+the time until /api/health first answers.
+
+Usage (from backend/):
+    python benchmarks/bench_startup.py [--runs 5] [--prewarm] [--gunicorn]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CHILD = r'''
+import contextlib, io, json, time
+t0 = time.perf_counter()
+import app as app_module
+t1 = time.perf_counter()
+from seed import seed_database
+with contextlib.redirect_stdout(io.StringIO()):
+    seed_database()
+client = app_module.app.test_client()
+client.post('/api/auth/login', json={'email': 'admin@autoparts.com', 'password': 'admin123'})
+t2 = time.perf_counter()
+assert client.get('/api/invoices').status_code == 200
+t3 = time.perf_counter()
+assert client.get('/api/invoices/1/pdf').status_code == 200
+t4 = time.perf_counter()
+print(json.dumps({'import_s': t1 - t0, 'first_api_s': t3 - t2, 'first_pdf_s': t4 - t3}))
+'''
+
+
+def run_child(prewarm):
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(os.environ, DATABASE_URL=f"sqlite:///{tmp}/bench.db")
+        env.pop('PROMETHEUS_MULTIPROC_DIR', None)
+        if prewarm:
+            env['PDF_PREWARM'] = '1'
+        out = subprocess.run([sys.executable, '-c', CHILD], cwd=BACKEND_DIR, env=env,
+                             capture_output=True, text=True, check=True)
+        return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def run_gunicorn(port, prewarm):
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(os.environ, DATABASE_URL=f"sqlite:///{tmp}/bench.db", PORT=str(port),
+                   PROMETHEUS_MULTIPROC_DIR=os.path.join(tmp, 'metrics'))
+        if prewarm:
+            env['PDF_PREWARM'] = '1'
+        start = time.perf_counter()
+        proc = subprocess.Popen([sys.executable, '-m', 'gunicorn', '-c', 'gunicorn_config.py', 'app:app'],
+                                cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            while time.perf_counter() - start < 30:
+                try:
+                    with urllib.request.urlopen(f"http://127.0.0.1:{port}/api/health", timeout=1) as resp:
+                        if resp.status == 200:
+                            return time.perf_counter() - start
+                except OSError:
+                    time.sleep(0.02)
+            raise RuntimeError('gunicorn did not answer within 30s')
+        finally:
+            proc.terminate()
+            proc.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--prewarm', action='store_true', help='set PDF_PREWARM=1 (import ReportLab at boot)')
+    parser.add_argument('--gunicorn', action='store_true', help='also measure gunicorn boot to first /api/health')
+    parser.add_argument('--port', type=int, default=5099)
+    args = parser.parse_args()
+
+    samples = [run_child(args.prewarm) for _ in range(args.runs)]
+    report = {
+        key: round(statistics.median(s[key] for s in samples), 4)
+        for key in ('import_s', 'first_api_s', 'first_pdf_s')
+    }
+    report['runs'] = args.runs
+    report['pdf_prewarm'] = args.prewarm
+    if args.gunicorn:
+        report['gunicorn_first_health_s'] = round(statistics.median(
+            run_gunicorn(args.port, args.prewarm) for _ in range(args.runs)), 4)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+"""
+Per-request Python overhead benchmark
+Runs the invoice list, invoice detail and dashboard endpoints in-process
+(Flask test client, seeded SQLite file) and splits each request's wall
+time into time inside the database driver and everything else (routing,
+auth, building/compiling SQL, serialization). Also reports how often
+SQLAlchemy's compiled cache was hit. Caches that would hide the queries
+(shared cache, rate limiting) are turned off.
+
+Usage (from backend/):
+    python benchmarks/bench_statements.py [--requests 2000] [--invoices 500]
+"""
+import argparse
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+ENDPOINTS = [
+    ('invoice list', '/api/invoices?per_page=20'),
+    ('invoice list (filtered)', '/api/invoices?status=unpaid&per_page=20'),
+    ('invoice detail', '/api/invoices/{invoice_id}'),
+    ('dashboard', '/api/dashboard/stats'),
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--invoices', type=int, default=500)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='bench-statements-')
+    os.environ.update(
+        DATABASE_URL=f"sqlite:///{workdir}/bench.db",
+        RATE_LIMIT_ENABLED='0',
+        SHARED_CACHE_ENABLED='0',
+        SLOW_QUERY_MS='100000',
+        TENANT_CONTEXT_DIR=os.path.join(workdir, 'context'),
+    )
+    os.chdir(BACKEND_DIR)
+
+    from sqlalchemy import event
+    from app import app
+    from models import engine, get_db, Invoice
+    from seed import seed_database
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        seed_database()
+    db = get_db()
+    try:
+        template = db.query(Invoice).first()
+        db.execute(Invoice.__table__.insert(), [dict(
+            user_id=template.user_id, customer_id=template.customer_id, invoice_number=f"BENCH-{i:06d}",
+            invoice_date=template.invoice_date, subtotal=100, tax_rate=8.25, tax_amount=8.25, total=108.25,
+            status='paid' if i % 2 else 'unpaid', change_seq=0
+        ) for i in range(args.invoices)])
+        db.commit()
+        invoice_id = template.id
+    finally:
+        db.close()
+
+    stats = {'db': 0.0, 'statements': 0, 'hits': 0}
+
+    @event.listens_for(engine, 'before_cursor_execute')
+    def _start(conn, cursor, statement, parameters, context, executemany):
+        conn.info['bench_start'] = time.perf_counter()
+
+    @event.listens_for(engine, 'after_cursor_execute')
+    def _stop(conn, cursor, statement, parameters, context, executemany):
+        stats['db'] += time.perf_counter() - conn.info.pop('bench_start')
+        stats['statements'] += 1
+        stats['hits'] += context.cache_hit == context.dialect.CACHE_HIT
+
+    client = app.test_client()
+    response = client.post('/api/auth/login', json={'email': 'admin@autoparts.com', 'password': 'admin123'})
+    assert response.status_code == 200, response.data
+
+    print(f"{'endpoint':<26}{'total us':>10}{'db us':>10}{'python us':>11}{'stmts':>7}{'compiled cache':>16}")
+    for label, path in ENDPOINTS:
+        path = path.format(invoice_id=invoice_id)
+        for _ in range(50):  # warm up (first compile of every statement)
+            assert client.get(path).status_code == 200
+        stats.update(db=0.0, statements=0, hits=0)
+        started = time.perf_counter()
+        for _ in range(args.requests):
+            client.get(path)
+        elapsed = time.perf_counter() - started
+        per_request = elapsed / args.requests * 1e6
+        db_time = stats['db'] / args.requests * 1e6
+        hit_ratio = stats['hits'] / stats['statements'] if stats['statements'] else 0
+        print(f"{label:<26}{per_request:>10.0f}{db_time:>10.0f}{per_request - db_time:>11.0f}"
+              f"{stats['statements'] / args.requests:>7.1f}{hit_ratio:>15.0%}")
+
+
+if __name__ == '__main__':
+    main()
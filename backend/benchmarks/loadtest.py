@@ -0,0 +1,290 @@
+"""
+Reproducible load test for the API
+Boots the Flask app against a throwaway SQLite database filled by
+seed.py's bulk generator, drives a weighted mix of login, invoice
+list/detail/PDF, customer list and dashboard requests at each concurrency
+level, and writes a JSON report with throughput, p50/p95/p99 latency and
+SQL queries per request for every endpoint.
+
+Usage (from backend/):
+    python benchmarks/loadtest.py --users 4 --invoices 20000 \\
+        --concurrency 1,8,32 --duration 10 --output load.json
+    # Compare against an earlier release (exit code 1 on regression)
+    python benchmarks/loadtest.py ... --baseline load-v1.json --tolerance 0.25
+"""
+import argparse
+import http.cookiejar
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from datetime import datetime
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+
+PASSWORD = 'admin123'
+
+# (weight, endpoint name, method, path template)
+TRAFFIC = [
+    (30, 'list_invoices', 'GET', '/api/invoices?page={page}'),
+    (15, 'list_customers', 'GET', '/api/customers'),
+    (15, 'dashboard_stats', 'GET', '/api/dashboard/stats'),
+    (25, 'get_invoice', 'GET', '/api/invoices/{invoice_id}'),
+    (10, 'invoice_pdf', 'GET', '/api/invoices/{invoice_id}/pdf'),
+    (5, 'login', 'POST', '/api/auth/login'),
+]
+
+# --- server side (runs in a child process bound to the benchmark DB) ---
+
+def instrumented_app():
+    """The real app plus an X-Query-Count response header"""
+    sys.path.insert(0, BACKEND_DIR)
+    from flask import g, has_app_context
+    from sqlalchemy import event
+    from app import app
+    from models import engine
+
+    @event.listens_for(engine, 'before_cursor_execute')
+    def _count_query(conn, cursor, statement, parameters, context, executemany):
+        if has_app_context():
+            g._query_count = g.get('_query_count', 0) + 1
+
+    @app.after_request
+    def _query_header(response):
+        response.headers['X-Query-Count'] = str(g.get('_query_count', 0))
+        return response
+
+    return app
+
+
+def populate(users, customers_per_user, invoices, seed):
+    """Generate the data set with seed.py's bulk generator and return, per
+    user, the login email and a sample of their invoice ids"""
+    sys.path.insert(0, BACKEND_DIR)
+    from sqlalchemy import select
+    from seed import generate_bulk_data
+    from models import engine, User, Invoice
+
+    generate_bulk_data(users=users, customers_per_user=customers_per_user, invoices=invoices,
+                       seed=seed, password=PASSWORD)
+    tenants = []
+    with engine.connect() as conn:
+        for user_id, email in conn.execute(select(User.id, User.email).order_by(User.id)):
+            ids = conn.execute(select(Invoice.id).where(Invoice.user_id == user_id)
+                               .order_by(Invoice.id).limit(500)).scalars().all()
+            if ids:
+                tenants.append({'email': email, 'invoice_ids': ids})
+    return tenants
+
+
+def serve(port):
+    from werkzeug.serving import make_server
+    make_server('127.0.0.1', port, instrumented_app(), threaded=True).serve_forever()
+
+
+# --- client side ---
+
+class Client:
+    """One simulated browser session"""
+
+    def __init__(self, base, email):
+        self.base = base
+        self.email = email
+        self.opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()))
+
+    def request(self, method, path, body=None):
+        data = json.dumps(body).encode() if body is not None else None
+        req = urllib.request.Request(self.base + path, data=data, method=method,
+                                     headers={'Content-Type': 'application/json'} if data else {})
+        try:
+            with self.opener.open(req, timeout=60) as resp:
+                resp.read()
+                return resp.status, int(resp.headers.get('X-Query-Count', 0))
+        except urllib.error.HTTPError as e:
+            e.read()
+            return e.code, int(e.headers.get('X-Query-Count', 0))
+        except OSError:
+            return 0, 0
+
+    def login(self):
+        return self.request('POST', '/api/auth/login', {'email': self.email, 'password': PASSWORD})
+
+
+def drive(base, concurrency, duration, tenants, seed):
+    samples = []
+    lock = threading.Lock()
+    stop = threading.Event()
+    weights = [t[0] for t in TRAFFIC]
+
+    def worker(index):
+        rng = random.Random(seed * 1000 + index)
+        tenant = tenants[index % len(tenants)]
+        client = Client(base, tenant['email'])
+        client.login()
+        local = []
+        while not stop.is_set():
+            _, name, method, template = rng.choices(TRAFFIC, weights)[0]
+            path = template.format(page=rng.randint(1, 5), invoice_id=rng.choice(tenant['invoice_ids']))
+            body = {'email': tenant['email'], 'password': PASSWORD} if method == 'POST' else None
+            start = time.perf_counter()
+            status, queries = client.request(method, path, body)
+            local.append((name, time.perf_counter() - start, status, queries))
+        with lock:
+            samples.extend(local)
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(concurrency)]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    time.sleep(duration)
+    stop.set()
+    for t in threads:
+        t.join()
+    return samples, time.perf_counter() - started
+
+
+def percentile(sorted_values, pct):
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * pct / 100))]
+
+
+def summarize(samples, elapsed):
+    endpoints = {}
+    for name in sorted({s[0] for s in samples}):
+        rows = [s for s in samples if s[0] == name]
+        ok = sorted(s[1] for s in rows if 200 <= s[2] < 400)
+        endpoints[name] = {
+            'count': len(rows),
+            'errors': len(rows) - len(ok),
+            'rps': round(len(rows) / elapsed, 2),
+            'p50_ms': round(percentile(ok, 50) * 1000, 2) if ok else None,
+            'p95_ms': round(percentile(ok, 95) * 1000, 2) if ok else None,
+            'p99_ms': round(percentile(ok, 99) * 1000, 2) if ok else None,
+            'queries_per_request': round(sum(s[3] for s in rows) / len(rows), 2),
+        }
+    return {'requests': len(samples), 'rps': round(len(samples) / elapsed, 2), 'endpoints': endpoints}
+
+
+def compare(report, baseline, tolerance):
+    """List p95/query-count regressions beyond tolerance versus a baseline report"""
+    problems = []
+    base_levels = {lvl['concurrency']: lvl for lvl in baseline.get('levels', [])}
+    for level in report['levels']:
+        base = base_levels.get(level['concurrency'])
+        if not base:
+            continue
+        for name, stats in level['endpoints'].items():
+            old = base['endpoints'].get(name)
+            if not old:
+                continue
+            if old['p95_ms'] and stats['p95_ms'] and stats['p95_ms'] > old['p95_ms'] * (1 + tolerance):
+                problems.append(f"c={level['concurrency']} {name}: p95 {old['p95_ms']}ms -> {stats['p95_ms']}ms")
+            if stats['queries_per_request'] > old['queries_per_request'] + 0.01:
+                problems.append(f"c={level['concurrency']} {name}: queries "
+                                f"{old['queries_per_request']} -> {stats['queries_per_request']}")
+    return problems
+
+
+def wait_ready(base, proc, timeout=60):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError('server exited during startup')
+        try:
+            with urllib.request.urlopen(base + '/api/health', timeout=1):
+                return
+        except OSError:
+            time.sleep(0.05)
+    raise RuntimeError('server did not start')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=4, help='tenants; clients are spread over them')
+    parser.add_argument('--customers-per-user', type=int, default=200)
+    parser.add_argument('--invoices', type=int, default=20000)
+    parser.add_argument('--concurrency', default='1,8,32', help='comma-separated client counts')
+    parser.add_argument('--duration', type=float, default=10, help='seconds per concurrency level')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--server', choices=('werkzeug', 'gunicorn'), default='werkzeug')
+    parser.add_argument('--port', type=int, default=5096)
+    parser.add_argument('--output', help='write the JSON report here (default: stdout)')
+    parser.add_argument('--baseline', help='earlier JSON report to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='allowed p95 slowdown vs baseline')
+    parser.add_argument('--_populate', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--_serve', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args._populate:
+        print(json.dumps(populate(args.users, args.customers_per_user, args.invoices, args.seed)))
+        return
+    if args._serve:
+        serve(args.port)
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(os.environ, DATABASE_URL=f"sqlite:///{tmp}/loadtest.db", PORT=str(args.port),
+                   PROMETHEUS_MULTIPROC_DIR=os.path.join(tmp, 'metrics'),
+                   RATE_LIMIT_DB=os.path.join(tmp, 'ratelimit.db'))
+        # Measure capacity, not the limiter (RATE_LIMIT_ENABLED=1 to include it)
+        env.setdefault('RATE_LIMIT_ENABLED', '0')
+        os.makedirs(env['PROMETHEUS_MULTIPROC_DIR'])
+        seed_start = time.perf_counter()
+        out = subprocess.run([sys.executable, __file__, '--_populate', '--users', str(args.users),
+                              '--customers-per-user', str(args.customers_per_user), '--invoices', str(args.invoices),
+                              '--seed', str(args.seed)], cwd=BACKEND_DIR, env=env, check=True,
+                             capture_output=True, text=True)
+        tenants = json.loads(out.stdout.strip().splitlines()[-1])
+        seed_seconds = time.perf_counter() - seed_start
+
+        if args.server == 'gunicorn':
+            cmd = [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn_config.py', '--pythonpath', BENCH_DIR,
+                   'loadtest:instrumented_app()']
+        else:
+            cmd = [sys.executable, __file__, '--_serve', '--port', str(args.port)]
+        proc = subprocess.Popen(cmd, cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        base = f"http://127.0.0.1:{args.port}"
+        try:
+            wait_ready(base, proc)
+            Client(base, tenants[0]['email']).login()  # warm up (lazy imports, first connections)
+            levels = []
+            for concurrency in [int(c) for c in args.concurrency.split(',')]:
+                samples, elapsed = drive(base, concurrency, args.duration, tenants, args.seed)
+                levels.append(dict(concurrency=concurrency, **summarize(samples, elapsed)))
+        finally:
+            proc.terminate()
+            proc.wait()
+
+    report = {
+        'generated_at': datetime.utcnow().isoformat(),
+        'config': {
+            'users': args.users, 'customers_per_user': args.customers_per_user, 'invoices': args.invoices,
+            'duration_s': args.duration, 'seed': args.seed, 'server': args.server,
+            'seed_seconds': round(seed_seconds, 2),
+        },
+        'levels': levels,
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text)
+    else:
+        print(text)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            problems = compare(report, json.load(f), args.tolerance)
+        for problem in problems:
+            print(f"REGRESSION {problem}", file=sys.stderr)
+        if problems:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,18 +1,89 @@
 """
 Gunicorn configuration for production
 """
+import glob
 import os
 
+# Multiprocess metrics: every worker writes its samples here and
+# /api/metrics aggregates them. Must exist before the app is imported,
+# which happens in the master with preload_app; on_starting clears what
+# earlier masters left behind (never at import: that would also wipe the
+# metrics of a server that is still running, e.g. on --check-config).
+os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR', '/tmp/autoparts-metrics')
+os.makedirs(os.environ['PROMETHEUS_MULTIPROC_DIR'], exist_ok=True)
+
 # Server socket
 bind = f"0.0.0.0:{os.environ.get('PORT', '5000')}"
 backlog = 2048
 
 # Worker processes
-workers = 2
-worker_class = 'sync'
-worker_connections = 1000
+# GUNICORN_PROFILE selects the concurrency model:
+#   sync    - one request per process (old default, most memory per request)
+#   gthread - N threads per process; I/O waits (DB, network) overlap
+# WEB_CONCURRENCY / GUNICORN_THREADS override the derived numbers.
+profile = os.environ.get('GUNICORN_PROFILE', 'sync')
+if profile not in ('sync', 'gthread'):
+    raise ValueError(f"Unknown GUNICORN_PROFILE: {profile}")
+
+
+def _memory_limit_mb():
+    """Container memory limit (cgroup v2/v1) or physical RAM, in MB"""
+    for path in ('/sys/fs/cgroup/memory.max', '/sys/fs/cgroup/memory/memory.limit_in_bytes'):
+        try:
+            with open(path) as f:
+                value = f.read().strip()
+            if value.isdigit() and int(value) < 1 << 60:
+                return int(value) // (1024 * 1024)
+        except OSError:
+            pass
+    try:
+        return os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES') // (1024 * 1024)
+    except (ValueError, OSError):
+        return 1024
+
+
+def _default_workers(cpus):
+    """CPU-derived worker count capped by what fits in memory"""
+    by_cpu = 2 * cpus + 1 if profile == 'sync' else cpus + 1
+    # ~150MB RSS per worker once ReportLab is loaded; keep a quarter for the OS/DB
+    per_worker_mb = int(os.environ.get('WORKER_MEMORY_MB', '150'))
+    by_memory = max(1, (_memory_limit_mb() * 3 // 4) // per_worker_mb)
+    return max(2, min(by_cpu, by_memory))
+
+
+cpu_count = len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else (os.cpu_count() or 1)
+workers = int(os.environ.get('WEB_CONCURRENCY', _default_workers(cpu_count)))
+worker_class = profile
+threads = int(os.environ.get('GUNICORN_THREADS', '4' if profile == 'gthread' else '1'))
+if profile == 'sync' and threads != 1:
+    # gunicorn would quietly run gthread workers sized (and SSE-capped) for sync
+    raise ValueError('GUNICORN_THREADS needs GUNICORN_PROFILE=gthread')
 timeout = 30
-keepalive = 2
+graceful_timeout = 20
+keepalive = 5 if profile == 'gthread' else 2
+
+# Recycle workers to contain slow memory growth (ReportLab caches, fragmentation);
+# jitter keeps them from all restarting at once
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', '1000'))
+max_requests_jitter = int(os.environ.get('GUNICORN_MAX_REQUESTS_JITTER', '100'))
+
+# One pooled DB connection per thread so no request waits on the pool
+os.environ.setdefault('DB_POOL_SIZE', str(threads))
+
+# Each live-update (SSE) stream pins a thread: none on sync workers, and at
+# most half the threads of a gthread worker
+os.environ.setdefault('SSE_MAX_STREAMS', '0' if profile == 'sync' else str(max(threads // 2, 1)))
+
+# PDF renders may occupy at most half of all request slots, so other pages
+# stay responsive while someone downloads a stack of invoices; logins (a
+# CPU-bound password hash each) get at most all but one core
+os.environ.setdefault(
+    'CONCURRENCY_LIMITS', f"pdf={max(workers * threads // 2, 1)},login={max(cpu_count - 1, 1)}"
+)
+
+# Load the app once in the master and fork workers from it (copy-on-write).
+# post_fork drops the inherited DB pool so workers never share sockets.
+preload_app = True
 
 # Logging
 accesslog = '-'
@@ -31,5 +102,30 @@ user = None
 group = None
 tmp_upload_dir = None
 
+
+def on_starting(server):
+    """Drop metric files of earlier masters (this one's preload wrote its own already)"""
+    own = f"_{os.getpid()}.db"
+    for path in glob.glob(os.path.join(os.environ['PROMETHEUS_MULTIPROC_DIR'], '*.db')):
+        if not path.endswith(own):
+            os.unlink(path)
+
+
+def post_fork(server, worker):
+    """Give each worker its own connection pool"""
+    from models import dispose_engine
+    dispose_engine()
+
+
+def child_exit(server, worker):
+    """Drop live gauges and the event socket of dead workers"""
+    from services.metrics import mark_process_dead
+    mark_process_dead(worker.pid)
+    events_dir = os.environ.get('EVENTS_DIR', '/tmp/autoparts-events')
+    try:
+        os.unlink(os.path.join(events_dir, f"{worker.pid}.sock"))
+    except OSError:
+        pass
+
 # SSL (handled by Render)
 # No need to configure SSL here
@@ -0,0 +1,292 @@
+"""
+WSGI response compression
+Negotiates Accept-Encoding (brotli/zstd when installed, gzip always) for
+text-like responses above a size threshold. Streaming responses (no
+Content-Length) are compressed chunk by chunk and flushed, never
+buffered. Compressed copies of responses carrying an ETag (PDF downloads,
+cacheable JSON) are kept in a small LRU so repeated downloads skip the
+compressor.
+"""
+import threading
+import zlib
+from collections import OrderedDict
+from services.metrics import record_cache
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - optional
+    zstandard = None
+
+# Types worth compressing; everything else (images, zip, ...) passes through
+COMPRESSIBLE_TYPES = frozenset([
+    'application/json',
+    'application/x-ndjson',
+    'text/csv',
+    'text/plain',
+    'text/html',
+    'text/event-stream',
+    'application/pdf',  # ReportLab only deflates page streams; xref/fonts still shrink ~30%
+])
+
+
+class _Gzip:
+    def __init__(self, level):
+        self._z = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, data):
+        return self._z.compress(data)
+
+    def flush(self):
+        return self._z.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        return self._z.flush(zlib.Z_FINISH)
+
+
+class _Brotli:
+    def __init__(self, level):
+        self._c = brotli.Compressor(quality=min(level, 11))
+
+    def compress(self, data):
+        return self._c.process(data)
+
+    def flush(self):
+        return self._c.flush()
+
+    def finish(self):
+        return self._c.finish()
+
+
+class _Zstd:
+    def __init__(self, level):
+        self._c = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def compress(self, data):
+        return self._c.compress(data)
+
+    def flush(self):
+        return self._c.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def finish(self):
+        return self._c.flush(zstandard.COMPRESSOBJ_FLUSH_FINISH)
+
+
+def available_encoders():
+    """Encodings in server preference order"""
+    encoders = OrderedDict()
+    if brotli is not None:
+        encoders['br'] = _Brotli
+    if zstandard is not None:
+        encoders['zstd'] = _Zstd
+    encoders['gzip'] = _Gzip
+    return encoders
+
+
+def negotiate(accept_encoding, encoders):
+    """Pick the best encoding from an Accept-Encoding header (None if none acceptable)"""
+    if not accept_encoding:
+        return None
+    weights = {}
+    for part in accept_encoding.split(','):
+        token, _, params = part.strip().partition(';')
+        token = token.strip().lower()
+        q = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        weights[token] = q
+    wildcard = weights.get('*', 0.0)
+    best, best_q = None, 0.0
+    for name in encoders:
+        q = weights.get(name, wildcard)
+        if q > best_q:
+            best, best_q = name, q
+    return best
+
+
+class CompressionMiddleware:
+    """Compress eligible responses of the wrapped WSGI app"""
+
+    def __init__(self, app, min_size=1024, level=6, cache_bytes=8 * 1024 * 1024,
+                 compressible_types=COMPRESSIBLE_TYPES):
+        self.app = app
+        self.min_size = min_size
+        self.level = level
+        self.cache_bytes = cache_bytes
+        self.compressible_types = compressible_types
+        self.encoders = available_encoders()
+        self._cache = OrderedDict()
+        self._cache_size = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, environ, start_response):
+        encoding = None
+        if environ.get('REQUEST_METHOD') != 'HEAD':
+            encoding = negotiate(environ.get('HTTP_ACCEPT_ENCODING', ''), self.encoders)
+
+        captured = {}
+
+        def capture(status, headers, exc_info=None):
+            if exc_info is not None and captured.get('sent'):
+                raise exc_info[1].with_traceback(exc_info[2])
+            captured['status'] = status
+            captured['headers'] = headers
+            captured['exc_info'] = exc_info
+            return lambda data: None  # legacy write() unsupported
+
+        app_iter = self.app(environ, capture)
+        if 'status' not in captured:
+            # App delays start_response until its first chunk
+            app_iter = _Prepend(app_iter)
+            if 'status' not in captured:
+                # Ended without ever starting a response: nothing to compress
+                return app_iter
+
+        status, headers = captured['status'], captured['headers']
+        decision = self._plan(status, headers)
+        if decision is None:
+            return self._passthrough(app_iter, start_response, status, headers, captured)
+
+        headers = _set_header(headers, 'Vary', _merge_vary(_get_header(headers, 'Vary')))
+        if encoding is None or decision == 'small':
+            return self._passthrough(app_iter, start_response, status, headers, captured)
+
+        headers = _set_header(headers, 'Content-Encoding', encoding)
+        etag = _get_header(headers, 'ETag')
+        if etag:
+            # Compressed bytes differ from the identity representation
+            headers = _set_header(headers, 'ETag', etag if etag.startswith('W/') else 'W/' + etag)
+
+        if decision == 'stream':
+            headers = _drop_header(headers, 'Content-Length')
+            captured['sent'] = True
+            start_response(status, headers, captured['exc_info'])
+            return self._stream(app_iter, encoding)
+
+        key = None
+        if etag and 'no-store' not in (_get_header(headers, 'Cache-Control') or ''):
+            key = (environ.get('PATH_INFO'), environ.get('QUERY_STRING'), etag, encoding)
+        body = self._cache_get(key) if key else None
+        if key:
+            record_cache('compression', body is not None)
+        if body is None:
+            try:
+                encoder = self.encoders[encoding](self.level)
+                body = b''.join(encoder.compress(chunk) for chunk in app_iter if chunk) + encoder.finish()
+            finally:
+                _close(app_iter)
+            if key:
+                self._cache_put(key, body)
+        else:
+            _close(app_iter)
+
+        headers = _set_header(headers, 'Content-Length', str(len(body)))
+        captured['sent'] = True
+        start_response(status, headers, captured['exc_info'])
+        return [body]
+
+    def _plan(self, status, headers):
+        """None = not compressible, 'small' = below threshold, 'buffered' or 'stream'"""
+        code = int(status.split(' ', 1)[0])
+        if code < 200 or code >= 300 or code in (204, 206):
+            return None
+        if _get_header(headers, 'Content-Encoding'):
+            return None
+        content_type = (_get_header(headers, 'Content-Type') or '').split(';', 1)[0].strip().lower()
+        if content_type not in self.compressible_types:
+            return None
+        length = _get_header(headers, 'Content-Length')
+        if length is None:
+            return 'stream'
+        return 'small' if int(length) < self.min_size else 'buffered'
+
+    def _passthrough(self, app_iter, start_response, status, headers, captured):
+        captured['sent'] = True
+        start_response(status, headers, captured['exc_info'])
+        return app_iter
+
+    def _stream(self, app_iter, encoding):
+        encoder = self.encoders[encoding](self.level)
+        try:
+            for chunk in app_iter:
+                if chunk:
+                    # Sync flush keeps NDJSON/SSE lines moving to the client
+                    yield encoder.compress(chunk) + encoder.flush()
+            yield encoder.finish()
+        finally:
+            _close(app_iter)
+
+    def _cache_get(self, key):
+        with self._lock:
+            body = self._cache.get(key)
+            if body is not None:
+                self._cache.move_to_end(key)
+            return body
+
+    def _cache_put(self, key, body):
+        if len(body) > self.cache_bytes // 4:
+            return
+        with self._lock:
+            old = self._cache.pop(key, None)
+            if old is not None:
+                self._cache_size -= len(old)
+            self._cache[key] = body
+            self._cache_size += len(body)
+            while self._cache_size > self.cache_bytes:
+                _, evicted = self._cache.popitem(last=False)
+                self._cache_size -= len(evicted)
+
+
+class _Prepend:
+    """Pull the first chunk so start_response has been called"""
+
+    def __init__(self, app_iter):
+        self._iter = iter(app_iter)
+        self._source = app_iter
+        self._first = [next(self._iter, b'')]
+
+    def __iter__(self):
+        yield from self._first
+        yield from self._iter
+
+    def close(self):
+        _close(self._source)
+
+
+def _close(app_iter):
+    close = getattr(app_iter, 'close', None)
+    if close is not None:
+        close()
+
+
+def _get_header(headers, name):
+    name = name.lower()
+    for key, value in headers:
+        if key.lower() == name:
+            return value
+    return None
+
+
+def _drop_header(headers, name):
+    name = name.lower()
+    return [(k, v) for k, v in headers if k.lower() != name]
+
+
+def _set_header(headers, name, value):
+    return _drop_header(headers, name) + [(name, value)]
+
+
+def _merge_vary(vary):
+    if not vary:
+        return 'Accept-Encoding'
+    if 'accept-encoding' in vary.lower() or vary.strip() == '*':
+        return vary
+    return f"{vary}, Accept-Encoding"
@@ -2,13 +2,41 @@
 SQLAlchemy models for AutoParts Invoice Manager
 """
 from datetime import datetime
-from sqlalchemy import create_engine, Column, Integer, String, Float, DateTime, ForeignKey, Text
+from sqlalchemy import (
+    create_engine, event, insert, inspect, select, Column, Integer, String, Float, DateTime, ForeignKey, Text, Index, Identity
+)
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.compiler import compiles
 from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.sql.expression import FunctionElement
 from sqlalchemy.orm import relationship, sessionmaker
-from werkzeug.security import generate_password_hash, check_password_hash
+from services.passwords import hash_password, verify_password
 
 Base = declarative_base()
 
+
+class next_id(FunctionElement):
+    """
+    Id default of tables whose ids stay in their shard's range
+    SQLite gives AUTOINCREMENT rows max(max rowid, sqlite_sequence) + 1, so
+    a moved-in tenant's higher ids would pull new rows into another shard's
+    range. Ids come from the sqlite_sequence row alone, which
+    reset_id_sequence() keeps inside the range; other databases use the
+    column's own sequence.
+    """
+    type = Integer()
+    inherit_cache = True
+
+@compiles(next_id)
+def _next_id(element, compiler, **kw):
+    return 'DEFAULT'
+
+@compiles(next_id, 'sqlite')
+def _next_id_sqlite(element, compiler, **kw):
+    # NULL (no sequence row yet) falls back to SQLite's own choice
+    return f"(SELECT seq + 1 FROM sqlite_sequence WHERE name = {compiler.process(element.clauses, **kw)})"
+
+
 class User(Base):
     """User model for authentication"""
     __tablename__ = 'users'
@@ -28,11 +56,14 @@ class User(Base):
         """Hash and set password (min 8 chars)"""
         if len(password) < 8:
             raise ValueError("Password must be at least 8 characters")
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = hash_password(password)
     
     def check_password(self, password):
-        """Verify password"""
-        return check_password_hash(self.password_hash, password)
+        """Verify password; an outdated hash is replaced (the caller commits)"""
+        matches, new_hash = verify_password(self.password_hash, password)
+        if new_hash:
+            self.password_hash = new_hash
+        return matches
     
     @property
     def is_authenticated(self):
@@ -54,7 +85,7 @@ class BusinessInfo(Base):
     """Business settings (one per user)"""
     __tablename__ = 'business_info'
     
-    id = Column(Integer, primary_key=True)
+    id = Column(Integer, Identity(), primary_key=True, default=next_id('business_info'))
     user_id = Column(Integer, ForeignKey('users.id'), nullable=False, unique=True)
     company_name = Column(String(200), nullable=False)
     address = Column(Text, nullable=False)
@@ -64,6 +95,8 @@ class BusinessInfo(Base):
     logo_url = Column(String(500))
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
+    __table_args__ = {'sqlite_autoincrement': True}  # ids never reused (shard id ranges)
+    
     # Relationships
     user = relationship('User', back_populates='business_info')
 
@@ -72,7 +105,7 @@ class Customer(Base):
     """Customer model"""
     __tablename__ = 'customers'
     
-    id = Column(Integer, primary_key=True)
+    id = Column(Integer, Identity(), primary_key=True, default=next_id('customers'))
     user_id = Column(Integer, ForeignKey('users.id'), nullable=False, index=True)
     name = Column(String(200), nullable=False)
     address = Column(Text)
@@ -80,6 +113,13 @@ class Customer(Base):
     email = Column(String(120))
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    change_seq = Column(Integer, nullable=False, default=0, server_default='0')  # per-user sync counter
+    
+    __table_args__ = (
+        Index('ix_customers_user_change_seq', 'user_id', 'change_seq'),
+        Index('ix_customers_user_name_id', 'user_id', 'name', 'id'),  # keyset pagination
+        {'sqlite_autoincrement': True}
+    )
     
     # Relationships
     user = relationship('User', back_populates='customers')
@@ -90,7 +130,7 @@ class Invoice(Base):
     """Invoice model"""
     __tablename__ = 'invoices'
     
-    id = Column(Integer, primary_key=True)
+    id = Column(Integer, Identity(), primary_key=True, default=next_id('invoices'))
     user_id = Column(Integer, ForeignKey('users.id'), nullable=False, index=True)
     customer_id = Column(Integer, ForeignKey('customers.id'), nullable=False)
     invoice_number = Column(String(50), nullable=False, unique=True, index=True)
@@ -103,6 +143,12 @@ class Invoice(Base):
     notes = Column(Text)
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    change_seq = Column(Integer, nullable=False, default=0, server_default='0')  # per-user sync counter
+    
+    __table_args__ = (
+        Index('ix_invoices_user_change_seq', 'user_id', 'change_seq'),
+        {'sqlite_autoincrement': True}
+    )
     
     # Relationships
     user = relationship('User', back_populates='invoices')
@@ -114,7 +160,7 @@ class InvoiceLineItem(Base):
     """Invoice line items (products/parts)"""
     __tablename__ = 'invoice_line_items'
     
-    id = Column(Integer, primary_key=True)
+    id = Column(Integer, Identity(), primary_key=True, default=next_id('invoice_line_items'))
     invoice_id = Column(Integer, ForeignKey('invoices.id'), nullable=False, index=True)
     product_name = Column(String(200), nullable=False)
     part_number = Column(String(100))
@@ -122,12 +168,99 @@ class InvoiceLineItem(Base):
     unit_price = Column(Float, nullable=False)
     line_total = Column(Float, nullable=False)
     
+    __table_args__ = {'sqlite_autoincrement': True}
+    
     # Relationships
     invoice = relationship('Invoice', back_populates='line_items')
 
 
+class InvoiceArchive(Base):
+    """Cold storage for old invoices (same columns and ids as invoices)"""
+    __tablename__ = 'invoices_archive'
+    
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    user_id = Column(Integer, ForeignKey('users.id'), nullable=False, index=True)
+    customer_id = Column(Integer, ForeignKey('customers.id'), nullable=False, index=True)
+    invoice_number = Column(String(50), nullable=False, unique=True)
+    invoice_date = Column(DateTime, nullable=False)
+    subtotal = Column(Float, nullable=False)
+    tax_rate = Column(Float, nullable=False)
+    tax_amount = Column(Float, nullable=False)
+    total = Column(Float, nullable=False)
+    status = Column(String(20), nullable=False)
+    notes = Column(Text)
+    created_at = Column(DateTime)
+    updated_at = Column(DateTime)
+    
+    # Relationships (read-only; lets archived invoices go through the PDF service)
+    customer = relationship('Customer', viewonly=True)
+    line_items = relationship('InvoiceLineItemArchive', viewonly=True, order_by='InvoiceLineItemArchive.id')
+
+
+class InvoiceLineItemArchive(Base):
+    """Cold storage for line items of archived invoices"""
+    __tablename__ = 'invoice_line_items_archive'
+    
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    invoice_id = Column(Integer, ForeignKey('invoices_archive.id'), nullable=False, index=True)
+    product_name = Column(String(200), nullable=False)
+    part_number = Column(String(100))
+    quantity = Column(Integer, nullable=False)
+    unit_price = Column(Float, nullable=False)
+    line_total = Column(Float, nullable=False)
+
+
+class SyncCounter(Base):
+    """Last change_seq handed out per user (see services/sync_service.py)"""
+    __tablename__ = 'sync_counters'
+    
+    user_id = Column(Integer, ForeignKey('users.id'), primary_key=True)
+    value = Column(Integer, nullable=False, default=0)
+
+
+class SyncTombstone(Base):
+    """Deleted customers/invoices, kept so delta sync can report them"""
+    __tablename__ = 'sync_tombstones'
+    
+    id = Column(Integer, Identity(), primary_key=True, default=next_id('sync_tombstones'))
+    user_id = Column(Integer, ForeignKey('users.id'), nullable=False)
+    entity = Column(String(20), nullable=False)  # customer/invoice
+    entity_id = Column(Integer, nullable=False)
+    change_seq = Column(Integer, nullable=False)
+    deleted_at = Column(DateTime, default=datetime.utcnow)
+    
+    __table_args__ = (
+        Index('ix_sync_tombstones_user_change_seq', 'user_id', 'change_seq'),
+        {'sqlite_autoincrement': True}
+    )
+
+
+class TenantShard(Base):
+    """Directory entry: the shard holding a tenant's data (no row = default shard)"""
+    __tablename__ = 'tenant_shards'
+    
+    user_id = Column(Integer, ForeignKey('users.id'), primary_key=True)
+    shard = Column(String(50), nullable=False)
+    status = Column(String(20), nullable=False, default='active')  # active/moving
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class ShardSlot(Base):
+    """Directory entry: a shard's id range starts at slot * SHARD_ID_SPAN (assigned once)"""
+    __tablename__ = 'shard_slots'
+    
+    name = Column(String(50), primary_key=True)
+    slot = Column(Integer, nullable=False, unique=True)
+
+
 # Database setup
+import contextlib
+import contextvars
+import logging
 import os
+import random
+import threading
+import time
 
 # Use PostgreSQL in production, SQLite in development
 # For Railway, use /tmp for SQLite to ensure write permissions
@@ -142,16 +275,391 @@ else:
 if DATABASE_URL.startswith('postgres://'):
     DATABASE_URL = DATABASE_URL.replace('postgres://', 'postgresql://', 1)
 
-engine = create_engine(DATABASE_URL, echo=False)
+def _engine_options(url):
+    options = {'echo': False}
+    if url not in ('sqlite://', 'sqlite:///:memory:'):
+        # Pool sized to the worker's thread count (gunicorn_config.py sets DB_POOL_SIZE)
+        options['pool_size'] = int(os.environ.get('DB_POOL_SIZE', '5'))
+        options['max_overflow'] = int(os.environ.get('DB_MAX_OVERFLOW', '10'))
+    return options
+
+engine_options = _engine_options(DATABASE_URL)
+engine = create_engine(DATABASE_URL, **engine_options)
 SessionLocal = sessionmaker(bind=engine)
 
+# Slow query log and statement timeouts
+# Statements slower than SLOW_QUERY_MS are logged with their parameter
+# types; a SLOW_QUERY_EXPLAIN_RATE share of slow SELECTs also logs the plan.
+# set_statement_timeout() gives the current request a per-statement budget
+# (Postgres statement_timeout, SQLite progress handler).
+logger = logging.getLogger(__name__)
+
+SLOW_QUERY_MS = float(os.environ.get('SLOW_QUERY_MS', '200'))
+SLOW_QUERY_EXPLAIN_RATE = float(os.environ.get('SLOW_QUERY_EXPLAIN_RATE', '0.1'))
+
+# SQLite calls the progress handler every this many VM instructions
+SQLITE_PROGRESS_STEPS = 1000
+
+_statement_timeout_ms = contextvars.ContextVar('statement_timeout_ms', default=0)
+
+def set_statement_timeout(ms):
+    """
+    Budget for each statement run by the current request (0 = no limit)
+    Returns a token for reset_statement_timeout
+    """
+    return _statement_timeout_ms.set(int(ms or 0))
+
+def reset_statement_timeout(token):
+    _statement_timeout_ms.reset(token)
+
+def is_statement_timeout(exc):
+    """True if a DBAPI error (or SQLAlchemy wrapper) was a statement timeout"""
+    orig = getattr(exc, 'orig', exc)
+    return getattr(orig, 'pgcode', None) == '57014' or 'interrupted' in str(orig)
+
+def _parameter_shape(params):
+    """Parameter types, never values (they may hold customer data)"""
+    def shape(value):
+        if isinstance(value, (list, tuple)):
+            return f"{type(value).__name__}[{len(value)}]"
+        return type(value).__name__
+    if isinstance(params, dict):
+        return {key: shape(value) for key, value in params.items()}
+    if isinstance(params, (list, tuple)):
+        return [shape(value) for value in params]
+    return shape(params)
+
+def _explain(conn, statement, parameters):
+    prefix = 'EXPLAIN QUERY PLAN ' if conn.dialect.name == 'sqlite' else 'EXPLAIN '
+    cursor = conn.connection.dbapi_connection.cursor()
+    try:
+        cursor.execute(prefix + statement, parameters)
+        return '\n'.join(' '.join(str(col) for col in row) for row in cursor.fetchall())
+    finally:
+        cursor.close()
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    timeout = _statement_timeout_ms.get()
+    if conn.dialect.name == 'sqlite':
+        dbapi_conn = conn.connection.dbapi_connection
+        if timeout:
+            deadline = time.monotonic() + timeout / 1000
+            # A non-zero return aborts the statement ("interrupted")
+            dbapi_conn.set_progress_handler(lambda: time.monotonic() > deadline, SQLITE_PROGRESS_STEPS)
+        elif conn.info.get('statement_timeout'):
+            dbapi_conn.set_progress_handler(None, 0)
+        conn.info['statement_timeout'] = timeout
+    elif conn.dialect.name == 'postgresql' and conn.info.get('statement_timeout', 0) != timeout:
+        # Session-level setting; only re-sent when the budget changes
+        cursor.execute(f"SET statement_timeout = {timeout}")
+        conn.info['statement_timeout'] = timeout
+    conn.info.setdefault('query_start', []).append(time.perf_counter())
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed_ms = (time.perf_counter() - conn.info['query_start'].pop()) * 1000
+    if elapsed_ms < SLOW_QUERY_MS:
+        return
+    logger.warning("slow query (%.0f ms): %s params=%s", elapsed_ms, ' '.join(statement.split())[:2000],
+                   'executemany' if executemany else _parameter_shape(parameters))
+    if (not executemany and statement.lstrip()[:6].upper() == 'SELECT'
+            and random.random() < SLOW_QUERY_EXPLAIN_RATE):
+        try:
+            logger.warning("plan for slow query:\n%s", _explain(conn, statement, parameters))
+        except Exception as e:
+            logger.warning("EXPLAIN failed: %s", e)
+
+def _forget_timeout_on_rollback(conn):
+    # A SET issued inside the transaction is undone with it
+    if conn.dialect.name == 'postgresql':
+        conn.info.pop('statement_timeout', None)
+
+def _clear_timeout_on_reset(dbapi_connection, connection_record, reset_state):
+    # Don't let a request's deadline follow the connection back into the pool
+    if connection_record.info.pop('statement_timeout', 0) and hasattr(dbapi_connection, 'set_progress_handler'):
+        dbapi_connection.set_progress_handler(None, 0)
+
+def _handle_error(context):
+    # Failed statements never reach after_cursor_execute
+    if context.connection is not None and context.connection.info.get('query_start'):
+        context.connection.info['query_start'].pop()
+
+# SQLite files run in WAL mode: readers (and online backups) never block
+# writers. SQLITE_WAL=0 keeps the rollback journal.
+SQLITE_WAL = os.environ.get('SQLITE_WAL', '1') == '1'
+
+def _enable_wal(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    try:
+        # Persistent in the file; a no-op after the first connection
+        cursor.execute('PRAGMA journal_mode=WAL')
+        cursor.execute('PRAGMA synchronous=NORMAL')
+    finally:
+        cursor.close()
+
+def _instrument(target):
+    """Install the slow query log / statement timeout hooks on an engine"""
+    event.listen(target, 'before_cursor_execute', _before_cursor_execute)
+    event.listen(target, 'after_cursor_execute', _after_cursor_execute)
+    event.listen(target, 'rollback', _forget_timeout_on_rollback)
+    event.listen(target, 'handle_error', _handle_error)
+    event.listen(target.pool, 'reset', _clear_timeout_on_reset)
+    if SQLITE_WAL and target.dialect.name == 'sqlite' and target.url.database not in (None, '', ':memory:'):
+        event.listen(target, 'connect', _enable_wal)
+
+_instrument(engine)
+
+# Tenant sharding
+# SHARD_URLS="shard1=sqlite:///shard1.db,shard2=postgresql://..." adds tenant
+# shards next to the main database. The main database is the directory
+# (users, tenant_shards) and also shard "default": tenants without a
+# tenant_shards row live there, so an unsharded install is unchanged.
+# Each shard hands out ids above its own offset (SHARD_ID_SPAN apart) so a
+# tenant can be moved between shards keeping its ids. Offsets come from
+# shard_slots, so reordering or removing SHARD_URLS entries never moves them.
+DEFAULT_SHARD = 'default'
+SHARD_ID_SPAN = 1 << 40
+SHARD_URLS = {
+    name.strip(): url.strip()
+    for name, _, url in (item.partition('=') for item in os.environ.get('SHARD_URLS', '').split(',') if item.strip())
+}
+# Touched whenever a tenant moves; workers drop their shard map cache when its mtime changes
+SHARD_MAP_VERSION_PATH = os.environ.get('SHARD_MAP_VERSION_PATH', '/tmp/autoparts-shard-map')
+# Workers on other hosts don't see that file: every entry is re-read after
+# this many seconds, and tenant moves wait it out before relying on a change
+SHARD_MAP_TTL = float(os.environ.get('SHARD_MAP_TTL', '30'))
+
+_engines = {DEFAULT_SHARD: engine}
+_engines_lock = threading.Lock()
+_shard_map = {}
+_shard_map_version = None
+
+def shard_names():
+    return [DEFAULT_SHARD] + [name for name in SHARD_URLS if name != DEFAULT_SHARD]
+
+_shard_offsets = {}
+
+def shard_offset(name):
+    """
+    First id of a shard's range
+    Slots are handed out once, in shard_names() order (the default shard
+    gets 0), and kept in the directory for good.
+    """
+    offset = _shard_offsets.get(name)
+    if offset is None:
+        if name not in shard_names():
+            raise KeyError(f"Unknown shard: {name}")
+        try:
+            with engine.begin() as conn:
+                slots = dict(conn.execute(select(ShardSlot.name, ShardSlot.slot)).all())
+                for other in shard_names():
+                    if other not in slots:
+                        slots[other] = max(slots.values(), default=-1) + 1
+                        conn.execute(insert(ShardSlot).values(name=other, slot=slots[other]))
+        except IntegrityError:
+            # Another process assigned them first
+            with engine.connect() as conn:
+                slots = dict(conn.execute(select(ShardSlot.name, ShardSlot.slot)).all())
+        _shard_offsets.update((shard, slot * SHARD_ID_SPAN) for shard, slot in slots.items())
+        offset = _shard_offsets[name]
+    return offset
+
+def shard_engine(name):
+    """Engine of a shard (created on first use)"""
+    shard = _engines.get(name)
+    if shard is None:
+        if name not in SHARD_URLS:
+            raise KeyError(f"Unknown shard: {name}")
+        with _engines_lock:
+            shard = _engines.get(name)
+            if shard is None:
+                shard = create_engine(SHARD_URLS[name], **_engine_options(SHARD_URLS[name]))
+                _instrument(shard)
+                _engines[name] = shard
+    return shard
+
+def _shard_map_mtime():
+    try:
+        return os.stat(SHARD_MAP_VERSION_PATH).st_mtime_ns
+    except FileNotFoundError:
+        return 0
+
+def bump_shard_map_version():
+    """Make every worker on this host re-read tenant_shards"""
+    with open(SHARD_MAP_VERSION_PATH, 'a'):
+        pass
+    os.utime(SHARD_MAP_VERSION_PATH, ns=(time.time_ns(), max(time.time_ns(), _shard_map_mtime() + 1)))
+
+def tenant_shard(user_id):
+    """
+    (shard name, status) for a tenant; cached until the shard map version
+    changes or for SHARD_MAP_TTL seconds, whichever comes first
+    """
+    global _shard_map_version
+    if not SHARD_URLS:
+        return DEFAULT_SHARD, 'active'
+    version = _shard_map_mtime()
+    if version != _shard_map_version:
+        _shard_map.clear()
+        _shard_map_version = version
+    now = time.monotonic()
+    entry = _shard_map.get(user_id)
+    if entry is None or entry[2] <= now:
+        with engine.connect() as conn:
+            row = conn.execute(
+                select(TenantShard.shard, TenantShard.status).where(TenantShard.user_id == user_id)
+            ).first()
+        entry = (row.shard, row.status) if row else (DEFAULT_SHARD, 'active')
+        entry += (now + SHARD_MAP_TTL,)
+        _shard_map[user_id] = entry
+    return entry[:2]
+
+# Tables whose ids come from their shard's range (next_id)
+ID_RANGE_TABLES = [t for t in Base.metadata.sorted_tables if t.kwargs.get('sqlite_autoincrement')]
+
+# Tables that always live in the directory database
+DIRECTORY_MODELS = (User, TenantShard, ShardSlot)
+
+def tenant_session(user_id):
+    """Session for user_id's data; users/tenant_shards still go to the directory"""
+    if not SHARD_URLS or user_id is None:
+        return SessionLocal()
+    shard, _ = tenant_shard(user_id)
+    if shard == DEFAULT_SHARD:
+        return SessionLocal()
+    return SessionLocal(bind=shard_engine(shard), binds={model: engine for model in DIRECTORY_MODELS})
+
+_current_tenant = contextvars.ContextVar('current_tenant', default=None)
+
+def set_current_tenant(user_id):
+    """Route get_db() to user_id's shard; returns a token for reset_current_tenant"""
+    return _current_tenant.set(user_id)
+
+def reset_current_tenant(token):
+    _current_tenant.reset(token)
+
+_schema_ready = False
+_schema_lock = threading.Lock()
+
 def init_db():
-    """Initialize database (create all tables)"""
-    Base.metadata.create_all(engine)
+    """Initialize database (create all tables on the directory and every shard)"""
+    global _schema_ready
+    # The default shard comes first: it holds the directory (shard_slots)
+    for name in shard_names():
+        target = shard_engine(name)
+        Base.metadata.create_all(target)
+        _upgrade_schema(target)
+        _reserve_id_range(target, shard_offset(name))
+    _schema_ready = True
+
+def _upgrade_schema(target=engine):
+    """Add columns/indexes introduced after a table was first created.
+    create_all() only creates missing tables; new columns here are nullable
+    or carry a server default, so a plain ADD COLUMN is enough."""
+    inspector = inspect(target)
+    with target.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {c['name'] for c in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing:
+                    continue
+                ddl = f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column.type.compile(target.dialect)}"
+                if column.server_default is not None:
+                    ddl += f" NOT NULL DEFAULT {column.server_default.arg}"
+                conn.exec_driver_sql(ddl)
+            indexes = {i['name'] for i in inspector.get_indexes(table.name)}
+            for index in table.indexes:
+                if index.name not in indexes:
+                    index.create(conn, checkfirst=True)
+
+def _reserve_id_range(target, offset):
+    """Keep new ids of autoincrement tables inside [offset, offset + SHARD_ID_SPAN)"""
+    with target.begin() as conn:
+        if target.dialect.name == 'sqlite' and not conn.exec_driver_sql(
+            "SELECT 1 FROM sqlite_master WHERE name = 'sqlite_sequence'"
+        ).scalar():
+            # Tables created before AUTOINCREMENT was declared: ids can't be offset
+            logger.warning("%s has no AUTOINCREMENT tables; shard ids start at 1", target.url)
+            return
+        for table in ID_RANGE_TABLES:
+            reset_id_sequence(conn, table, offset)
+
+def reset_id_sequence(conn, table, offset):
+    """
+    Point table's id sequence into [offset, offset + SHARD_ID_SPAN)
+    Run in the transaction that copies in rows with other shards' ids:
+    SQLite moves sqlite_sequence up to the highest id inserted. A sequence
+    already inside the range only moves up, so deleted ids are not reused.
+    """
+    end = offset + SHARD_ID_SPAN
+    if conn.dialect.name == 'sqlite':
+        current = conn.exec_driver_sql("SELECT seq FROM sqlite_sequence WHERE name = ?", (table.name,)).scalar()
+        top = conn.exec_driver_sql(
+            f"SELECT MAX(id) FROM {table.name} WHERE id >= ? AND id < ?", (offset, end)
+        ).scalar()
+        seq = max(current if current is not None and offset <= current < end else offset, top or 0)
+        if current is None:
+            conn.exec_driver_sql("INSERT INTO sqlite_sequence (name, seq) VALUES (?, ?)", (table.name, seq))
+        elif seq != current:
+            conn.exec_driver_sql("UPDATE sqlite_sequence SET seq = ? WHERE name = ?", (seq, table.name))
+    elif conn.dialect.name == 'postgresql' and offset:
+        # Sequences ignore explicit ids, so only one outside the range needs moving
+        conn.exec_driver_sql(
+            f"SELECT setval(seq, GREATEST(%(offset)s, (SELECT COALESCE(MAX(id), 0) FROM {table.name} "
+            f"WHERE id >= %(offset)s AND id < %(end)s))) "
+            f"FROM (SELECT CAST(pg_get_serial_sequence('{table.name}', 'id') AS regclass) AS seq) AS s "
+            f"WHERE COALESCE(pg_sequence_last_value(seq), 0) NOT BETWEEN %(offset)s AND %(end)s - 1",
+            {'offset': offset, 'end': end}
+        )
+
+def ensure_db():
+    """Create tables once per process; later calls are free"""
+    if _schema_ready:
+        return
+    with _schema_lock:
+        if not _schema_ready:
+            init_db()
+
+def dispose_engine():
+    """Drop pooled connections inherited from the parent after fork.
+    close=False leaves the parent's sockets alone (gunicorn post_fork)."""
+    for target in list(_engines.values()):
+        target.dispose(close=False)
+
+class _SharedSession:
+    """Session handed to every sub-request of POST /api/batch; their
+    db.close() calls are no-ops and the batch closes it once at the end"""
+    
+    def __init__(self, session):
+        self._session = session
+    
+    def close(self):
+        pass
+    
+    def __getattr__(self, name):
+        return getattr(self._session, name)
+
+
+_shared_session = contextvars.ContextVar('shared_session', default=None)
+
+@contextlib.contextmanager
+def shared_session():
+    """Make get_db() return one session for the duration of the block"""
+    session = tenant_session(_current_tenant.get())
+    token = _shared_session.set(_SharedSession(session))
+    try:
+        yield session
+    finally:
+        _shared_session.reset(token)
+        session.close()
 
 def get_db():
     """Get database session"""
-    db = SessionLocal()
+    shared = _shared_session.get()
+    if shared is not None:
+        return shared
+    db = tenant_session(_current_tenant.get())
     try:
         return db
     finally:
@@ -1,16 +1,25 @@
 """
 Database seeding script
-Creates test user, business info, customers, and sample invoices
+Creates test user, business info, customers, and sample invoices.
+With --bulk, generates a production-scale data set (many users, customers,
+millions of invoices/line items) with bulk inserts.
 """
+import argparse
+import csv
+import io
+import random
+import time
+from bisect import bisect
 from datetime import datetime, timedelta
-from models import init_db, get_db, User, BusinessInfo, Customer, Invoice, InvoiceLineItem
+from werkzeug.security import generate_password_hash
+from models import ensure_db, get_db, engine, SHARD_ID_SPAN, User, BusinessInfo, Customer, Invoice, InvoiceLineItem
 
 def seed_database():
     """Seed database with test data"""
     print("🌱 Seeding database...")
     
     # Initialize database
-    init_db()
+    ensure_db()
     
     db = get_db()
     try:
@@ -191,5 +200,276 @@ def seed_database():
     finally:
         db.close()
 
+
+# --- Bulk generator -------------------------------------------------------
+
+# (product, part number, unit price); listed roughly by popularity
+PRODUCT_CATALOG = [
+    ('Oil Filter', 'OF-5678', 12.00), ('Engine Oil 5W-30', 'EO-1111', 8.00),
+    ('Brake Pads', 'BP-1234', 75.00), ('Air Filter', 'AF-9012', 25.00),
+    ('Wiper Blades', 'WB-7890', 25.25), ('Spark Plugs', 'SP-3456', 8.00),
+    ('Cabin Air Filter', 'CAF-6789', 20.00), ('Coolant', 'CL-8642', 15.00),
+    ('Brake Rotors', 'BR-4321', 85.00), ('Battery', 'BAT-1357', 125.00),
+    ('Transmission Fluid', 'TF-6789', 18.00), ('Fuel Filter', 'FF-2345', 22.00),
+    ('Serpentine Belt', 'SB-9753', 45.00), ('Headlight Bulb', 'HB-9006', 14.50),
+    ('Brake Fluid', 'BF-3000', 11.00), ('Ignition Coil', 'IC-4410', 68.00),
+    ('Oxygen Sensor', 'O2-2231', 59.00), ('Thermostat', 'TH-1950', 24.00),
+    ('Water Pump', 'WP-7712', 89.00), ('Radiator Hose', 'RH-3321', 27.00),
+    ('Timing Belt Kit', 'TBK-5540', 189.00), ('Alternator', 'ALT-2468', 350.00),
+    ('Starter Motor', 'SM-8801', 240.00), ('Shock Absorber', 'SA-6620', 95.00),
+    ('Strut Assembly', 'STA-6621', 165.00), ('CV Axle', 'CV-4471', 110.00),
+    ('Wheel Bearing', 'WBR-3390', 72.00), ('Tie Rod End', 'TRE-1180', 38.00),
+    ('Radiator', 'RAD-9900', 210.00), ('Catalytic Converter', 'CAT-7000', 520.00),
+]
+
+CUSTOMER_WORDS = ['Auto', 'Motors', 'Garage', 'Repair', 'Service', 'Fleet', 'Tire', 'Collision', 'Performance', 'Lube']
+CITIES = ['Springfield, IL', 'Decatur, IL', 'Peoria, IL', 'Champaign, IL', 'Bloomington, IL', 'Joliet, IL']
+
+# Month weights: spring/summer is busy season, December is slow
+MONTH_WEIGHTS = [0.85, 0.85, 1.0, 1.1, 1.15, 1.2, 1.2, 1.15, 1.05, 1.0, 0.9, 0.75]
+ITEMS_PER_INVOICE = [1, 2, 3, 4, 5, 6, 8]
+ITEMS_WEIGHTS = [18, 20, 18, 16, 12, 9, 7]
+QUANTITIES = [1, 2, 4, 5, 6, 8, 10, 20]
+QUANTITY_WEIGHTS = [40, 22, 14, 6, 6, 5, 5, 2]
+
+
+def _cumulative(weights):
+    total, out = 0.0, []
+    for w in weights:
+        total += w
+        out.append(total)
+    return out
+
+
+def _stamp(value):
+    """DateTime literal in the format SQLAlchemy itself stores (sorts correctly on SQLite)"""
+    return value.strftime('%Y-%m-%d %H:%M:%S.%f')
+
+
+def _pick(rng, cum):
+    """Index drawn from cumulative weights (one rng call)"""
+    return bisect(cum, rng.random() * cum[-1])
+
+
+class BulkWriter:
+    """executemany on SQLite, COPY on PostgreSQL, one transaction per flush"""
+
+    def __init__(self):
+        self.conn = engine.raw_connection()
+        self.postgres = engine.dialect.name == 'postgresql'
+        cursor = self.conn.cursor()
+        if engine.dialect.name == 'sqlite':
+            cursor.execute('PRAGMA synchronous = NORMAL')
+        cursor.close()
+
+    def write(self, table, columns, rows):
+        if not rows:
+            return
+        cursor = self.conn.cursor()
+        if self.postgres:
+            buf = io.StringIO()
+            csv.writer(buf).writerows(rows)
+            buf.seek(0)
+            cursor.copy_expert(f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)", buf)
+        else:
+            placeholders = ', '.join('?' for _ in columns)
+            cursor.executemany(f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({placeholders})", rows)
+        cursor.close()
+
+    def commit(self):
+        self.conn.commit()
+
+    def max_id(self, table, below=None):
+        """Highest id, optionally only among ids under below"""
+        cursor = self.conn.cursor()
+        cursor.execute(f"SELECT COALESCE(MAX(id), 0) FROM {table}" + (f" WHERE id < {int(below)}" if below else ''))
+        value = cursor.fetchone()[0]
+        cursor.close()
+        return value
+
+    def sync_sequences(self, tables):
+        """PostgreSQL sequences don't see COPY'd ids: move them past the rows written"""
+        if not self.postgres:
+            return
+        cursor = self.conn.cursor()
+        for table in tables:
+            cursor.execute(
+                f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), GREATEST(MAX(id), "
+                f"COALESCE(pg_sequence_last_value(CAST(pg_get_serial_sequence('{table}', 'id') AS regclass)), 1))) "
+                f"FROM {table} WHERE id < {SHARD_ID_SPAN}"
+            )
+        cursor.close()
+        self.conn.commit()
+
+    def day_sequences(self):
+        """Highest existing YYYYMMDD-NNN sequence per day (reruns continue from it)"""
+        sequences = {}
+        cursor = self.conn.cursor()
+        cursor.execute("SELECT invoice_number FROM invoices WHERE invoice_number LIKE '________-%'")
+        for (number,) in cursor:
+            day_key, _, seq = number.partition('-')
+            if day_key.isdigit() and seq.isdigit():
+                sequences[day_key] = max(sequences.get(day_key, 0), int(seq))
+        cursor.close()
+        return sequences
+
+    def close(self):
+        self.conn.close()
+
+
+def generate_bulk_data(users=10, customers_per_user=500, invoices=250_000, years=3,
+                       seed=42, chunk_size=20_000, password='admin123'):
+    """
+    Generate a production-scale data set with bulk inserts
+    Args:
+        users: number of tenant accounts (bulk-user-N@autoparts.test)
+        customers_per_user: customers created for every user
+        invoices: total invoices, spread over users (~3.5 line items each)
+        years: history length; invoice dates end yesterday
+        seed: RNG seed - same arguments always produce the same rows
+        chunk_size: invoices per transaction
+    Returns:
+        dict with row counts and elapsed seconds
+    """
+    ensure_db()
+    started = time.perf_counter()
+    rng = random.Random(seed)
+    now = datetime.utcnow().replace(microsecond=0)
+    today = now.replace(hour=0, minute=0, second=0)
+    stamp_now = _stamp(now)
+    writer = BulkWriter()
+    try:
+        user_base = writer.max_id('users')
+        # Tenants moved in from other shards keep their ids: stay in this database's own range
+        business_base = writer.max_id('business_info', SHARD_ID_SPAN)
+        customer_base = writer.max_id('customers', SHARD_ID_SPAN)
+        invoice_base = writer.max_id('invoices', SHARD_ID_SPAN)
+        item_id = writer.max_id('invoice_line_items', SHARD_ID_SPAN)
+        # Read before anything is written: a rerun must not reuse invoice numbers
+        sequence_by_day = writer.day_sequences()
+
+        # Users + business info (one shared hash: PBKDF2 per user would dominate)
+        password_hash = generate_password_hash(password)
+        user_ids = [user_base + n + 1 for n in range(users)]
+        writer.write('users', ('id', 'email', 'password_hash', 'name', 'created_at'), [
+            (uid, f"bulk-user-{uid}@autoparts.test", password_hash, f"Bulk User {uid}", stamp_now) for uid in user_ids
+        ])
+        writer.write('business_info', ('id', 'user_id', 'company_name', 'address', 'phone', 'email', 'tax_id', 'logo_url', 'updated_at'), [
+            (business_base + n + 1, uid, f"AutoParts Branch {uid}", f"{100 + uid} Main Street\n{CITIES[uid % len(CITIES)]}",
+             f"(555) {uid % 1000:03d}-0000", f"branch{uid}@autoparts.test", f"{uid:02d}-{uid:07d}", '', stamp_now)
+            for n, uid in enumerate(user_ids)
+        ])
+
+        # Customers: a few big accounts per user buy most of the parts (Zipf-like)
+        customer_rows, customers_by_user = [], {}
+        cid = customer_base
+        for uid in user_ids:
+            ids = []
+            for n in range(customers_per_user):
+                cid += 1
+                ids.append(cid)
+                name = f"{rng.choice(CUSTOMER_WORDS)} {rng.choice(CUSTOMER_WORDS)} #{cid}"
+                customer_rows.append((cid, uid, name, f"{rng.randint(1, 9999)} Oak Avenue\n{rng.choice(CITIES)}",
+                                      f"(555) {rng.randint(200, 999)}-{rng.randint(0, 9999):04d}",
+                                      f"customer{cid}@example.com", stamp_now, stamp_now))
+            customers_by_user[uid] = ids
+        writer.write('customers', ('id', 'user_id', 'name', 'address', 'phone', 'email', 'created_at', 'updated_at'),
+                     customer_rows)
+        customer_cum = _cumulative([1.0 / (rank + 1) ** 0.9 for rank in range(customers_per_user)])
+        user_cum = _cumulative([1.0 / (rank + 1) ** 0.5 for rank in range(users)])  # some tenants are much bigger
+        writer.commit()
+        del customer_rows
+
+        # Invoice dates: growing business (more recent days weigh more), seasonal, quiet Sundays
+        total_days = years * 365
+        day_weights = []
+        for back in range(1, total_days + 1):
+            day = today - timedelta(days=back)
+            weight = (1.0 + (total_days - back) / total_days) * MONTH_WEIGHTS[day.month - 1]
+            day_weights.append(weight * (0.3 if day.weekday() == 6 else 1.0))
+        day_cum = _cumulative(day_weights)
+        product_cum = _cumulative([1.0 / (rank + 1) ** 1.1 for rank in range(len(PRODUCT_CATALOG))])
+        items_cum = _cumulative(ITEMS_WEIGHTS)
+        qty_cum = _cumulative(QUANTITY_WEIGHTS)
+
+        invoice_cols = ('id', 'user_id', 'customer_id', 'invoice_number', 'invoice_date', 'subtotal', 'tax_rate',
+                        'tax_amount', 'total', 'status', 'notes', 'created_at', 'updated_at')
+        item_cols = ('id', 'invoice_id', 'product_name', 'part_number', 'quantity', 'unit_price', 'line_total')
+        invoice_rows, item_rows = [], []
+        item_count = 0
+        for n in range(invoices):
+            invoice_id = invoice_base + n + 1
+            uid = user_ids[_pick(rng, user_cum)]
+            customer_id = customers_by_user[uid][_pick(rng, customer_cum)] if customers_per_user else None
+            back = _pick(rng, day_cum) + 1
+            invoice_date = today - timedelta(days=back, seconds=-rng.randint(8 * 3600, 18 * 3600))
+            day_key = invoice_date.strftime('%Y%m%d')
+            stamp = _stamp(invoice_date)
+            seq = sequence_by_day.get(day_key, 0) + 1
+            sequence_by_day[day_key] = seq
+
+            subtotal = 0.0
+            for _ in range(ITEMS_PER_INVOICE[_pick(rng, items_cum)]):
+                name, part, price = PRODUCT_CATALOG[_pick(rng, product_cum)]
+                qty = QUANTITIES[_pick(rng, qty_cum)]
+                line_total = round(qty * price, 2)
+                subtotal += line_total
+                item_id += 1
+                item_rows.append((item_id, invoice_id, name, part, qty, price, line_total))
+
+            # Recent invoices are often still open; old ones are almost all paid
+            unpaid_chance = 0.6 if back <= 30 else 0.25 if back <= 90 else 0.03
+            status = 'unpaid' if rng.random() < unpaid_chance else 'paid'
+            subtotal = round(subtotal, 2)
+            tax_amount = round(subtotal * 8.25 / 100, 2)
+            invoice_rows.append((invoice_id, uid, customer_id, f"{day_key}-{seq:03d}", stamp, subtotal,
+                                 8.25, tax_amount, round(subtotal + tax_amount, 2), status, '', stamp, stamp))
+
+            if len(invoice_rows) >= chunk_size:
+                writer.write('invoices', invoice_cols, invoice_rows)
+                writer.write('invoice_line_items', item_cols, item_rows)
+                writer.commit()
+                item_count += len(item_rows)
+                invoice_rows, item_rows = [], []
+
+        writer.write('invoices', invoice_cols, invoice_rows)
+        writer.write('invoice_line_items', item_cols, item_rows)
+        writer.commit()
+        item_count += len(item_rows)
+        writer.sync_sequences(('business_info', 'customers', 'invoices', 'invoice_line_items'))
+    except Exception:
+        writer.conn.rollback()
+        raise
+    finally:
+        writer.close()
+
+    return {
+        'users': users,
+        'customers': users * customers_per_user,
+        'invoices': invoices,
+        'line_items': item_count,
+        'seconds': round(time.perf_counter() - started, 2),
+    }
+
+
 if __name__ == '__main__':
-    seed_database()
+    parser = argparse.ArgumentParser(description='Seed the database')
+    parser.add_argument('--bulk', action='store_true', help='generate a production-scale data set')
+    parser.add_argument('--users', type=int, default=10)
+    parser.add_argument('--customers-per-user', type=int, default=500)
+    parser.add_argument('--invoices', type=int, default=250_000)
+    parser.add_argument('--years', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--chunk-size', type=int, default=20_000)
+    args = parser.parse_args()
+
+    if args.bulk:
+        print("🌱 Generating bulk data...")
+        stats = generate_bulk_data(users=args.users, customers_per_user=args.customers_per_user,
+                                   invoices=args.invoices, years=args.years, seed=args.seed,
+                                   chunk_size=args.chunk_size)
+        print(f"✅ {stats['users']} users, {stats['customers']} customers, {stats['invoices']} invoices, "
+              f"{stats['line_items']} line items in {stats['seconds']}s")
+        print("   Login: bulk-user-<id>@autoparts.test / admin123")
+    else:
+        seed_database()
@@ -0,0 +1,157 @@
+"""
+Hot/cold invoice archival
+Moves invoices older than a cutoff (and their line items) into the
+invoices_archive / invoice_line_items_archive tables in small batches, so
+the indexes walked by the invoice list and dashboard only cover recent
+data. Archived invoices keep their ids; detail and PDF reads fall back to
+the archive transparently. Each batch locks the invoices it moves, and
+delta sync reports them as deleted.
+
+Usage (from backend/):
+    python -m services.archive_service --older-than-days 730 [--batch-size 500]
+"""
+import argparse
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import bindparam, delete, func, insert, or_, select
+from models import (
+    ensure_db, shard_engine, shard_names, Customer, Invoice, InvoiceLineItem, InvoiceArchive, InvoiceLineItemArchive,
+    SyncTombstone
+)
+from services.sync_service import allocate_change_seq
+
+# The dashboard reads the last 12 months from the hot tables only
+MIN_CUTOFF_DAYS = 366
+
+INVOICE_COLUMNS = [c.name for c in InvoiceArchive.__table__.columns]
+LINE_ITEM_COLUMNS = [c.name for c in InvoiceLineItemArchive.__table__.columns]
+
+
+def archive_invoices(older_than_days=730, batch_size=500, pause=0.0, max_batches=None):
+    """
+    Move invoices dated before now - older_than_days into the archive
+    Args:
+        older_than_days: cutoff age; at least MIN_CUTOFF_DAYS
+        batch_size: invoices moved per transaction (keeps write locks short)
+        pause: seconds to sleep between batches to let live writers in
+        max_batches: stop after this many batches (None = until done)
+    Returns:
+        dict with invoices/line_items moved and elapsed seconds
+    """
+    if older_than_days < MIN_CUTOFF_DAYS:
+        raise ValueError(f"Cutoff must be at least {MIN_CUTOFF_DAYS} days (dashboard covers 12 months)")
+
+    ensure_db()
+    cutoff = datetime.utcnow() - timedelta(days=older_than_days)
+    started = time.perf_counter()
+    totals = {'invoices': 0, 'line_items': 0, 'batches': 0}
+
+    # Every shard holds its own tenants' invoices (just the one database when unsharded)
+    for shard in shard_names():
+        remaining = None if max_batches is None else max_batches - totals['batches']
+        if remaining is not None and remaining <= 0:
+            break
+        _archive_shard(shard_engine(shard), cutoff, batch_size, pause, remaining, totals)
+
+    return {
+        'cutoff': cutoff.isoformat(),
+        'invoices': totals['invoices'],
+        'line_items': totals['line_items'],
+        'batches': totals['batches'],
+        'seconds': round(time.perf_counter() - started, 2),
+    }
+
+
+def _archive_shard(target, cutoff, batch_size, pause, max_batches, totals):
+    with target.connect() as conn:
+        # SQLite reuses the highest rowid after it is deleted; never archive the
+        # newest invoice/line item so ids stay unique across hot and cold tables
+        keep_invoice = conn.execute(select(func.max(Invoice.id))).scalar()
+        keep_item_invoice = conn.execute(
+            select(InvoiceLineItem.invoice_id).order_by(InvoiceLineItem.id.desc()).limit(1)
+        ).scalar()
+    keep = [i for i in (keep_invoice, keep_item_invoice) if i is not None]
+
+    batches = 0
+    while max_batches is None or batches < max_batches:
+        with target.begin() as conn:
+            batch = conn.execute(
+                select(Invoice.id, Invoice.user_id)
+                .where(Invoice.invoice_date < cutoff, Invoice.id.notin_(keep))
+                .order_by(Invoice.id)
+                .limit(batch_size)
+                .with_for_update()
+            ).all()
+            if not batch:
+                break
+            ids = [row.id for row in batch]
+
+            invoice_cols = [Invoice.__table__.c[name] for name in INVOICE_COLUMNS]
+            item_cols = [InvoiceLineItem.__table__.c[name] for name in LINE_ITEM_COLUMNS]
+            conn.execute(insert(InvoiceArchive).from_select(
+                INVOICE_COLUMNS, select(*invoice_cols).where(Invoice.id.in_(ids))
+            ))
+            items = conn.execute(insert(InvoiceLineItemArchive).from_select(
+                LINE_ITEM_COLUMNS, select(*item_cols).where(InvoiceLineItem.invoice_id.in_(ids))
+            ))
+            conn.execute(delete(InvoiceLineItem).where(InvoiceLineItem.invoice_id.in_(ids)))
+            conn.execute(delete(Invoice).where(Invoice.id.in_(ids)))
+
+            # Tombstone the moved invoices so delta sync clients drop them; the
+            # new change_seq also moves the owners' list versions (cache revalidation)
+            owners = {}
+            for row in batch:
+                owners.setdefault(row.user_id, []).append(row.id)
+            for user_id, invoice_ids in owners.items():
+                seq = allocate_change_seq(conn, user_id, len(invoice_ids))
+                conn.execute(insert(SyncTombstone), [
+                    {'user_id': user_id, 'entity': 'invoice', 'entity_id': invoice_id,
+                     'change_seq': seq + offset, 'deleted_at': datetime.utcnow()}
+                    for offset, invoice_id in enumerate(invoice_ids)
+                ])
+
+        totals['invoices'] += len(ids)
+        totals['line_items'] += items.rowcount if items.rowcount and items.rowcount > 0 else 0
+        totals['batches'] += 1
+        batches += 1
+        if pause:
+            time.sleep(pause)
+
+
+_INVOICE_BY_ID, _ARCHIVED_INVOICE_BY_ID = (
+    select(model).where(model.id == bindparam('id'), model.user_id == bindparam('user_id'))
+    for model in (Invoice, InvoiceArchive)
+)
+
+
+def find_invoice(db, invoice_id, user_id):
+    """
+    Invoice ORM object from the hot table, else from the archive
+    Both expose .customer and .line_items, so the PDF service accepts either.
+    """
+    params = {'id': invoice_id, 'user_id': user_id}
+    invoice = db.scalars(_INVOICE_BY_ID, params).first()
+    if invoice is None:
+        invoice = db.scalars(_ARCHIVED_INVOICE_BY_ID, params).first()
+    return invoice
+
+
+# Correlated EXISTS over hot and archived invoices, per customer row
+customer_has_invoices = or_(
+    select(Invoice.id).where(Invoice.customer_id == Customer.id).exists(),
+    select(InvoiceArchive.id).where(InvoiceArchive.customer_id == Customer.id).exists()
+)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Move old invoices into the archive tables')
+    parser.add_argument('--older-than-days', type=int, default=730)
+    parser.add_argument('--batch-size', type=int, default=500)
+    parser.add_argument('--pause', type=float, default=0.0, help='seconds between batches')
+    parser.add_argument('--max-batches', type=int)
+    args = parser.parse_args()
+
+    print(f"📦 Archiving invoices older than {args.older_than_days} days...")
+    stats = archive_invoices(args.older_than_days, args.batch_size, args.pause, args.max_batches)
+    print(f"✅ Moved {stats['invoices']} invoices / {stats['line_items']} line items "
+          f"in {stats['batches']} batches ({stats['seconds']}s)")
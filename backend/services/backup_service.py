@@ -0,0 +1,566 @@
+"""
+Online backup and restore
+Full backups run while the app keeps serving:
+
+  SQLite   - the online backup API copies STEP_PAGES pages per step with a
+             short pause in between. In WAL mode (the default) the copy reads
+             one pinned snapshot, so it never restarts and writers are never
+             blocked. The result is gzip-compressed.
+  Postgres - pg_dump's custom format (compressed, pg_restore-able) is
+             streamed to the backup file.
+
+Each shard gets its own file. Tenants can also be exported on their own
+as gzip'd JSON lines (one column header per table, then one array per
+row) and restored in place.
+
+Usage (from backend/):
+    python -m services.backup_service backup [--dest backups]
+    python -m services.backup_service restore BACKUP [--shard default]
+    python -m services.backup_service export USER_ID [-o tenant.jsonl.gz]
+    python -m services.backup_service import FILE
+"""
+import argparse
+import fcntl
+import gzip
+import io
+import json
+import logging
+import os
+import shutil
+import sqlite3
+import subprocess
+import sys
+import threading
+import time
+import uuid
+import zlib
+from datetime import datetime
+from sqlalchemy import DateTime, delete, insert, select
+from sqlalchemy.exc import IntegrityError
+from models import (
+    engine, ensure_db, bump_shard_map_version, reset_id_sequence, shard_engine, shard_names, shard_offset,
+    tenant_shard, ID_RANGE_TABLES, User, Customer, Invoice, InvoiceArchive, SyncCounter, SyncTombstone
+)
+from services.shard_service import PARENTS, TENANT_TABLES, tenant_rows
+from services.sync_service import allocate_change_seq
+
+logger = logging.getLogger(__name__)
+
+BACKUP_DIR = os.environ.get('BACKUP_DIR', 'backups')
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Pages copied per backup step (4MB at the default 4KB page size) and the
+# pause after each, which leaves the disk to live requests
+STEP_PAGES = int(os.environ.get('BACKUP_STEP_PAGES', '1024'))
+STEP_PAUSE = float(os.environ.get('BACKUP_STEP_PAUSE', '0.01'))
+
+# Without WAL every write restarts the copy; after this many restarts the
+# rest is copied in one step (writers wait for that step)
+MAX_RESTARTS = 20
+
+COMPRESS_LEVEL = 6
+COPY_CHUNK = 1024 * 1024
+
+EXPORT_FORMAT = 'autoparts-tenant'
+EXPORT_VERSION = 1
+EXPORT_BATCH = 1000
+
+
+def _throughput(nbytes, seconds):
+    return round(nbytes / seconds / 1e6, 1) if seconds > 0 else None
+
+
+def _backup_sqlite(path, out_path, progress=None):
+    """Incremental online copy of a SQLite file, gzip'd to out_path; returns bytes read"""
+    tmp = f"{out_path}.db.part"
+    src = sqlite3.connect(path, isolation_level=None)
+    dst = sqlite3.connect(tmp)
+    try:
+        wal = src.execute('PRAGMA journal_mode').fetchone()[0] == 'wal'
+        if wal:
+            # Pin one snapshot: later commits go to the WAL and don't restart the copy
+            src.execute('BEGIN')
+            src.execute('SELECT 1 FROM sqlite_master LIMIT 1').fetchall()
+        else:
+            logger.warning("%s is not in WAL mode; writes during the backup restart it", path)
+
+        state = {'remaining': None, 'restarts': 0}
+
+        class _Restarting(Exception):
+            pass
+
+        def on_step(status, remaining, total):
+            if state['remaining'] is not None and remaining > state['remaining']:
+                state['restarts'] += 1
+                if state['restarts'] > MAX_RESTARTS:
+                    raise _Restarting()
+            state['remaining'] = remaining
+            if progress:
+                progress(total - remaining, total)
+            time.sleep(STEP_PAUSE)
+
+        try:
+            src.backup(dst, pages=STEP_PAGES, progress=on_step)
+        except _Restarting:
+            logger.warning("%s: backup restarted %d times; copying the rest in one step", path, MAX_RESTARTS)
+            src.backup(dst, pages=-1)
+        if wal:
+            src.execute('COMMIT')
+        page_size = src.execute('PRAGMA page_size').fetchone()[0]
+        pages = dst.execute('PRAGMA page_count').fetchone()[0]
+    finally:
+        src.close()
+        dst.close()
+
+    part = f"{out_path}.part"
+    with open(tmp, 'rb') as raw, gzip.open(part, 'wb', compresslevel=COMPRESS_LEVEL) as out:
+        shutil.copyfileobj(raw, out, COPY_CHUNK)
+    os.replace(part, out_path)
+    os.unlink(tmp)
+    return page_size * pages
+
+
+def _pg_url(target):
+    return target.url.set(drivername='postgresql').render_as_string(hide_password=False)
+
+
+def _backup_postgres(target, out_path, progress=None):
+    """pg_dump --format=custom streamed to out_path; returns bytes written"""
+    part = f"{out_path}.part"
+    written = 0
+    process = subprocess.Popen(
+        ['pg_dump', '--format=custom', f'--compress={COMPRESS_LEVEL}', '--no-owner', f'--dbname={_pg_url(target)}'],
+        stdout=subprocess.PIPE
+    )
+    with open(part, 'wb') as out:
+        for chunk in iter(lambda: process.stdout.read(COPY_CHUNK), b''):
+            out.write(chunk)
+            written += len(chunk)
+            if progress:
+                progress(written, None)
+    if process.wait():
+        os.unlink(part)
+        raise RuntimeError(f"pg_dump exited with {process.returncode}")
+    os.replace(part, out_path)
+    return written
+
+
+def backup_database(dest=BACKUP_DIR, progress=None):
+    """
+    Back up every shard into a timestamped directory under dest
+    Args:
+        progress: optional callback(shard, done, total) after each step
+    Returns:
+        dict with the backup directory, one entry per shard and seconds taken
+    """
+    directory = os.path.join(dest, datetime.utcnow().strftime('%Y%m%d-%H%M%S'))
+    os.makedirs(directory, exist_ok=True)
+    started = time.perf_counter()
+    files = []
+    for name in shard_names():
+        target = shard_engine(name)
+        shard_started = time.perf_counter()
+        report = (lambda done, total, name=name: progress(name, done, total)) if progress else None
+        if target.dialect.name == 'sqlite':
+            out_path = os.path.join(directory, f"{name}.db.gz")
+            nbytes = _backup_sqlite(target.url.database, out_path, report)
+        elif target.dialect.name == 'postgresql':
+            out_path = os.path.join(directory, f"{name}.dump")
+            nbytes = _backup_postgres(target, out_path, report)
+        else:
+            raise ValueError(f"Backups are not supported for {target.dialect.name}")
+        seconds = time.perf_counter() - shard_started
+        files.append({
+            'shard': name,
+            'path': out_path,
+            'bytes': nbytes,
+            'compressed_bytes': os.path.getsize(out_path),
+            'seconds': round(seconds, 2),
+            'mb_per_second': _throughput(nbytes, seconds),
+        })
+        logger.info("backup of %s: %s", name, files[-1])
+    return {'directory': directory, 'files': files, 'seconds': round(time.perf_counter() - started, 2)}
+
+
+def _write_json(path, data):
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, 'w') as f:
+        json.dump(data, f)
+    os.replace(tmp, path)
+
+
+def start_backup_job(dest=BACKUP_DIR):
+    """
+    Run backup_database() in a detached `backup --job` process
+    The process outlives worker restarts; progress goes to
+    <dest>/jobs/<id>.json so any worker can report it.
+    Returns:
+        the job dict, or None if a backup is already running on this host
+    """
+    jobs = os.path.join(dest, 'jobs')
+    os.makedirs(jobs, exist_ok=True)
+    # Holds the running job's id; only truncated once the lock is ours
+    lock = open(os.path.join(jobs, 'running.lock'), 'a+')
+    try:
+        fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        lock.close()
+        return None
+
+    try:
+        job = {'id': uuid.uuid4().hex[:12], 'status': 'running', 'started': time.time(), 'progress': {}}
+        lock.truncate(0)
+        lock.write(job['id'])
+        lock.flush()
+        _write_json(os.path.join(jobs, f"{job['id']}.json"), job)
+        with open(os.path.join(jobs, f"{job['id']}.log"), 'w') as log:
+            # The child inherits the locked file and holds it until it exits,
+            # so the kernel releases the lock if the backup dies
+            process = subprocess.Popen(
+                [sys.executable, '-m', 'services.backup_service', 'backup', '--dest', dest, '--job', job['id']],
+                cwd=BACKEND_DIR, stdin=subprocess.DEVNULL, stdout=log, stderr=subprocess.STDOUT,
+                pass_fds=(lock.fileno(),), start_new_session=True
+            )
+    finally:
+        lock.close()
+    job['pid'] = process.pid
+    # Reap the child while this worker lives; after that init does
+    threading.Thread(target=process.wait, name='backup-reaper', daemon=True).start()
+    return job
+
+
+def run_backup_job(job_id, dest=BACKUP_DIR):
+    """Body of a start_backup_job() process: backup_database() with progress in the job file"""
+    path = os.path.join(dest, 'jobs', f"{job_id}.json")
+    job = load_backup_job(job_id, dest) or {'id': job_id, 'started': time.time(), 'progress': {}}
+    job.update(status='running', pid=os.getpid())
+    _write_json(path, job)
+    last_write = [0.0]
+
+    def progress(shard, done, total):
+        job['progress'][shard] = {'done': done, 'total': total}
+        if time.monotonic() - last_write[0] > 1:
+            last_write[0] = time.monotonic()
+            _write_json(path, job)
+
+    try:
+        job.update(backup_database(dest, progress), status='done')
+    except Exception as e:
+        logger.exception("backup job %s failed", job_id)
+        job.update(status='failed', error=str(e))
+    finally:
+        job['finished'] = time.time()
+        _write_json(path, job)
+    return job
+
+
+def _running_job_id(jobs):
+    """Id of the job holding running.lock, or None if no backup process is alive"""
+    try:
+        lock = open(os.path.join(jobs, 'running.lock'))
+    except FileNotFoundError:
+        return None
+    with lock:
+        try:
+            fcntl.flock(lock, fcntl.LOCK_SH | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return lock.read().strip()
+        fcntl.flock(lock, fcntl.LOCK_UN)
+        return None
+
+
+def load_backup_job(job_id, dest=BACKUP_DIR):
+    """Job dict from its file; a 'running' job whose process is gone is marked failed"""
+    if not job_id.isalnum():
+        return None
+    jobs = os.path.join(dest, 'jobs')
+    path = os.path.join(jobs, f"{job_id}.json")
+    for attempt in range(2):
+        try:
+            with open(path) as f:
+                job = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if job.get('status') != 'running' or _running_job_id(jobs) == job_id:
+            return job
+        # The process writes its final status before exiting: re-read once
+        # in case it finished between the two checks
+    job.update(status='failed', error='Backup process exited before finishing', finished=time.time())
+    _write_json(path, job)
+    return job
+
+
+def restore_database(path, shard='default'):
+    """
+    Replace a shard's contents with a backup file
+    SQLite restores need the app stopped: the copy holds an exclusive lock
+    that any other process with the database open (in WAL mode) prevents, so
+    a running app is refused instead of having its file rewritten under it.
+    Postgres dumps are applied with pg_restore --clean. Caches keyed on the
+    sync counter may serve pre-restore results until their TTL.
+    Raises:
+        RuntimeError if another process has the SQLite database open
+    """
+    target = shard_engine(shard)
+    started = time.perf_counter()
+    if target.dialect.name == 'sqlite':
+        # Our own pooled connections would share (and so hide) other processes' locks
+        target.dispose()
+        tmp = f"{target.url.database}.restore"
+        with gzip.open(path, 'rb') as packed, open(tmp, 'wb') as raw:
+            shutil.copyfileobj(packed, raw, COPY_CHUNK)
+        src = sqlite3.connect(tmp)
+        try:
+            if src.execute('PRAGMA integrity_check').fetchone()[0] != 'ok':
+                raise ValueError('Backup failed its integrity check')
+            dst = sqlite3.connect(target.url.database, timeout=0, isolation_level=None)
+            try:
+                try:
+                    # Held until dst closes; fails while anyone else has the database open
+                    dst.execute('PRAGMA locking_mode=EXCLUSIVE')
+                    dst.execute('BEGIN EXCLUSIVE')
+                    dst.execute('SELECT 1 FROM sqlite_master LIMIT 1').fetchall()
+                    dst.execute('COMMIT')
+                except sqlite3.OperationalError:
+                    raise RuntimeError(f"{target.url.database} is in use; stop the app before restoring")
+                src.backup(dst)
+            finally:
+                dst.close()
+        finally:
+            src.close()
+            os.unlink(tmp)
+        nbytes = os.path.getsize(target.url.database)
+    elif target.dialect.name == 'postgresql':
+        subprocess.run(
+            ['pg_restore', '--clean', '--if-exists', '--no-owner', f'--dbname={_pg_url(target)}', path],
+            check=True
+        )
+        nbytes = os.path.getsize(path)
+    else:
+        raise ValueError(f"Restores are not supported for {target.dialect.name}")
+    target.dispose()
+    bump_shard_map_version()
+    seconds = time.perf_counter() - started
+    return {'shard': shard, 'bytes': nbytes, 'seconds': round(seconds, 2), 'mb_per_second': _throughput(nbytes, seconds)}
+
+
+def _encode(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+def export_tenant(user_id):
+    """
+    Yield one user's data as gzip'd JSON lines, chunk by chunk (streamable)
+    Lines: a header object, then per table {"table", "columns"} followed by
+    one JSON array per row. All tables are read from a single snapshot.
+    """
+    target = shard_engine(tenant_shard(user_id)[0])
+    compressor = zlib.compressobj(COMPRESS_LEVEL, zlib.DEFLATED, 31)  # wbits 31: gzip container
+
+    def lines(objects):
+        return compressor.compress(b''.join(json.dumps(o, separators=(',', ':')).encode() + b'\n' for o in objects))
+
+    yield lines([{
+        'format': EXPORT_FORMAT, 'version': EXPORT_VERSION,
+        'user_id': user_id, 'exported_at': datetime.utcnow().isoformat(),
+    }])
+    with target.connect() as conn:
+        if conn.dialect.name == 'sqlite':
+            conn.exec_driver_sql('BEGIN')
+        else:
+            conn.execution_options(isolation_level='REPEATABLE READ')
+        for model in TENANT_TABLES:
+            table = model.__table__
+            yield lines([{'table': table.name, 'columns': [c.name for c in table.columns]}])
+            result = conn.execute(
+                select(table).where(tenant_rows(model, user_id)).execution_options(yield_per=EXPORT_BATCH)
+            )
+            for rows in result.partitions():
+                yield lines([_encode(value) for value in row] for row in rows)
+        conn.rollback()
+    yield compressor.flush()
+
+
+def import_tenant(stream, expected_user_id=None):
+    """
+    Replace a user's data with an export_tenant() file, in one transaction
+    Ids are kept, so this restores a tenant in place (on its current shard).
+    Restored rows get a new change_seq and dropped rows a tombstone, so
+    delta sync clients pick up the difference.
+    Returns:
+        dict with the user, rows per table, bytes read and seconds taken
+    Raises:
+        ValueError if the file is not a tenant export, belongs to a user other
+        than expected_user_id, the user does not exist, or its rows point
+        outside the export or collide with other tenants' ids
+    """
+    started = time.perf_counter()
+    counted = _CountingReader(stream)
+    reader = io.TextIOWrapper(gzip.GzipFile(fileobj=counted), encoding='utf-8')
+    try:
+        header = json.loads(reader.readline() or 'null')
+    except (OSError, ValueError):
+        raise ValueError('Not a tenant export')
+    if not isinstance(header, dict) or header.get('format') != EXPORT_FORMAT or header.get('version') != EXPORT_VERSION:
+        raise ValueError('Not a tenant export')
+    user_id = header['user_id']
+    if expected_user_id is not None and user_id != expected_user_id:
+        raise ValueError(f"Export belongs to user {user_id}")
+
+    with engine.connect() as conn:
+        if conn.execute(select(User.id).where(User.id == user_id)).first() is None:
+            raise ValueError(f"Unknown user: {user_id}")
+
+    tables = {model.__table__.name: model for model in TENANT_TABLES}
+    restored = {}
+    # Ids of the export's own customers/invoices: every reference must stay inside it
+    imported = {Customer: set(), Invoice: set(), InvoiceArchive: set()}
+    shard = tenant_shard(user_id)[0]
+    try:
+        _restore_rows(shard_engine(shard), shard_offset(shard), user_id, reader, tables, restored, imported)
+    except IntegrityError:
+        raise ValueError('Export ids collide with existing rows of another user')
+
+    from services.tenant_context import invalidate
+    invalidate(user_id)
+    seconds = time.perf_counter() - started
+    return {
+        'user_id': user_id,
+        'rows': restored,
+        'bytes': counted.count,
+        'seconds': round(seconds, 2),
+        'mb_per_second': _throughput(counted.count, seconds),
+    }
+
+
+def _restore_rows(target, offset, user_id, reader, tables, restored, imported):
+    """import_tenant's transaction: replace the rows, then move sync state forward"""
+    with target.begin() as conn:
+        before = {model: set(conn.execute(select(model.id).where(model.user_id == user_id)).scalars())
+                  for model in (Customer, Invoice)}
+        previous = conn.execute(select(SyncCounter.value).where(SyncCounter.user_id == user_id)).scalar() or 0
+        for model in reversed(TENANT_TABLES):
+            conn.execute(delete(model).where(tenant_rows(model, user_id)))
+
+        model, columns, dates, batch = None, None, (), []
+        try:
+            for line in reader:
+                item = json.loads(line)
+                if isinstance(item, dict):
+                    _insert_rows(conn, model, columns, batch)
+                    model, batch = tables.get(item.get('table')), []
+                    if model is None:
+                        raise ValueError(f"Unknown table in export: {item.get('table')}")
+                    columns = item['columns']
+                    if set(columns) - set(model.__table__.columns.keys()):
+                        raise ValueError(f"Unknown columns for {item['table']}")
+                    dates = [i for i, name in enumerate(columns) if isinstance(model.__table__.c[name].type, DateTime)]
+                    restored[item['table']] = 0
+                    continue
+                if model is None or len(item) != len(columns):
+                    raise ValueError('Malformed tenant export')
+                for i in dates:
+                    if item[i] is not None:
+                        item[i] = datetime.fromisoformat(item[i])
+                row = dict(zip(columns, item))
+                if row.get('user_id', user_id) != user_id:
+                    raise ValueError('Export contains rows of another user')
+                parent = PARENTS.get(model)
+                if parent is not None and row.get('invoice_id') not in imported[parent]:
+                    raise ValueError('Export contains line items of invoices outside the export')
+                if model in (Invoice, InvoiceArchive) and row.get('customer_id') not in imported[Customer]:
+                    raise ValueError('Export contains invoices of customers outside the export')
+                if model in imported:
+                    imported[model].add(row.get('id'))
+                batch.append(row)
+                restored[model.__table__.name] += 1
+                if len(batch) >= EXPORT_BATCH:
+                    _insert_rows(conn, model, columns, batch)
+                    batch = []
+        except (OSError, EOFError, UnicodeDecodeError, json.JSONDecodeError):
+            raise ValueError('Tenant export is truncated or corrupt')
+        _insert_rows(conn, model, columns, batch)
+        # Exported ids may come from another shard's range
+        for table in ID_RANGE_TABLES:
+            reset_id_sequence(conn, table, offset)
+
+        # Counter never goes backwards: clients holding a newer token re-fetch everything
+        restored_counter = conn.execute(select(SyncCounter.value).where(SyncCounter.user_id == user_id)).scalar() or 0
+        conn.execute(delete(SyncCounter).where(SyncCounter.user_id == user_id))
+        conn.execute(insert(SyncCounter).values(user_id=user_id, value=max(previous, restored_counter)))
+        seq = allocate_change_seq(conn, user_id)
+        for model, entity in ((Customer, 'customer'), (Invoice, 'invoice')):
+            conn.execute(model.__table__.update().where(model.user_id == user_id).values(change_seq=seq))
+            after = set(conn.execute(select(model.id).where(model.user_id == user_id)).scalars())
+            gone = before[model] - after
+            if gone:
+                conn.execute(insert(SyncTombstone), [
+                    {'user_id': user_id, 'entity': entity, 'entity_id': entity_id, 'change_seq': seq}
+                    for entity_id in gone
+                ])
+
+
+def _insert_rows(conn, model, columns, rows):
+    if model is not None and rows:
+        conn.execute(insert(model.__table__), rows)
+
+
+class _CountingReader:
+    """File wrapper counting the compressed bytes read (for throughput)"""
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.count = 0
+
+    def read(self, size=-1):
+        data = self.stream.read(size)
+        self.count += len(data)
+        return data
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description='Online backups and per-tenant export/restore')
+    commands = parser.add_subparsers(dest='command', required=True)
+    backup = commands.add_parser('backup', help='back up every shard')
+    backup.add_argument('--dest', default=BACKUP_DIR)
+    backup.add_argument('--job', help=argparse.SUPPRESS)
+    restore = commands.add_parser('restore', help='replace a shard with a backup file')
+    restore.add_argument('path')
+    restore.add_argument('--shard', default='default')
+    export = commands.add_parser('export', help="export one user's data")
+    export.add_argument('user_id', type=int)
+    export.add_argument('-o', '--output')
+    load = commands.add_parser('import', help="restore one user's data from an export")
+    load.add_argument('path')
+    args = parser.parse_args()
+
+    ensure_db()
+    if args.command == 'backup' and args.job:
+        run_backup_job(args.job, args.dest)
+    elif args.command == 'backup':
+        print(f"💾 Backing up to {args.dest}...")
+        stats = backup_database(args.dest)
+        for entry in stats['files']:
+            print(f"✅ {entry['shard']}: {entry['bytes'] / 1e6:.1f} MB -> {entry['compressed_bytes'] / 1e6:.1f} MB "
+                  f"in {entry['seconds']}s ({entry['mb_per_second']} MB/s) {entry['path']}")
+    elif args.command == 'restore':
+        try:
+            stats = restore_database(args.path, args.shard)
+        except RuntimeError as e:
+            parser.exit(1, f"❌ {e}\n")
+        print(f"✅ Restored {args.shard} ({stats['bytes'] / 1e6:.1f} MB) in {stats['seconds']}s")
+    elif args.command == 'export':
+        output = args.output or f"tenant-{args.user_id}-{datetime.utcnow():%Y%m%d-%H%M%S}.jsonl.gz"
+        started = time.perf_counter()
+        with open(output, 'wb') as f:
+            for chunk in export_tenant(args.user_id):
+                f.write(chunk)
+        seconds = time.perf_counter() - started
+        size = os.path.getsize(output)
+        print(f"✅ Exported user {args.user_id} to {output} ({size / 1e6:.1f} MB, {seconds:.2f}s)")
+    else:
+        with open(args.path, 'rb') as f:
+            stats = import_tenant(f)
+        print(f"✅ Restored user {stats['user_id']} in {stats['seconds']}s: "
+              + ', '.join(f"{table} {count}" for table, count in stats['rows'].items()))
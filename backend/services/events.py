@@ -0,0 +1,165 @@
+"""
+Live update events (Server-Sent Events fan-out)
+Writers call publish() after commit. The event travels once over a
+cross-worker channel and every worker hands it to the SSE streams of that
+user it is serving, so open browsers cost no queries between changes.
+
+Channels (EVENTS_CHANNEL):
+  unix     - datagram socket per worker in EVENTS_DIR (single host; default for SQLite)
+  postgres - LISTEN/NOTIFY (works across hosts; default for PostgreSQL)
+"""
+import glob
+import json
+import logging
+import os
+import queue
+import select
+import socket
+import threading
+from models import engine, DATABASE_URL
+
+logger = logging.getLogger(__name__)
+
+EVENTS_DIR = os.environ.get('EVENTS_DIR', '/tmp/autoparts-events')
+PG_CHANNEL = 'autoparts_events'
+
+# Slow consumers get dropped events rather than unbounded memory
+SUBSCRIBER_QUEUE_SIZE = 100
+
+
+class UnixChannel:
+    """One datagram socket per process; publish sends to every socket in the directory"""
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    def bind(self):
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, f"{os.getpid()}.sock")
+        if os.path.exists(path):
+            os.unlink(path)
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        sock.bind(path)
+        return sock
+
+    def run(self, sock, deliver):
+        while True:
+            deliver(sock.recv(65536))
+
+    def send(self, payload):
+        sender = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        try:
+            for path in glob.glob(os.path.join(self.directory, '*.sock')):
+                try:
+                    sender.sendto(payload, path)
+                except (ConnectionRefusedError, FileNotFoundError):
+                    # Worker exited without cleaning up
+                    try:
+                        os.unlink(path)
+                    except OSError:
+                        pass
+                except OSError as e:
+                    logger.warning("event delivery to %s failed: %s", path, e)
+        finally:
+            sender.close()
+
+
+class PostgresChannel:
+    """LISTEN/NOTIFY on a dedicated connection outside the pool"""
+
+    def bind(self):
+        import psycopg2
+        conn = psycopg2.connect(**engine.url.translate_connect_args(username='user', database='dbname'),
+                                **engine.url.query)
+        conn.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+        with conn.cursor() as cursor:
+            cursor.execute(f"LISTEN {PG_CHANNEL}")
+        return conn
+
+    def run(self, conn, deliver):
+        while True:
+            if select.select([conn], [], [], 30) == ([], [], []):
+                continue
+            conn.poll()
+            while conn.notifies:
+                deliver(conn.notifies.pop(0).payload.encode())
+
+    def send(self, payload):
+        with engine.begin() as conn:
+            conn.exec_driver_sql("SELECT pg_notify(%s, %s)", (PG_CHANNEL, payload.decode()))
+
+
+class Broker:
+    """Per-process registry of SSE subscribers, keyed by user_id"""
+
+    def __init__(self, channel):
+        self.channel = channel
+        self._subscribers = {}
+        self._lock = threading.Lock()
+        self._listener = None
+        self._listener_pid = None
+
+    def _ensure_listener(self):
+        # Started lazily in the worker that serves streams (never in the preload
+        # master); bound before returning so no event after subscribe is missed
+        if self._listener_pid == os.getpid() and self._listener.is_alive():
+            return
+        handle = self.channel.bind()
+        self._listener_pid = os.getpid()
+        self._listener = threading.Thread(target=self._listen, args=(handle,), name='events-listener', daemon=True)
+        self._listener.start()
+
+    def _listen(self, handle):
+        try:
+            self.channel.run(handle, self._deliver)
+        except Exception:
+            logger.exception("event listener stopped")
+
+    def _deliver(self, payload):
+        try:
+            message = json.loads(payload)
+        except ValueError:
+            return
+        with self._lock:
+            targets = list(self._subscribers.get(message.get('user_id'), ()))
+        for q in targets:
+            try:
+                q.put_nowait(message)
+            except queue.Full:
+                pass
+
+    def subscribe(self, user_id):
+        q = queue.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        with self._lock:
+            self._ensure_listener()
+            self._subscribers.setdefault(user_id, set()).add(q)
+        return q
+
+    def unsubscribe(self, user_id, q):
+        with self._lock:
+            subscribers = self._subscribers.get(user_id)
+            if subscribers:
+                subscribers.discard(q)
+                if not subscribers:
+                    del self._subscribers[user_id]
+
+    def stream_count(self):
+        with self._lock:
+            return sum(len(s) for s in self._subscribers.values())
+
+    def publish(self, user_id, event_type, data):
+        """Send an event to every open stream of user_id (all workers). Never raises."""
+        payload = json.dumps({'user_id': user_id, 'type': event_type, 'data': data}, default=str).encode()
+        try:
+            self.channel.send(payload)
+        except Exception:
+            logger.exception("failed to publish %s event", event_type)
+
+
+def _default_channel():
+    name = os.environ.get('EVENTS_CHANNEL') or ('postgres' if DATABASE_URL.startswith('postgresql') else 'unix')
+    return PostgresChannel() if name == 'postgres' else UnixChannel(EVENTS_DIR)
+
+
+broker = Broker(_default_channel())
+publish = broker.publish
@@ -0,0 +1,56 @@
+"""
+HTTP validators for conditional GETs
+Endpoints derive an ETag from a cheap version lookup (updated_at columns,
+or the per-user sync counter for lists) and answer If-None-Match /
+If-Modified-Since with 304 before running the full query and serializing.
+ETags include the user id; the compression middleware keys its cache on them.
+"""
+import hashlib
+from flask import Response, request
+from sqlalchemy import bindparam, select
+from werkzeug.http import is_resource_modified
+from models import SyncCounter
+
+# Bump when response shapes change so clients drop cached representations
+ETAG_VERSION = '1'
+
+# Per-user data: browsers may keep it but must revalidate every time
+CACHE_CONTROL = 'private, no-cache'
+
+
+def make_etag(*parts):
+    """Strong ETag value from the parts that identify one representation"""
+    raw = '|'.join([ETAG_VERSION] + [str(part) for part in parts])
+    return hashlib.sha1(raw.encode()).hexdigest()
+
+
+# Runs on nearly every request: built once, bound per call
+_LIST_VERSION = select(SyncCounter.value).where(SyncCounter.user_id == bindparam('user_id'))
+
+
+def list_version(db, user_id):
+    """
+    Version of everything a user's lists show
+    The sync counter moves on every customer/invoice write (and archival),
+    so it changes whenever a list might; one primary-key lookup.
+    """
+    return db.execute(_LIST_VERSION, {'user_id': user_id}).scalar() or 0
+
+
+def not_modified(etag, last_modified=None):
+    """
+    304 response if the client's copy is current, else None
+    If-None-Match uses weak comparison: compressed responses carry W/ ETags.
+    """
+    if is_resource_modified(request.environ, etag=etag, last_modified=last_modified):
+        return None
+    return add_validators(Response(status=304), etag, last_modified)
+
+
+def add_validators(response, etag, last_modified=None, cache_control=CACHE_CONTROL):
+    """Attach ETag, Last-Modified and Cache-Control to a response"""
+    response.set_etag(etag)
+    if last_modified is not None:
+        response.last_modified = last_modified
+    response.headers['Cache-Control'] = cache_control
+    return response
@@ -0,0 +1,120 @@
+"""
+Customer CSV import
+Parses the upload row by row (never the whole file in memory), skips rows
+that duplicate an existing customer or an earlier row, and inserts the rest
+in executemany chunks. Existing customers are loaded into a set of
+normalized keys with a single query up front.
+"""
+import csv
+import io
+import re
+from datetime import datetime
+from sqlalchemy import select
+from models import Customer, tenant_session
+from services.sync_service import allocate_change_seq
+
+CHUNK_SIZE = 2000
+
+# Only the first few errors are reported back in detail
+MAX_ERROR_DETAILS = 50
+
+FIELDS = ('name', 'address', 'phone', 'email')
+MAX_LENGTHS = {
+    'name': Customer.name.type.length,
+    'phone': Customer.phone.type.length,
+    'email': Customer.email.type.length,
+}
+
+_SPACES = re.compile(r'\s+')
+_NON_DIGITS = re.compile(r'\D')
+
+
+def normalize_key(name, phone, email):
+    """Dedup key: case/whitespace-insensitive name, phone digits, lowercase email"""
+    return (
+        _SPACES.sub(' ', (name or '').strip()).casefold(),
+        _NON_DIGITS.sub('', phone or ''),
+        (email or '').strip().casefold()
+    )
+
+
+def import_customers(stream, user_id, chunk_size=CHUNK_SIZE):
+    """
+    Import customers from a CSV byte stream with a header row
+    Recognized columns: name (required), address, phone, email; others are ignored.
+    Each chunk is committed on its own, so a failure part way keeps earlier rows.
+    Returns:
+        dict with inserted/skipped/errored counts and the first errors
+    """
+    reader = csv.DictReader(io.TextIOWrapper(stream, encoding='utf-8-sig', newline=''))
+    summary = {'inserted': 0, 'skipped': 0, 'errored': 0, 'errors': []}
+
+    def error(line, message):
+        summary['errored'] += 1
+        if len(summary['errors']) < MAX_ERROR_DETAILS:
+            summary['errors'].append({'line': line, 'error': message})
+
+    db = tenant_session(user_id)
+    try:
+        existing = db.execute(
+            select(Customer.name, Customer.phone, Customer.email).where(Customer.user_id == user_id)
+        )
+        seen = {normalize_key(*row) for row in existing}
+
+        try:
+            header = reader.fieldnames
+        except UnicodeDecodeError:
+            raise ValueError('CSV must be UTF-8 encoded')
+        if not header:
+            raise ValueError('CSV is empty')
+        columns = {(h or '').strip().lower(): h for h in header}
+        if 'name' not in columns:
+            raise ValueError('CSV must have a name column')
+
+        pending = []
+        try:
+            for raw in reader:
+                line = reader.line_num
+                row = {field: (raw.get(columns[field]) or '').strip() if field in columns else '' for field in FIELDS}
+                if not any(row.values()):
+                    continue
+                if not row['name']:
+                    error(line, 'Customer name is required')
+                    continue
+                too_long = [f for f, limit in MAX_LENGTHS.items() if len(row[f]) > limit]
+                if too_long:
+                    error(line, f"{too_long[0]} is longer than {MAX_LENGTHS[too_long[0]]} characters")
+                    continue
+
+                key = normalize_key(row['name'], row['phone'], row['email'])
+                if key in seen:
+                    summary['skipped'] += 1
+                    continue
+                seen.add(key)
+
+                pending.append(row)
+                if len(pending) >= chunk_size:
+                    summary['inserted'] += _insert_chunk(db, user_id, pending)
+                    pending = []
+        except UnicodeDecodeError:
+            error(reader.line_num + 1, 'CSV must be UTF-8 encoded; import stopped')
+        except csv.Error as e:
+            error(reader.line_num, f"Malformed CSV ({e}); import stopped")
+
+        if pending:
+            summary['inserted'] += _insert_chunk(db, user_id, pending)
+        return summary
+    finally:
+        db.close()
+
+
+def _insert_chunk(db, user_id, rows):
+    """executemany INSERT of one chunk with consecutive change_seq values"""
+    now = datetime.utcnow()
+    conn = db.connection()
+    seq = allocate_change_seq(conn, user_id, len(rows))
+    for offset, row in enumerate(rows):
+        row.update(user_id=user_id, created_at=now, updated_at=now, change_seq=seq + offset)
+    conn.execute(Customer.__table__.insert(), rows)
+    db.commit()
+    return len(rows)
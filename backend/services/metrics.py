@@ -0,0 +1,149 @@
+"""
+Prometheus metrics for the API
+Works across gunicorn workers when PROMETHEUS_MULTIPROC_DIR is set
+(gunicorn_config.py sets it up); falls back to an in-process registry
+for the Flask dev server.
+"""
+import hmac
+import os
+import time
+from flask import request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from prometheus_client import (
+    CollectorRegistry, Counter, Gauge, Histogram,
+    CONTENT_TYPE_LATEST, REGISTRY, generate_latest
+)
+
+MULTIPROC_DIR = os.environ.get('PROMETHEUS_MULTIPROC_DIR')
+
+# Scrapers send "Authorization: Bearer <METRICS_TOKEN>". Without a token the
+# endpoint is only open outside production.
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+
+# Request latency buckets tuned for a small Flask app (5ms .. 10s)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# PDF sizes range from a few KB (one line item) to a few hundred KB
+PDF_SIZE_BUCKETS = (4096, 8192, 16384, 32768, 65536, 131072, 262144, 524288, 1048576)
+
+REQUEST_LATENCY = Histogram(
+    'autoparts_request_duration_seconds',
+    'Request latency by blueprint and endpoint',
+    ['blueprint', 'endpoint', 'method'],
+    buckets=LATENCY_BUCKETS
+)
+
+REQUEST_COUNT = Counter(
+    'autoparts_requests_total',
+    'Requests served by blueprint, endpoint and status code',
+    ['blueprint', 'endpoint', 'method', 'status']
+)
+
+PDF_RENDER_SECONDS = Histogram(
+    'autoparts_pdf_render_seconds',
+    'Time spent rendering PDF documents',
+    ['kind'],
+    buckets=LATENCY_BUCKETS
+)
+
+PDF_SIZE_BYTES = Histogram(
+    'autoparts_pdf_size_bytes',
+    'Size of rendered PDF documents',
+    ['kind'],
+    buckets=PDF_SIZE_BUCKETS
+)
+
+DB_POOL_CHECKED_OUT = Gauge(
+    'autoparts_db_pool_checked_out',
+    'Database connections currently checked out of the pool',
+    multiprocess_mode='livesum'
+)
+
+DB_POOL_OVERFLOW = Gauge(
+    'autoparts_db_pool_overflow',
+    'Database connections opened beyond the pool size',
+    multiprocess_mode='livesum'
+)
+
+CACHE_REQUESTS = Counter(
+    'autoparts_cache_requests_total',
+    'Cache lookups by cache name and result (hit ratio = hit / total)',
+    ['cache', 'result']
+)
+
+
+def observe_pdf(kind, started, size):
+    """Record one PDF render (started is a time.perf_counter() value)"""
+    PDF_RENDER_SECONDS.labels(kind).observe(time.perf_counter() - started)
+    PDF_SIZE_BYTES.labels(kind).observe(size)
+
+
+def record_cache(cache, hit):
+    """Record a cache lookup for hit-ratio reporting"""
+    CACHE_REQUESTS.labels(cache, 'hit' if hit else 'miss').inc()
+
+
+def update_pool_gauges(engine):
+    """Refresh pool gauges from the engine (SQLite memory pools have no counters)"""
+    pool = engine.pool
+    if hasattr(pool, 'checkedout'):
+        DB_POOL_CHECKED_OUT.set(pool.checkedout())
+    if hasattr(pool, 'overflow'):
+        DB_POOL_OVERFLOW.set(max(pool.overflow(), 0))
+
+
+def render_latest():
+    """Return (payload, content_type) for the metrics endpoint"""
+    if MULTIPROC_DIR:
+        from prometheus_client import multiprocess
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
+
+
+def scrape_allowed():
+    """True if the current request may read /api/metrics"""
+    if not METRICS_TOKEN:
+        return os.environ.get('FLASK_ENV') != 'production'
+    scheme, _, token = request.headers.get('Authorization', '').partition(' ')
+    return scheme.lower() == 'bearer' and hmac.compare_digest(token.encode(), METRICS_TOKEN.encode())
+
+
+def mark_process_dead(pid):
+    """Drop live gauges of an exited gunicorn worker"""
+    if MULTIPROC_DIR:
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(pid)
+
+
+def _record_compiled_cache(conn, cursor, statement, parameters, context, executemany):
+    # Textual SQL and DDL aren't cached; only compiled statements count
+    if context.compiled is not None:
+        record_cache('sql_compiled', context.cache_hit == context.dialect.CACHE_HIT)
+
+
+def init_app(app, engine):
+    """Install request timing hooks on the Flask app"""
+    # Every engine (shards included): SQLAlchemy compiled cache hit ratio
+    if not event.contains(Engine, 'after_cursor_execute', _record_compiled_cache):
+        event.listen(Engine, 'after_cursor_execute', _record_compiled_cache)
+
+    # Kept in the WSGI environ rather than g: batched sub-requests share g
+    @app.before_request
+    def _start_timer():
+        request.environ['autoparts.metrics_start'] = time.perf_counter()
+
+    @app.after_request
+    def _record_request(response):
+        started = request.environ.pop('autoparts.metrics_start', None)
+        if started is None:
+            return response
+        blueprint = request.blueprint or 'app'
+        endpoint = request.endpoint or 'unmatched'
+        REQUEST_LATENCY.labels(blueprint, endpoint, request.method).observe(time.perf_counter() - started)
+        REQUEST_COUNT.labels(blueprint, endpoint, request.method, str(response.status_code)).inc()
+        update_pool_gauges(engine)
+        return response
@@ -0,0 +1,109 @@
+"""
+Password hashing off the request path
+Hashes are deliberately slow (scrypt is ~100ms of CPU and 32MB of memory
+per call), so they run on a small per-process thread pool instead of in
+the request thread. hashlib releases the GIL while hashing, so a gthread
+worker's other threads keep serving, and the pool bounds how many hashes
+one worker runs at once. When the pool and its queue are full, or a job
+waits too long, callers get PasswordHashingBusy (login answers 503)
+instead of piling up until the worker timeout.
+
+Hashes made with another method or cost than PASSWORD_HASH_METHOD are
+replaced on the next successful login, so changing it upgrades accounts
+as they sign in.
+
+Configuration (env):
+  PASSWORD_HASH_METHOD  - werkzeug method string: scrypt[:n:r:p] or
+                          pbkdf2[:hash[:iterations]] (default scrypt:32768:8:1)
+  PASSWORD_HASH_THREADS - hashes running at once per process (default 1)
+  PASSWORD_HASH_QUEUE   - hashes waiting per process before rejecting (default 4)
+  PASSWORD_HASH_TIMEOUT - seconds a caller waits for its hash (default 5)
+"""
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+from werkzeug.security import DEFAULT_PBKDF2_ITERATIONS, check_password_hash, generate_password_hash
+
+HASH_THREADS = int(os.environ.get('PASSWORD_HASH_THREADS', '1'))
+HASH_QUEUE = int(os.environ.get('PASSWORD_HASH_QUEUE', '4'))
+HASH_TIMEOUT = float(os.environ.get('PASSWORD_HASH_TIMEOUT', '5'))
+
+
+class PasswordHashingBusy(Exception):
+    """The hashing pool is saturated; retry shortly"""
+
+
+def normalize_method(method):
+    """Method string with werkzeug's defaults filled in, as stored in hashes"""
+    name, *args = method.split(':')
+    if name == 'scrypt':
+        defaults = ['32768', '8', '1']
+    elif name == 'pbkdf2':
+        defaults = ['sha256', str(DEFAULT_PBKDF2_ITERATIONS)]
+    else:
+        raise ValueError(f"Unsupported password hash method: {method}")
+    return ':'.join([name] + args + defaults[len(args):])
+
+
+HASH_METHOD = normalize_method(os.environ.get('PASSWORD_HASH_METHOD', 'scrypt'))
+
+
+def needs_rehash(password_hash):
+    """True if password_hash was made with another method or cost than HASH_METHOD"""
+    return password_hash.split('$', 1)[0] != HASH_METHOD
+
+
+class _Pool:
+    """Thread pool plus a cap on running + queued jobs (recreated after fork)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pid = None
+
+    def run(self, func, *args):
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._executor = ThreadPoolExecutor(HASH_THREADS, thread_name_prefix='password-hash')
+                    self._slots = threading.BoundedSemaphore(HASH_THREADS + HASH_QUEUE)
+                    self._pid = os.getpid()
+        slots = self._slots
+        if not slots.acquire(blocking=False):
+            raise PasswordHashingBusy()
+        try:
+            future = self._executor.submit(func, *args)
+        except BaseException:
+            slots.release()
+            raise
+        future.add_done_callback(lambda _: slots.release())
+        try:
+            return future.result(timeout=HASH_TIMEOUT)
+        except TimeoutError:
+            future.cancel()  # still queued: drop it; already running: let it finish
+            raise PasswordHashingBusy()
+
+
+_pool = _Pool()
+
+
+def hash_password(password):
+    """Hash password with HASH_METHOD on the hashing pool"""
+    return _pool.run(generate_password_hash, password, HASH_METHOD)
+
+
+def _verify(password_hash, password):
+    if not check_password_hash(password_hash, password):
+        return False, None
+    return True, generate_password_hash(password, HASH_METHOD) if needs_rehash(password_hash) else None
+
+
+def verify_password(password_hash, password):
+    """
+    Check password on the hashing pool
+    Returns:
+        (matches, new_hash) - new_hash is set when the password matched but
+        its stored hash is outdated and should be replaced
+    Raises:
+        PasswordHashingBusy if the pool is saturated
+    """
+    return _pool.run(_verify, password_hash, password)
@@ -1,8 +1,20 @@
 """
 PDF generation service using ReportLab
 Lightweight and fast for old hardware
+
+Usage (from backend/), statements for every customer of a user:
+    python -m services.pdf_service statements USER_ID [--month 2024-05] [--out statements] [--workers 4]
 """
+import argparse
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
 from io import BytesIO
+from itertools import chain
+from sqlalchemy import and_, case, func, select, true, union_all
+from models import Customer, Invoice, InvoiceArchive, dispose_engine, ensure_db, tenant_session
 from reportlab.lib.pagesizes import letter
 from reportlab.lib.units import inch
 from reportlab.lib import colors
@@ -15,7 +27,7 @@ def generate_invoice_pdf(invoice, business):
     Generate PDF invoice
     Args:
         invoice: Invoice model instance (with line_items, customer)
-        business: BusinessInfo model instance
+        business: BusinessInfo instance or tenant context snapshot (same attributes)
     Returns:
         BytesIO buffer with PDF content
     """
@@ -133,3 +145,279 @@ def generate_invoice_pdf(invoice, business):
     doc.build(elements)
     buffer.seek(0)
     return buffer
+
+
+# Statement rows per table: each chunk is laid out and released before the next is read
+STATEMENT_CHUNK_ROWS = 40
+
+# Statements up to this size stay in memory, larger ones spill to a temp file
+STATEMENT_SPOOL_BYTES = 1024 * 1024
+
+# Aging buckets: (label, minimum age in days) of outstanding invoices
+AGING_BUCKETS = (('Current', 0), ('31-60 days', 31), ('61-90 days', 61), ('Over 90 days', 91))
+
+
+def statement_period(month=None):
+    """
+    'YYYY-MM' -> (start, end) datetimes of that month; last month when None
+    Raises:
+        ValueError if month is not YYYY-MM
+    """
+    if month:
+        start = datetime.strptime(month, '%Y-%m')
+    else:
+        start = (datetime.utcnow().replace(day=1) - timedelta(days=1)).replace(day=1)
+    start = start.replace(hour=0, minute=0, second=0, microsecond=0)
+    end = (start + timedelta(days=32)).replace(day=1)
+    return start, end
+
+
+def statement_query(user_id, customer_id, start, end, as_of):
+    """
+    One statement in a single query: a totals row (customer, opening balance,
+    period total, aging of outstanding invoices) outer-joined to the period's
+    invoices with their running outstanding balance, hot and archived alike.
+    The totals columns repeat on every row; invoice columns are NULL when the
+    period is empty. No row at all means the customer does not exist.
+    """
+    def invoices_of(model):
+        return select(
+            model.id, model.invoice_number, model.invoice_date, model.status, model.total, model.customer_id
+        ).where(model.user_id == user_id, model.customer_id == customer_id, model.invoice_date < end)
+
+    invoices = union_all(invoices_of(Invoice), invoices_of(InvoiceArchive)).cte('statement_invoices')
+    outstanding = invoices.c.status != 'paid'
+
+    def total_where(*conditions):
+        return func.coalesce(func.sum(case((and_(*conditions), invoices.c.total), else_=0)), 0)
+
+    aging = []
+    for index, (label, min_age) in enumerate(AGING_BUCKETS):
+        conditions = [outstanding, invoices.c.invoice_date <= as_of - timedelta(days=min_age)]
+        if index + 1 < len(AGING_BUCKETS):
+            conditions.append(invoices.c.invoice_date > as_of - timedelta(days=AGING_BUCKETS[index + 1][1]))
+        aging.append(total_where(*conditions).label(f"aging_{index}"))
+
+    totals = select(
+        Customer.name, Customer.address, Customer.phone, Customer.email,
+        total_where(outstanding, invoices.c.invoice_date < start).label('opening_balance'),
+        total_where(invoices.c.invoice_date >= start).label('period_total'),
+        total_where(outstanding, invoices.c.invoice_date >= start).label('period_outstanding'),
+        *aging
+    ).select_from(Customer).outerjoin(
+        invoices, invoices.c.customer_id == Customer.id
+    ).where(
+        Customer.id == customer_id, Customer.user_id == user_id
+    ).group_by(Customer.id).subquery('totals')
+
+    period = select(
+        invoices.c.id, invoices.c.invoice_number, invoices.c.invoice_date, invoices.c.status, invoices.c.total,
+        func.sum(case((outstanding, invoices.c.total), else_=0)).over(
+            order_by=(invoices.c.invoice_date, invoices.c.id)
+        ).label('running_outstanding')
+    ).where(invoices.c.invoice_date >= start).subquery('period')
+
+    return select(totals, period).select_from(totals.outerjoin(period, true())).order_by(
+        period.c.invoice_date, period.c.id
+    )
+
+
+class _FlowableStream(list):
+    """
+    Flowable list that refills itself from a generator as ReportLab consumes
+    it, so only the flowables of the current page exist at any time
+    """
+
+    def __init__(self, flowables):
+        super().__init__()
+        self._source = iter(flowables)
+
+    def __len__(self):
+        # Two queued flowables let keepWithNext look one ahead
+        while super().__len__() < 2:
+            item = next(self._source, None)
+            if item is None:
+                break
+            self.append(item)
+        return super().__len__()
+
+
+def _money(value):
+    return f"${value:.2f}"
+
+
+def _statement_table(data, style):
+    """One chunk of statement rows (header repeated when it splits across pages)"""
+    table = Table(data, colWidths=[1.2*inch, 2.3*inch, 1*inch, 1.25*inch, 1.25*inch], repeatRows=1)
+    table.setStyle(TableStyle(style))
+    return table
+
+
+def generate_statement_pdf(db, user_id, customer_id, business, start, end, output=None):
+    """
+    Generate a customer statement for [start, end)
+    Invoice rows are streamed from the database and laid out in
+    STATEMENT_CHUNK_ROWS tables, so memory does not grow with the number of
+    invoices (ReportLab still keeps each finished page's compressed content).
+    Args:
+        db: session on the user's shard
+        business: BusinessInfo instance or tenant context snapshot
+        output: writable binary file; a spooled temp file when None
+    Returns:
+        output positioned at 0, or None if the customer does not exist
+    """
+    as_of = min(end, datetime.utcnow())
+    result = db.execute(
+        statement_query(user_id, customer_id, start, end, as_of).execution_options(yield_per=STATEMENT_CHUNK_ROWS)
+    )
+    first = result.fetchone()
+    if first is None:
+        result.close()
+        return None
+
+    if output is None:
+        output = tempfile.SpooledTemporaryFile(max_size=STATEMENT_SPOOL_BYTES)
+    doc = SimpleDocTemplate(output, pagesize=letter, rightMargin=0.5*inch, leftMargin=0.5*inch, topMargin=0.5*inch, bottomMargin=0.5*inch)
+    styles = getSampleStyleSheet()
+    title_style = ParagraphStyle('StatementTitle', parent=styles['Heading1'], fontSize=24,
+                                 textColor=colors.HexColor('#1f2937'), spaceAfter=12, alignment=TA_CENTER)
+    heading_style = ParagraphStyle('StatementHeading', parent=styles['Heading2'], fontSize=12,
+                                   textColor=colors.HexColor('#374151'), spaceAfter=6, spaceBefore=12)
+    normal_style = ParagraphStyle('StatementNormal', parent=styles['Normal'], fontSize=10)
+
+    opening = first.opening_balance
+    closing = opening + first.period_outstanding
+    grid_style = [
+        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#f3f4f6')),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, -1), 9),
+        ('ALIGN', (-2, 1), (-1, -1), 'RIGHT'),
+        ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
+    ]
+    summary_style = grid_style[:3] + [('ALIGN', (0, 0), (-1, -1), 'CENTER'), grid_style[-1]]
+
+    def header():
+        yield Paragraph("STATEMENT", title_style)
+        info_table = Table([[
+            Paragraph(f"<b>{business.company_name}</b><br/>{business.address.replace(chr(10), '<br/>')}<br/>Phone: {business.phone}<br/>Email: {business.email}<br/>Tax ID: {business.tax_id}", normal_style),
+            Paragraph(f"<b>Period:</b> {start.strftime('%Y-%m-%d')} to {(end - timedelta(days=1)).strftime('%Y-%m-%d')}<br/><b>Statement date:</b> {as_of.strftime('%Y-%m-%d')}", normal_style)
+        ]], colWidths=[4*inch, 3*inch])
+        info_table.setStyle(TableStyle([('VALIGN', (0, 0), (-1, -1), 'TOP'), ('ALIGN', (1, 0), (1, 0), 'RIGHT')]))
+        yield info_table
+
+        yield Paragraph("<b>Statement For:</b>", heading_style)
+        customer_text = f"{first.name}<br/>{first.address or ''}"
+        if first.phone:
+            customer_text += f"<br/>Phone: {first.phone}"
+        if first.email:
+            customer_text += f"<br/>Email: {first.email}"
+        yield Paragraph(customer_text, normal_style)
+
+        summary = Table([
+            ['Opening balance', 'Invoiced this period', 'Closing balance'],
+            [_money(opening), _money(first.period_total), _money(closing)],
+        ], colWidths=[2.3*inch] * 3)
+        summary.setStyle(TableStyle(summary_style))
+        yield Spacer(1, 0.2*inch)
+        yield summary
+
+        yield Paragraph("<b>Aging of Outstanding Balance:</b>", heading_style)
+        aging = Table([
+            [label for label, _ in AGING_BUCKETS],
+            [_money(getattr(first, f"aging_{index}")) for index in range(len(AGING_BUCKETS))],
+        ], colWidths=[1.725*inch] * len(AGING_BUCKETS))
+        aging.setStyle(TableStyle(summary_style))
+        yield aging
+        yield Paragraph("<b>Invoices:</b>", heading_style)
+
+    def invoice_tables():
+        rows = [first] if first.id is not None else []
+        chunk = [['Date', 'Invoice #', 'Status', 'Amount', 'Balance'],
+                 ['', 'Opening balance', '', '', _money(opening)]]
+        for row in chain(rows, result):
+            chunk.append([
+                row.invoice_date.strftime('%Y-%m-%d'),
+                row.invoice_number,
+                row.status.upper(),
+                _money(row.total),
+                _money(opening + row.running_outstanding),
+            ])
+            if len(chunk) > STATEMENT_CHUNK_ROWS:
+                yield _statement_table(chunk, grid_style)
+                chunk = [chunk[0]]
+        chunk.append(['', 'Closing balance', '', '', _money(closing)])
+        yield _statement_table(chunk, grid_style)
+
+    try:
+        doc.build(_FlowableStream(chain(header(), invoice_tables())))
+    finally:
+        result.close()
+    output.seek(0)
+    return output
+
+
+def _statement_job(job):
+    """Process pool task: render one statement to a file (runs in a worker process)"""
+    user_id, customer_id, business, start, end, path = job
+    db = tenant_session(user_id)
+    try:
+        with open(path, 'wb') as output:
+            written = generate_statement_pdf(db, user_id, customer_id, business, start, end, output)
+    finally:
+        db.close()
+    if written is None:
+        os.unlink(path)
+        return None
+    return path
+
+
+def generate_statements(user_id, month=None, out_dir='statements', workers=None):
+    """
+    Statements for every customer of user_id, rendered across a process pool
+    Returns:
+        dict with the written paths and elapsed seconds
+    Raises:
+        ValueError if month is malformed or business info is not configured
+    """
+    from services.tenant_context import get_context
+
+    ensure_db()
+    start, end = statement_period(month)
+    business = get_context(user_id).business
+    if business is None:
+        raise ValueError('Business info not configured')
+
+    db = tenant_session(user_id)
+    try:
+        customer_ids = db.execute(
+            select(Customer.id).where(Customer.user_id == user_id).order_by(Customer.id)
+        ).scalars().all()
+    finally:
+        db.close()
+
+    os.makedirs(out_dir, exist_ok=True)
+    label = start.strftime('%Y-%m')
+    jobs = [
+        (user_id, customer_id, business, start, end, os.path.join(out_dir, f"Statement_{customer_id}_{label}.pdf"))
+        for customer_id in customer_ids
+    ]
+    started = time.perf_counter()
+    # Forked workers drop the pooled connections inherited from this process
+    with ProcessPoolExecutor(max_workers=workers, initializer=dispose_engine) as pool:
+        paths = [path for path in pool.map(_statement_job, jobs, chunksize=8) if path]
+    return {'paths': paths, 'seconds': round(time.perf_counter() - started, 2)}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Render PDFs outside the web workers')
+    commands = parser.add_subparsers(dest='command', required=True)
+    statements = commands.add_parser('statements', help='monthly statements for every customer of a user')
+    statements.add_argument('user_id', type=int)
+    statements.add_argument('--month', help='YYYY-MM (default: last month)')
+    statements.add_argument('--out', default='statements')
+    statements.add_argument('--workers', type=int, help='processes (default: CPU count)')
+    args = parser.parse_args()
+
+    print(f"📄 Rendering statements for user {args.user_id}...")
+    stats = generate_statements(args.user_id, args.month, args.out, args.workers)
+    print(f"✅ Wrote {len(stats['paths'])} statements to {args.out} in {stats['seconds']}s")
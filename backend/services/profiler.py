@@ -0,0 +1,263 @@
+"""
+On-demand profiling of live workers
+An admin starts a time-boxed job; the job is written to a control file in
+PROFILE_DIR that every gunicorn worker notices on its next request (one
+stat per second while idle, nothing else). Two modes:
+
+  sample   - a background thread in each worker samples all thread stacks
+             every interval_ms and writes <pid>.collapsed (flamegraph.pl /
+             speedscope input)
+  requests - the next `count` requests to `endpoint`, across all workers,
+             run under cProfile and each leaves a .pstats file
+
+Results live in PROFILE_DIR/<job id>/ and can be merged by the admin API.
+Whoever can write PROFILE_DIR can start jobs in every worker, so it is
+created with mode 0700 and a control file is only trusted while the
+directory is private to the app's uid and the file belongs to it.
+"""
+import cProfile
+import glob
+import io
+import json
+import logging
+import os
+import pstats
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from flask import request
+
+logger = logging.getLogger(__name__)
+
+PROFILE_DIR = os.environ.get('PROFILE_DIR', '/tmp/autoparts-profiles')
+
+MAX_SECONDS = 120
+MAX_REQUESTS = 100
+MIN_INTERVAL_MS = 1
+
+# How often a worker re-checks the control file
+POLL_INTERVAL = 1.0
+
+
+def _frame_label(frame):
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def _collapse(frame):
+    """Frame -> 'root;...;leaf' collapsed stack"""
+    labels = []
+    while frame is not None:
+        labels.append(_frame_label(frame))
+        frame = frame.f_back
+    return ';'.join(reversed(labels))
+
+
+def _write_atomic(path, data):
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, 'w') as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+class Profiler:
+    """Per-process view of the shared control file"""
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.control_path = os.path.join(directory, 'active.json')
+        self._job = None
+        self._mtime = None
+        self._checked = 0.0
+        self._sampling = set()  # (job id, pid) pairs with a running sampler
+        self._lock = threading.Lock()
+
+    def job_dir(self, job_id):
+        return os.path.join(self.directory, job_id)
+
+    def _private(self):
+        """True if the directory belongs to this uid and no one else can enter it"""
+        try:
+            st = os.stat(self.directory)
+        except FileNotFoundError:
+            return False
+        return st.st_uid == os.getuid() and not st.st_mode & 0o077
+
+    def start(self, mode, seconds, endpoint=None, count=None, interval_ms=5):
+        """Publish a new job to all workers (replaces any running one)"""
+        os.makedirs(self.directory, mode=0o700, exist_ok=True)
+        if not self._private():
+            # exist_ok keeps a directory someone else created first: refuse it
+            raise PermissionError(f"{self.directory} must be owned by uid {os.getuid()} with mode 0700")
+        now = time.time()
+        job = {
+            'id': uuid.uuid4().hex[:12],
+            'mode': mode,
+            'endpoint': endpoint,
+            'count': count,
+            'interval_ms': interval_ms,
+            'started': now,
+            'until': now + seconds,
+        }
+        os.makedirs(self.job_dir(job['id']), exist_ok=True)
+        _write_atomic(os.path.join(self.job_dir(job['id']), 'job.json'), json.dumps(job))
+        _write_atomic(self.control_path, json.dumps(job))
+        self.poll(force=True)
+        return job
+
+    def stop(self):
+        try:
+            os.unlink(self.control_path)
+        except FileNotFoundError:
+            pass
+        self.poll(force=True)
+
+    def poll(self, force=False):
+        """Active job for this process (re-reads the control file at most once per POLL_INTERVAL)"""
+        now = time.monotonic()
+        if not force and now - self._checked < POLL_INTERVAL:
+            job = self._job
+        else:
+            self._checked = now
+            try:
+                mtime = os.stat(self.control_path).st_mtime_ns
+            except FileNotFoundError:
+                mtime = None
+            if mtime != self._mtime:
+                self._mtime = mtime
+                self._job = self._read_control() if mtime is not None else None
+            job = self._job
+        if job is None or time.time() >= job['until']:
+            return None
+        if job['mode'] == 'sample':
+            self._ensure_sampler(job)
+        return job
+
+    def _read_control(self):
+        try:
+            with open(self.control_path) as f:
+                if not self._private() or os.fstat(f.fileno()).st_uid != os.getuid():
+                    logger.warning("ignoring %s: %s is not private to uid %d",
+                                   self.control_path, self.directory, os.getuid())
+                    return None
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _ensure_sampler(self, job):
+        key = (job['id'], os.getpid())
+        with self._lock:
+            if key in self._sampling:
+                return
+            self._sampling.add(key)
+        threading.Thread(target=self._sample, args=(job,), name='profiler-sampler', daemon=True).start()
+
+    def _sample(self, job):
+        me = threading.get_ident()
+        interval = job['interval_ms'] / 1000
+        stacks = Counter()
+        samples = 0
+        next_check = time.monotonic() + POLL_INTERVAL
+        try:
+            while time.time() < job['until']:
+                for thread_id, frame in sys._current_frames().items():
+                    if thread_id != me:
+                        stacks[_collapse(frame)] += 1
+                samples += 1
+                if time.monotonic() >= next_check:
+                    # Stopped or replaced by the admin API
+                    next_check = time.monotonic() + POLL_INTERVAL
+                    current = self._read_control()
+                    if current is None or current['id'] != job['id']:
+                        break
+                time.sleep(interval)
+        finally:
+            lines = [f"{stack} {count}" for stack, count in stacks.most_common()]
+            path = os.path.join(self.job_dir(job['id']), f"{os.getpid()}.collapsed")
+            try:
+                _write_atomic(path, '\n'.join(lines) + '\n')
+            except OSError:
+                logger.exception("could not write profile samples")
+            logger.info("profiler %s: %d samples in pid %d", job['id'], samples, os.getpid())
+
+    def claim_request(self, job):
+        """Reserve one of the job's request slots (shared across workers); returns the .pstats path or None"""
+        directory = self.job_dir(job['id'])
+        for slot in range(job['count']):
+            path = os.path.join(directory, f"request-{slot:03d}.pstats")
+            try:
+                os.close(os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+                return path
+            except FileExistsError:
+                continue
+        return None
+
+    def load_job(self, job_id):
+        if not job_id.isalnum():
+            return None
+        try:
+            with open(os.path.join(self.job_dir(job_id), 'job.json')) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def status(self, job):
+        directory = self.job_dir(job['id'])
+        active = self._read_control()
+        return dict(
+            job,
+            active=bool(active and active['id'] == job['id'] and time.time() < job['until']),
+            sample_files=len(glob.glob(os.path.join(directory, '*.collapsed'))),
+            request_files=len([p for p in glob.glob(os.path.join(directory, '*.pstats')) if os.path.getsize(p)]),
+        )
+
+    def collapsed(self, job):
+        """Samples of all workers merged into one collapsed-stack text"""
+        merged = Counter()
+        for path in glob.glob(os.path.join(self.job_dir(job['id']), '*.collapsed')):
+            with open(path) as f:
+                for line in f:
+                    stack, _, count = line.rstrip('\n').rpartition(' ')
+                    if stack:
+                        merged[stack] += int(count)
+        return ''.join(f"{stack} {count}\n" for stack, count in merged.most_common())
+
+    def merged_stats(self, job):
+        """pstats.Stats over every profiled request, or None if none finished yet"""
+        paths = [p for p in sorted(glob.glob(os.path.join(self.job_dir(job['id']), '*.pstats'))) if os.path.getsize(p)]
+        if not paths:
+            return None
+        return pstats.Stats(*paths, stream=io.StringIO())
+
+
+profiler = Profiler(PROFILE_DIR)
+
+
+def init_app(app):
+    """Install the per-request hooks (a cached stat while no job runs)"""
+
+    @app.before_request
+    def _maybe_profile():
+        job = profiler.poll()
+        if job is None or job['mode'] != 'requests' or request.endpoint != job['endpoint']:
+            return None
+        path = profiler.claim_request(job)
+        if path:
+            profile = cProfile.Profile()
+            try:
+                profile.enable()
+            except ValueError:
+                # Already profiling this thread (batched sub-request)
+                return None
+            request.environ['autoparts.profile'] = (profile, path)
+        return None
+
+    @app.teardown_request
+    def _finish_profile(exc):
+        entry = request.environ.pop('autoparts.profile', None)
+        if entry:
+            profile, path = entry
+            profile.disable()
+            profile.dump_stats(path)
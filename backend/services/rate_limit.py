@@ -0,0 +1,241 @@
+"""
+Rate limiting and backpressure
+Token buckets per user (per IP when anonymous, and always per IP for
+login) plus caps on concurrently running expensive requests (PDF, bulk,
+dashboard, login). State lives in a small SQLite file shared by all gunicorn
+workers on the host. Rejected requests get an immediate 429 with
+Retry-After instead of queueing until the worker timeout.
+
+Configuration (env):
+  RATE_LIMIT_ENABLED   - 0 disables all checks (default 1)
+  RATE_LIMIT_DB        - state file (default /tmp/autoparts-ratelimit.db)
+  RATE_LIMITS          - bucket overrides, "name=rate/burst,...", rate per second
+  CONCURRENCY_LIMITS   - cap overrides, "name=n,..."
+  RATE_LIMIT_TRUST_PROXY - 1 to take the client IP from X-Forwarded-For
+"""
+import logging
+import math
+import os
+import random
+import sqlite3
+import threading
+import time
+from flask import request, jsonify
+from flask_login import current_user
+
+logger = logging.getLogger(__name__)
+
+ENABLED = os.environ.get('RATE_LIMIT_ENABLED', '1') == '1'
+STATE_PATH = os.environ.get('RATE_LIMIT_DB', '/tmp/autoparts-ratelimit.db')
+TRUST_PROXY = os.environ.get('RATE_LIMIT_TRUST_PROXY') == '1'
+
+# Bucket name -> (tokens per second, burst)
+BUCKETS = {
+    'user': (10.0, 60),        # any API call by a signed-in user
+    'ip': (5.0, 30),           # anonymous callers
+    'login': (10 / 60, 10),    # login attempts per IP: 10/minute after a burst of 10
+    'pdf': (0.5, 10),          # PDF renders per user
+}
+
+# Endpoint -> extra bucket charged on top of user/ip
+ENDPOINT_BUCKETS = {
+    'auth.login': 'login',
+    'invoices.download_invoice_pdf': 'pdf',
+    'customers.download_customer_statement': 'pdf',
+}
+
+# Concurrency class -> max requests running at once across all workers
+CONCURRENCY = {
+    'pdf': 2,
+    'bulk': 1,
+    'dashboard': 4,
+    'login': 2,       # password hashing is CPU-bound; leave cores for everything else
+}
+
+ENDPOINT_CLASSES = {
+    'invoices.download_invoice_pdf': 'pdf',
+    'customers.download_customer_statement': 'pdf',
+    'customers.import_customers_csv': 'bulk',
+    'invoices.bulk_update_invoices': 'bulk',
+    'dashboard.get_dashboard_stats': 'dashboard',
+    'auth.login': 'login',
+    # Long-running operator requests: no concurrency cap, no statement budget
+    'admin.export_tenant_data': 'admin',
+    'admin.restore_tenant_data': 'admin',
+}
+
+# Never limited: probes and scrapes must keep working under load
+EXEMPT_ENDPOINTS = {'health_check', 'prometheus_metrics', 'static'}
+
+# Slots older than this belong to requests gunicorn has already killed
+SLOT_MAX_AGE = 60
+
+# Wait this long for the state file lock, then let the request through
+LOCK_TIMEOUT = 0.25
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS buckets (key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL);
+CREATE TABLE IF NOT EXISTS slots (id INTEGER PRIMARY KEY, name TEXT NOT NULL, pid INTEGER NOT NULL, started REAL NOT NULL);
+CREATE INDEX IF NOT EXISTS ix_slots_name ON slots (name);
+"""
+
+
+def _parse_overrides(value, parse):
+    overrides = {}
+    for item in filter(None, (part.strip() for part in (value or '').split(','))):
+        name, _, spec = item.partition('=')
+        overrides[name.strip()] = parse(spec.strip())
+    return overrides
+
+
+def _parse_bucket(spec):
+    rate, _, burst = spec.partition('/')
+    return float(rate), int(burst or max(1, math.ceil(float(rate))))
+
+
+BUCKETS.update(_parse_overrides(os.environ.get('RATE_LIMITS'), _parse_bucket))
+CONCURRENCY.update(_parse_overrides(os.environ.get('CONCURRENCY_LIMITS'), int))
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class SQLiteStore:
+    """Bucket and slot state in one SQLite file (one connection per thread and process)"""
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+
+    def _conn(self):
+        local = self._local
+        if getattr(local, 'pid', None) != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=LOCK_TIMEOUT, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=OFF')  # losing limiter state on a crash is harmless
+            conn.executescript(SCHEMA)
+            local.conn, local.pid = conn, os.getpid()
+        return local.conn
+
+    def take(self, key, rate, burst):
+        """Take one token; returns 0 if allowed, else seconds until a token is available"""
+        conn = self._conn()
+        now = time.time()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = conn.execute('SELECT tokens, updated FROM buckets WHERE key = ?', (key,)).fetchone()
+            tokens = burst if row is None else min(burst, row[0] + (now - row[1]) * rate)
+            wait = 0.0 if tokens >= 1 else (1 - tokens) / rate
+            if not wait:
+                tokens -= 1
+            conn.execute('INSERT OR REPLACE INTO buckets (key, tokens, updated) VALUES (?, ?, ?)', (key, tokens, now))
+            if random.random() < 0.001:
+                # Buckets idle this long are full again; forget them
+                conn.execute('DELETE FROM buckets WHERE updated < ?', (now - 3600,))
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        return wait
+
+    def acquire(self, name, limit):
+        """Claim a slot in concurrency class name; returns the slot id or None if all are busy"""
+        conn = self._conn()
+        now = time.time()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            busy = conn.execute('SELECT id, pid, started FROM slots WHERE name = ?', (name,)).fetchall()
+            if len(busy) >= limit:
+                stale = [slot_id for slot_id, pid, started in busy
+                         if now - started > SLOT_MAX_AGE or not _pid_alive(pid)]
+                conn.executemany('DELETE FROM slots WHERE id = ?', [(slot_id,) for slot_id in stale])
+                if len(busy) - len(stale) >= limit:
+                    conn.execute('COMMIT')
+                    return None
+            slot = conn.execute('INSERT INTO slots (name, pid, started) VALUES (?, ?, ?)',
+                                (name, os.getpid(), now)).lastrowid
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        return slot
+
+    def release(self, slot):
+        self._conn().execute('DELETE FROM slots WHERE id = ?', (slot,))
+
+
+store = SQLiteStore(STATE_PATH)
+
+
+def client_ip():
+    if TRUST_PROXY and request.access_route:
+        return request.access_route[0]
+    return request.remote_addr or 'unknown'
+
+
+def too_many_requests(retry_after, message):
+    response = jsonify({'error': message})
+    response.status_code = 429
+    response.headers['Retry-After'] = str(max(1, math.ceil(retry_after)))
+    return response
+
+
+def check_request():
+    """Charge buckets and claim a concurrency slot; returns a 429 response or None"""
+    endpoint = request.endpoint
+    if endpoint is None or endpoint in EXEMPT_ENDPOINTS or request.method == 'OPTIONS':
+        return None
+
+    if current_user.is_authenticated:
+        subject, default = f"user:{current_user.id}", 'user'
+    else:
+        subject, default = f"ip:{client_ip()}", 'ip'
+    charges = [(f"{default}:{subject}", BUCKETS[default])]
+    extra = ENDPOINT_BUCKETS.get(endpoint)
+    if extra:
+        # Login is keyed by IP: there is no user yet
+        key = f"{extra}:ip:{client_ip()}" if extra == 'login' else f"{extra}:{subject}"
+        charges.append((key, BUCKETS[extra]))
+
+    for key, (rate, burst) in charges:
+        wait = store.take(key, rate, burst)
+        if wait:
+            return too_many_requests(wait, 'Too many requests, please slow down')
+
+    name = ENDPOINT_CLASSES.get(endpoint)
+    if name and name in CONCURRENCY:
+        slot = store.acquire(name, CONCURRENCY[name])
+        if slot is None:
+            return too_many_requests(1, 'Server busy, please retry shortly')
+        request.environ.setdefault('autoparts.rate_limit_slots', []).append(slot)
+    return None
+
+
+def init_app(app):
+    """Install the rate limit hooks on the Flask app"""
+    if not ENABLED:
+        return
+
+    @app.before_request
+    def _rate_limit():
+        try:
+            return check_request()
+        except sqlite3.Error as e:
+            # The limiter must never take the API down with it
+            logger.warning("rate limiter unavailable, allowing request: %s", e)
+            return None
+
+    @app.teardown_request
+    def _release_slots(exc):
+        for slot in request.environ.pop('autoparts.rate_limit_slots', ()):
+            try:
+                store.release(slot)
+            except sqlite3.Error as e:
+                logger.warning("could not release rate limit slot %s: %s", slot, e)
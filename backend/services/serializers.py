@@ -0,0 +1,109 @@
+"""
+Shared JSON serialization for API responses
+Schemas are built once at import and map query row tuples straight to
+dicts, so endpoints select plain columns instead of loading ORM objects.
+Encodes with orjson when installed, stdlib json otherwise.
+"""
+from datetime import date, datetime
+from operator import attrgetter
+from flask import Response
+from models import (
+    User, BusinessInfo, Customer, Invoice, InvoiceLineItem, InvoiceArchive, InvoiceLineItemArchive
+)
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - depends on environment
+    orjson = None
+    import json
+
+
+class Schema:
+    """Precompiled field list for one response shape"""
+
+    def __init__(self, model, *fields, **extra):
+        """
+        Args:
+            model: mapped class the plain field names belong to
+            fields: column attribute names of model
+            extra: output name -> column expression from another table
+        """
+        self.fields = fields
+        self.extra = extra
+        self.names = tuple(fields) + tuple(extra)
+        self.columns = tuple(getattr(model, name) for name in fields) + tuple(extra.values())
+        self._getter = attrgetter(*fields) if not extra else None
+
+    def rebind(self, model, **extra):
+        """Same output shape selected from another table with the same column names"""
+        return Schema(model, *self.fields, **(extra or self.extra))
+
+    def row(self, row):
+        """Row tuple (in self.columns order) -> dict"""
+        return dict(zip(self.names, row))
+
+    def rows(self, rows):
+        """Iterable of row tuples -> list of dicts"""
+        names = self.names
+        return [dict(zip(names, row)) for row in rows]
+
+    def obj(self, instance):
+        """ORM instance -> dict (for freshly written objects)"""
+        return dict(zip(self.names, self._getter(instance)))
+
+
+USER = Schema(User, 'id', 'email', 'name')
+
+BUSINESS = Schema(BusinessInfo, 'id', 'company_name', 'address', 'phone', 'email', 'tax_id', 'logo_url')
+
+CUSTOMER = Schema(Customer, 'id', 'name', 'address', 'phone', 'email')
+
+CUSTOMER_LIST = Schema(Customer, 'id', 'name', 'address', 'phone', 'email', 'created_at')
+
+INVOICE_LIST = Schema(
+    Invoice, 'id', 'invoice_number', 'invoice_date', 'customer_id', 'total', 'status', 'notes',
+    customer_name=Customer.name
+)
+
+INVOICE_DETAIL = Schema(
+    Invoice, 'id', 'invoice_number', 'invoice_date', 'customer_id',
+    'subtotal', 'tax_rate', 'tax_amount', 'total', 'status', 'notes'
+)
+
+LINE_ITEM = Schema(InvoiceLineItem, 'id', 'product_name', 'part_number', 'quantity', 'unit_price', 'line_total')
+
+# Delta sync rows carry their change_seq and updated_at
+SYNC_CUSTOMER = Schema(Customer, 'id', 'name', 'address', 'phone', 'email', 'created_at', 'updated_at', 'change_seq')
+
+SYNC_INVOICE = Schema(
+    Invoice, 'id', 'invoice_number', 'invoice_date', 'customer_id', 'total', 'status', 'notes',
+    'updated_at', 'change_seq',
+    customer_name=Customer.name
+)
+
+# Archived invoices (services/archive_service.py) serialize identically
+ARCHIVED_INVOICE_LIST = INVOICE_LIST.rebind(InvoiceArchive)
+ARCHIVED_INVOICE_DETAIL = INVOICE_DETAIL.rebind(InvoiceArchive)
+ARCHIVED_LINE_ITEM = LINE_ITEM.rebind(InvoiceLineItemArchive)
+
+
+def _default(value):
+    """stdlib fallback for types orjson handles natively"""
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+if orjson is not None:
+    def dumps(payload):
+        """Encode payload to JSON bytes"""
+        return orjson.dumps(payload)
+else:
+    def dumps(payload):
+        """Encode payload to JSON bytes"""
+        return json.dumps(payload, default=_default, separators=(',', ':')).encode('utf-8')
+
+
+def json_response(payload, status=200):
+    """Drop-in for jsonify(...), status using the fastest encoder"""
+    return Response(dumps(payload), status=status, mimetype='application/json')
@@ -0,0 +1,300 @@
+"""
+Tenant shard moves
+Moves one tenant's rows to another shard while the app keeps serving it:
+
+  1. bulk copy everything up to the tenant's current change_seq watermark
+     (reads and writes continue on the source)
+  2. mark the tenant 'moving' - writes get a 503 + Retry-After, reads still
+     hit the source - and wait `grace` seconds for in-flight writes, but at
+     least SHARD_MAP_TTL so no worker still routes writes to the source
+  3. catch up: rows changed after the watermark, deletions, new archive rows
+  4. point the directory at the target, wait SHARD_MAP_TTL again for
+     workers still reading the source, then drop the source copy
+
+The write pause lasts only for the catch-up, not for the bulk copy.
+
+Usage (from backend/):
+    python -m services.shard_service list
+    python -m services.shard_service move USER_ID SHARD [--grace 5]
+    python -m services.shard_service release USER_ID
+"""
+import argparse
+import logging
+import time
+from datetime import datetime
+from sqlalchemy import bindparam, delete, func, insert, select, update
+from models import (
+    engine, ensure_db, bump_shard_map_version, reset_id_sequence, shard_engine, shard_names, shard_offset,
+    tenant_shard, DEFAULT_SHARD, ID_RANGE_TABLES, SHARD_MAP_TTL, User, TenantShard, BusinessInfo, Customer,
+    Invoice, InvoiceLineItem, InvoiceArchive, InvoiceLineItemArchive, SyncCounter, SyncTombstone
+)
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 1000
+
+# Writes already running when the tenant is marked 'moving' finish within this
+GRACE_SECONDS = 5.0
+
+# Copy order (parents before children); deleted in reverse
+TENANT_TABLES = (
+    BusinessInfo, Customer, Invoice, InvoiceLineItem,
+    InvoiceArchive, InvoiceLineItemArchive, SyncCounter, SyncTombstone,
+)
+
+# Line item tables are owned through their invoice
+PARENTS = {InvoiceLineItem: Invoice, InvoiceLineItemArchive: InvoiceArchive}
+
+
+def tenant_rows(model, user_id):
+    """WHERE clause selecting user_id's rows of model"""
+    parent = PARENTS.get(model)
+    if parent is not None:
+        return model.invoice_id.in_(select(parent.id).where(parent.user_id == user_id))
+    return model.user_id == user_id
+
+
+def _copy(source, target, model, where, batch_size, offset):
+    """Stream rows matching where from source into target in batch_size inserts"""
+    table = model.__table__
+    copied = 0
+    with source.connect() as src, target.begin() as dst:
+        result = src.execute(select(table).where(where).execution_options(yield_per=batch_size))
+        for rows in result.mappings().partitions():
+            dst.execute(insert(table), [dict(row) for row in rows])
+            copied += len(rows)
+        if table in ID_RANGE_TABLES:
+            # The copied ids may come from another range; new ids stay in the target's
+            reset_id_sequence(dst, table, offset)
+    return copied
+
+
+def _delete_tenant(target, user_id):
+    with target.begin() as conn:
+        for model in reversed(TENANT_TABLES):
+            conn.execute(delete(model).where(tenant_rows(model, user_id)))
+
+
+def _ids(conn, model, user_id):
+    return set(conn.execute(select(model.id).where(tenant_rows(model, user_id))).scalars())
+
+
+def _upsert(dst, model, rows, existing):
+    """Update rows whose id is in existing, insert the rest"""
+    table = model.__table__
+    changed = [dict(row) for row in rows if row['id'] in existing]
+    new = [dict(row) for row in rows if row['id'] not in existing]
+    if changed:
+        columns = [c.name for c in table.columns if c.name != 'id']
+        for row in changed:
+            row['_id'] = row.pop('id')
+        dst.execute(
+            update(table).where(table.c.id == bindparam('_id')).values({c: bindparam(c) for c in columns}),
+            changed
+        )
+    if new:
+        dst.execute(insert(table), new)
+
+
+def _catch_up(source, target, user_id, watermark, offset):
+    """Apply everything the source saw after watermark (writes are paused)"""
+    with source.connect() as src, target.begin() as dst:
+        for model in (Customer, Invoice):
+            changed = src.execute(
+                select(model.__table__).where(model.user_id == user_id, model.change_seq > watermark)
+            ).mappings().all()
+            _upsert(dst, model, changed, _ids(dst, model, user_id))
+
+        # Line items have no change_seq: replace them for every changed invoice
+        changed_invoices = select(Invoice.id).where(Invoice.user_id == user_id, Invoice.change_seq > watermark)
+        changed_ids = list(src.execute(changed_invoices).scalars())
+        for start in range(0, len(changed_ids), BATCH_SIZE):
+            chunk = changed_ids[start:start + BATCH_SIZE]
+            dst.execute(delete(InvoiceLineItem).where(InvoiceLineItem.invoice_id.in_(chunk)))
+            items = src.execute(
+                select(InvoiceLineItem.__table__).where(InvoiceLineItem.invoice_id.in_(chunk))
+            ).mappings().all()
+            if items:
+                dst.execute(insert(InvoiceLineItem.__table__), [dict(row) for row in items])
+
+        # Deleted (or archived) since the copy: gone from the source's hot tables
+        gone_invoices = list(_ids(dst, Invoice, user_id) - _ids(src, Invoice, user_id))
+        for start in range(0, len(gone_invoices), BATCH_SIZE):
+            chunk = gone_invoices[start:start + BATCH_SIZE]
+            dst.execute(delete(InvoiceLineItem).where(InvoiceLineItem.invoice_id.in_(chunk)))
+            dst.execute(delete(Invoice).where(Invoice.id.in_(chunk)))
+        gone_customers = list(_ids(dst, Customer, user_id) - _ids(src, Customer, user_id))
+        if gone_customers:
+            dst.execute(delete(Customer).where(Customer.id.in_(gone_customers)))
+
+        # Archived rows never change once written; copy the new ones
+        new_archived = list(_ids(src, InvoiceArchive, user_id) - _ids(dst, InvoiceArchive, user_id))
+        for start in range(0, len(new_archived), BATCH_SIZE):
+            chunk = new_archived[start:start + BATCH_SIZE]
+            for model, column in ((InvoiceArchive, InvoiceArchive.id), (InvoiceLineItemArchive, InvoiceLineItemArchive.invoice_id)):
+                rows = src.execute(select(model.__table__).where(column.in_(chunk))).mappings().all()
+                if rows:
+                    dst.execute(insert(model.__table__), [dict(row) for row in rows])
+
+        for model in (BusinessInfo, SyncCounter):
+            dst.execute(delete(model).where(model.user_id == user_id))
+            rows = src.execute(select(model.__table__).where(model.user_id == user_id)).mappings().all()
+            if rows:
+                dst.execute(insert(model.__table__), [dict(row) for row in rows])
+
+        dst.execute(delete(SyncTombstone).where(SyncTombstone.user_id == user_id, SyncTombstone.change_seq > watermark))
+        tombstones = src.execute(
+            select(SyncTombstone.__table__).where(SyncTombstone.user_id == user_id, SyncTombstone.change_seq > watermark)
+        ).mappings().all()
+        if tombstones:
+            dst.execute(insert(SyncTombstone.__table__), [dict(row) for row in tombstones])
+
+        for table in ID_RANGE_TABLES:
+            reset_id_sequence(dst, table, offset)
+
+
+def _set_directory(user_id, shard, status):
+    with engine.begin() as conn:
+        updated = conn.execute(
+            update(TenantShard).where(TenantShard.user_id == user_id)
+            .values(shard=shard, status=status, updated_at=datetime.utcnow())
+        )
+        if not updated.rowcount:
+            conn.execute(insert(TenantShard).values(
+                user_id=user_id, shard=shard, status=status, updated_at=datetime.utcnow()
+            ))
+    bump_shard_map_version()
+
+
+def move_tenant(user_id, target_shard, grace=GRACE_SECONDS, batch_size=BATCH_SIZE):
+    """
+    Move user_id's data to target_shard with writes paused only for the catch-up
+    Returns:
+        dict with the source, target, rows copied per table and seconds taken
+    Raises:
+        ValueError for an unknown user or shard, a move to the current shard
+        or a tenant that is already moving
+    """
+    ensure_db()
+    if target_shard not in shard_names():
+        raise ValueError(f"Unknown shard: {target_shard}")
+    with engine.connect() as conn:
+        user = conn.execute(select(User.__table__).where(User.id == user_id)).mappings().first()
+        row = conn.execute(select(TenantShard.status).where(TenantShard.user_id == user_id)).first()
+    if user is None:
+        raise ValueError(f"Unknown user: {user_id}")
+    if row is not None and row.status != 'active':
+        raise ValueError(f"User {user_id} is already being moved")
+    source_shard, _ = tenant_shard(user_id)
+    if source_shard == target_shard:
+        raise ValueError(f"User {user_id} already lives on {target_shard}")
+
+    started = time.perf_counter()
+    source, target = shard_engine(source_shard), shard_engine(target_shard)
+
+    # Leftovers of an earlier failed move
+    _delete_tenant(target, user_id)
+    if target_shard != DEFAULT_SHARD:
+        # Shards keep a stub users row so their foreign keys hold
+        with target.begin() as conn:
+            conn.execute(delete(User).where(User.id == user_id))
+            conn.execute(insert(User).values(
+                id=user_id, email=user['email'], name=user['name'], password_hash='!', created_at=user['created_at']
+            ))
+
+    with source.connect() as conn:
+        watermark = conn.execute(select(SyncCounter.value).where(SyncCounter.user_id == user_id)).scalar() or 0
+
+    copied = {}
+    offset = shard_offset(target_shard)
+    try:
+        for model in TENANT_TABLES:
+            copied[model.__tablename__] = _copy(source, target, model, tenant_rows(model, user_id), batch_size, offset)
+        logger.info("user %s: bulk copy to %s done (%s)", user_id, target_shard, copied)
+
+        _set_directory(user_id, source_shard, 'moving')
+        # Workers with an older cached entry still allow writes on the source
+        time.sleep(max(grace, SHARD_MAP_TTL))
+        _catch_up(source, target, user_id, watermark, offset)
+    except Exception:
+        logger.exception("user %s: move to %s failed; tenant stays on %s", user_id, target_shard, source_shard)
+        try:
+            _set_directory(user_id, source_shard, 'active')
+        except Exception:
+            logger.critical("user %s is stuck in 'moving' (writes refused); "
+                            "run `python -m services.shard_service release %s`", user_id, user_id, exc_info=True)
+        try:
+            _delete_tenant(target, user_id)
+        except Exception:
+            # The next move to this shard deletes them first
+            logger.warning("user %s: partial copy left on %s", user_id, target_shard, exc_info=True)
+        raise
+
+    _set_directory(user_id, target_shard, 'active')
+    # Until their cached entry expires, other workers keep reading the source
+    # (writes stay refused: they still see 'moving')
+    time.sleep(SHARD_MAP_TTL)
+    _delete_tenant(source, user_id)
+    if source_shard != DEFAULT_SHARD:
+        with source.begin() as conn:
+            conn.execute(delete(User).where(User.id == user_id))
+
+    return {
+        'user_id': user_id,
+        'source': source_shard,
+        'target': target_shard,
+        'rows': copied,
+        'seconds': round(time.perf_counter() - started, 2),
+    }
+
+
+def release_tenant(user_id):
+    """
+    Put a tenant left 'moving' by an interrupted move back to 'active' on
+    its source shard (any partial copy is removed by the next move)
+    Raises:
+        ValueError if the tenant is not moving
+    """
+    with engine.connect() as conn:
+        row = conn.execute(select(TenantShard.shard, TenantShard.status).where(TenantShard.user_id == user_id)).first()
+    if row is None or row.status != 'moving':
+        raise ValueError(f"User {user_id} is not being moved")
+    _set_directory(user_id, row.shard, 'active')
+    return row.shard
+
+
+def shard_counts():
+    """Tenants per shard (tenants without a directory row count for the default shard)"""
+    with engine.connect() as conn:
+        counts = dict(conn.execute(select(TenantShard.shard, func.count()).group_by(TenantShard.shard)).all())
+        placed = conn.execute(select(func.count()).select_from(TenantShard)).scalar()
+        users = conn.execute(select(func.count()).select_from(User)).scalar()
+    counts[DEFAULT_SHARD] = counts.get(DEFAULT_SHARD, 0) + users - placed
+    return {name: counts.get(name, 0) for name in shard_names()}
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description='Inspect tenant shards or move a tenant between them')
+    commands = parser.add_subparsers(dest='command', required=True)
+    commands.add_parser('list', help='tenants per shard')
+    move = commands.add_parser('move', help='move a tenant to another shard')
+    move.add_argument('user_id', type=int)
+    move.add_argument('shard')
+    move.add_argument('--grace', type=float, default=GRACE_SECONDS, help='seconds to wait for in-flight writes (at least SHARD_MAP_TTL)')
+    move.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+    release = commands.add_parser('release', help="re-enable writes of a tenant left 'moving' by an interrupted move")
+    release.add_argument('user_id', type=int)
+    args = parser.parse_args()
+
+    ensure_db()
+    if args.command == 'list':
+        for name, tenants in shard_counts().items():
+            print(f"{name}: {tenants} tenants")
+    elif args.command == 'release':
+        print(f"✅ User {args.user_id} is active on {release_tenant(args.user_id)}")
+    else:
+        print(f"🚚 Moving user {args.user_id} to {args.shard}...")
+        stats = move_tenant(args.user_id, args.shard, args.grace, args.batch_size)
+        print(f"✅ Moved from {stats['source']} in {stats['seconds']}s: "
+              + ', '.join(f"{table} {count}" for table, count in stats['rows'].items()))
@@ -0,0 +1,185 @@
+"""
+Cross-worker result cache
+A key/value store in a SQLite file on tmpfs (/dev/shm), shared by every
+gunicorn worker on the host, so a result computed by one worker is a hit
+for all of them and is held in memory once.
+
+Values are stored as JSON (never pickle: anything read back from a file
+on a shared tmpfs must be inert data), so cached functions return
+JSON-native values; datetimes come back as ISO strings. The store
+directory must be owned by this user and closed to everyone else, or the
+cache stays off.
+
+Keys are versioned rather than deleted: callers put a version that writes
+already move (the per-user sync counter, the tenant context version file)
+into the key, so a write invalidates everything derived from it in O(1)
+and stale entries just age out. Entries also carry a TTL; the least
+recently used ones are evicted past SHARED_CACHE_MAX_BYTES.
+
+    @cached('dashboard', ttl=300, key=lambda db, user_id, version: (user_id, version))
+    def dashboard_stats(db, user_id, version):
+        ...
+
+Configuration (env):
+  SHARED_CACHE_ENABLED   - 0 turns the cache off (every call computes)
+  SHARED_CACHE_DB        - store file (default /dev/shm/autoparts-cache/cache.db)
+  SHARED_CACHE_MAX_BYTES - total size of cached values (default 64MB)
+"""
+import functools
+import json
+import logging
+import os
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+from services.metrics import record_cache
+from services.serializers import dumps
+
+try:
+    from orjson import loads
+except ImportError:  # pragma: no cover - depends on environment
+    loads = json.loads
+
+logger = logging.getLogger(__name__)
+
+ENABLED = os.environ.get('SHARED_CACHE_ENABLED', '1') == '1'
+_DEFAULT_DIR = os.path.join('/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir(), 'autoparts-cache')
+STORE_PATH = os.environ.get('SHARED_CACHE_DB', os.path.join(_DEFAULT_DIR, 'cache.db'))
+MAX_BYTES = int(os.environ.get('SHARED_CACHE_MAX_BYTES', str(64 * 1024 * 1024)))
+
+# Larger values are computed every time rather than crowding out the rest
+MAX_VALUE_BYTES = MAX_BYTES // 16
+
+# A hit refreshes the entry's LRU position at most this often (hits stay read-only)
+TOUCH_INTERVAL = 10.0
+
+# Share of writes that also sweep expired entries and enforce MAX_BYTES
+EVICT_SAMPLE = 0.02
+
+LOCK_TIMEOUT = 0.25
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT PRIMARY KEY, value BLOB NOT NULL, size INTEGER NOT NULL,
+    expires REAL NOT NULL, accessed REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_entries_accessed ON entries (accessed);
+"""
+
+_MISS = object()
+
+
+class SharedCache:
+    """Entries in one SQLite file (one connection per thread and process)"""
+
+    def __init__(self, path, max_bytes):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._local = threading.local()
+
+    def _conn(self):
+        local = self._local
+        if getattr(local, 'pid', None) != os.getpid():
+            directory = os.path.dirname(self.path)
+            os.makedirs(directory, mode=0o700, exist_ok=True)
+            # exist_ok keeps a directory someone else created first: refuse it
+            st = os.stat(directory)
+            if st.st_uid != os.getuid() or st.st_mode & 0o077:
+                raise sqlite3.OperationalError(f"{directory} must be owned by uid {os.getuid()} with mode 0700")
+            conn = sqlite3.connect(self.path, timeout=LOCK_TIMEOUT, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=OFF')  # a cache lost on a crash is harmless
+            conn.execute(f'PRAGMA mmap_size={2 * self.max_bytes}')  # hits read the mapped pages directly
+            conn.executescript(SCHEMA)
+            local.conn, local.pid = conn, os.getpid()
+        return local.conn
+
+    def get(self, key):
+        """Cached value or _MISS"""
+        conn = self._conn()
+        row = conn.execute('SELECT value, expires, accessed FROM entries WHERE key = ?', (key,)).fetchone()
+        now = time.time()
+        if row is None or row[1] <= now:
+            return _MISS
+        if now - row[2] > TOUCH_INTERVAL:
+            conn.execute('UPDATE entries SET accessed = ? WHERE key = ?', (now, key))
+        return loads(row[0])
+
+    def set(self, key, value, ttl):
+        data = dumps(value)
+        if len(data) > MAX_VALUE_BYTES:
+            return
+        now = time.time()
+        conn = self._conn()
+        conn.execute(
+            'INSERT OR REPLACE INTO entries (key, value, size, expires, accessed) VALUES (?, ?, ?, ?, ?)',
+            (key, data, len(data), now + ttl, now)
+        )
+        if random.random() < EVICT_SAMPLE:
+            self.evict(now)
+
+    def evict(self, now=None):
+        """Drop expired entries, then least recently used ones until under max_bytes"""
+        conn = self._conn()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            conn.execute('DELETE FROM entries WHERE expires <= ?', (now or time.time(),))
+            excess = (conn.execute('SELECT COALESCE(SUM(size), 0) FROM entries').fetchone()[0]
+                      - self.max_bytes * 0.9)
+            if excess > 0:
+                # Oldest first until the running total covers the excess
+                conn.execute(
+                    'DELETE FROM entries WHERE key IN ('
+                    ' SELECT key FROM (SELECT key, size, SUM(size) OVER (ORDER BY accessed, key) AS freed FROM entries)'
+                    ' WHERE freed - size < ?)',
+                    (excess,)
+                )
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+
+    def clear(self):
+        self._conn().execute('DELETE FROM entries')
+
+
+store = SharedCache(STORE_PATH, MAX_BYTES)
+
+
+def cached(name, ttl, key=None):
+    """
+    Cache a function's results across workers
+    Args:
+        name: cache name (key prefix and metrics label)
+        ttl: seconds an entry stays valid
+        key: callable taking the function's arguments and returning the parts
+             that identify the result (include a version); defaults to all arguments
+    Values must be JSON-serializable and are returned as decoded JSON on a
+    hit. If the store is unavailable the function just runs.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not ENABLED:
+                return func(*args, **kwargs)
+            parts = key(*args, **kwargs) if key else (args, sorted(kwargs.items()))
+            cache_key = f"{name}:{parts!r}"
+            try:
+                value = store.get(cache_key)
+            except (sqlite3.Error, ValueError) as e:  # ValueError: not JSON
+                logger.warning("shared cache unavailable: %s", e)
+                return func(*args, **kwargs)
+            record_cache(name, value is not _MISS)
+            if value is not _MISS:
+                return value
+
+            value = func(*args, **kwargs)
+            try:
+                store.set(cache_key, value, ttl)
+            except sqlite3.Error as e:
+                logger.warning("could not store %s in shared cache: %s", name, e)
+            return value
+        return wrapper
+    return decorator
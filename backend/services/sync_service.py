@@ -0,0 +1,88 @@
+"""
+Delta sync bookkeeping
+Every write to a customer or invoice stamps it with the next per-user
+change_seq; deletes leave a tombstone with their own change_seq. A client
+that remembers the highest change_seq it has seen can ask for everything
+after it with one range scan on (user_id, change_seq).
+"""
+import base64
+from sqlalchemy import event, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from models import SessionLocal, Customer, Invoice, InvoiceLineItem, SyncCounter, SyncTombstone
+
+TOKEN_PREFIX = 'v1:'
+
+
+def encode_token(change_seq):
+    """Opaque watermark handed to clients"""
+    return base64.urlsafe_b64encode(f"{TOKEN_PREFIX}{change_seq}".encode()).decode().rstrip('=')
+
+
+def decode_token(token):
+    """Watermark -> change_seq (-1 for a full sync); ValueError if malformed"""
+    if not token:
+        return -1
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)).decode()
+    except (ValueError, UnicodeDecodeError):
+        raise ValueError('Invalid sync token')
+    if not raw.startswith(TOKEN_PREFIX) or not raw[len(TOKEN_PREFIX):].isdigit():
+        raise ValueError('Invalid sync token')
+    return int(raw[len(TOKEN_PREFIX):])
+
+
+def allocate_change_seq(conn, user_id, count=1):
+    """
+    Reserve count consecutive change_seq values for user_id
+    The counter row stays locked until the caller commits, so values become
+    visible to readers in increasing order.
+    Returns:
+        first value of the reserved range
+    """
+    bump = update(SyncCounter).where(SyncCounter.user_id == user_id).values(value=SyncCounter.value + count)
+    if conn.execute(bump).rowcount == 0:
+        dialect = conn.dialect.name
+        if dialect == 'postgresql':
+            conn.execute(postgresql.insert(SyncCounter).values(user_id=user_id, value=0).on_conflict_do_nothing())
+        elif dialect == 'sqlite':
+            conn.execute(sqlite.insert(SyncCounter).values(user_id=user_id, value=0).on_conflict_do_nothing())
+        else:
+            conn.execute(SyncCounter.__table__.insert().values(user_id=user_id, value=0))
+        conn.execute(bump)
+    value = conn.execute(select(SyncCounter.value).where(SyncCounter.user_id == user_id)).scalar()
+    return value - count + 1
+
+
+@event.listens_for(SessionLocal, 'before_flush')
+def _stamp_changes(session, flush_context, instances):
+    """Assign change_seq to changed customers/invoices and tombstone deletes"""
+    changed = {}
+    with session.no_autoflush:
+        for obj in list(session.new) + list(session.dirty):
+            if isinstance(obj, InvoiceLineItem):
+                # Line items travel with their invoice
+                obj = obj.invoice or session.get(Invoice, obj.invoice_id)
+            if isinstance(obj, (Customer, Invoice)) and (obj in session.new or session.is_modified(obj)):
+                changed.setdefault(obj.user_id, {})[id(obj)] = obj
+
+    deleted = [obj for obj in session.deleted if isinstance(obj, (Customer, Invoice))]
+    for obj in deleted:
+        changed.setdefault(obj.user_id, {})
+
+    if not changed:
+        return
+    conn = session.connection()
+    for user_id, objects in changed.items():
+        dead = [obj for obj in deleted if obj.user_id == user_id]
+        seq = allocate_change_seq(conn, user_id, len(objects) + len(dead))
+        for obj in objects.values():
+            obj.change_seq = seq
+            seq += 1
+        for obj in dead:
+            session.add(SyncTombstone(
+                user_id=user_id,
+                entity='customer' if isinstance(obj, Customer) else 'invoice',
+                entity_id=obj.id,
+                change_seq=seq
+            ))
+            seq += 1
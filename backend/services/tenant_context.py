@@ -0,0 +1,108 @@
+"""
+Per-tenant context cache
+Business info (and per-tenant settings such as the tax rate) changes maybe
+once a year but is read on every PDF download and invoice creation. Each
+worker keeps a snapshot per user_id. Writers bump a per-user version file
+in TENANT_CONTEXT_DIR; readers compare its mtime (one stat, no query)
+before trusting their snapshot, so an update in one worker is seen by all
+workers on the host. TENANT_CONTEXT_TTL bounds staleness when workers run
+on several hosts without a shared directory. A reload goes through the
+shared cache, so only one worker per version queries the database.
+"""
+import os
+import threading
+import time
+from datetime import datetime
+from types import SimpleNamespace
+from models import BusinessInfo, tenant_session
+from services.metrics import record_cache
+from services.shared_cache import cached
+
+CONTEXT_DIR = os.environ.get('TENANT_CONTEXT_DIR', '/tmp/autoparts-context')
+TTL = float(os.environ.get('TENANT_CONTEXT_TTL', '300'))
+
+# Tax rate applied to new invoices until it becomes a per-tenant setting
+DEFAULT_TAX_RATE = 8.25
+
+BUSINESS_FIELDS = ('id', 'company_name', 'address', 'phone', 'email', 'tax_id', 'logo_url', 'updated_at')
+
+_cache = {}
+_lock = threading.Lock()
+
+
+class TenantContext:
+    """Snapshot of one user's settings (business is None when not configured)"""
+
+    __slots__ = ('user_id', 'business', 'tax_rate', 'version', 'loaded_at')
+
+    def __init__(self, user_id, business, tax_rate, version, loaded_at):
+        self.user_id = user_id
+        self.business = business
+        self.tax_rate = tax_rate
+        self.version = version
+        self.loaded_at = loaded_at
+
+
+def _version_path(user_id):
+    return os.path.join(CONTEXT_DIR, str(int(user_id)))
+
+
+def _current_version(user_id):
+    try:
+        return os.stat(_version_path(user_id)).st_mtime_ns
+    except FileNotFoundError:
+        return 0
+
+
+@cached('business', ttl=TTL)
+def _business_row(user_id, version):
+    """Business columns as a JSON-native list (computed once per version for all workers)"""
+    db = tenant_session(user_id)
+    try:
+        columns = [getattr(BusinessInfo, name) for name in BUSINESS_FIELDS]
+        row = db.query(*columns).filter(BusinessInfo.user_id == user_id).first()
+    finally:
+        db.close()
+    if not row:
+        return None
+    return [value.isoformat() if isinstance(value, datetime) else value for value in row]
+
+
+def _load(user_id, version):
+    row = _business_row(user_id, version)
+    # Plain attributes: safe to share between threads, usable by the PDF service
+    business = None
+    if row:
+        business = SimpleNamespace(**dict(zip(BUSINESS_FIELDS, row)))
+        if business.updated_at:
+            business.updated_at = datetime.fromisoformat(business.updated_at)
+    return TenantContext(user_id, business, DEFAULT_TAX_RATE, version, time.monotonic())
+
+
+def get_context(user_id):
+    """Current TenantContext for user_id (no query while the snapshot is valid)"""
+    version = _current_version(user_id)
+    context = _cache.get(user_id)
+    hit = context is not None and context.version == version and time.monotonic() - context.loaded_at < TTL
+    record_cache('tenant_context', hit)
+    if hit:
+        return context
+
+    # Version read before loading: a write racing the load invalidates it again
+    context = _load(user_id, version)
+    with _lock:
+        _cache[user_id] = context
+    return context
+
+
+def invalidate(user_id):
+    """Call after committing a change to user_id's settings (all workers reload)"""
+    with _lock:
+        _cache.pop(user_id, None)
+    os.makedirs(CONTEXT_DIR, exist_ok=True)
+    path = _version_path(user_id)
+    with open(path, 'a'):
+        pass
+    # Explicit timestamp: coarse filesystem clocks could repeat the old mtime
+    previous = _current_version(user_id)
+    os.utime(path, ns=(time.time_ns(), max(time.time_ns(), previous + 1)))
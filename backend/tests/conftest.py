@@ -0,0 +1,135 @@
+"""
+Test fixtures
+Every file the app writes (database, limiter/cache state, version files)
+goes to one temp directory per test session. Tests never reset the
+database: each one signs up its own tenant, so ids and versions never
+repeat and the in-process caches can't serve another test's data.
+"""
+import itertools
+import os
+import sys
+import tempfile
+
+import pytest
+
+WORKDIR = tempfile.mkdtemp(prefix='autoparts-tests-')
+ADMIN_EMAIL = 'ops@example.test'
+PASSWORD = 'password123'
+
+os.environ.update(
+    DATABASE_URL=f"sqlite:///{WORKDIR}/test.db",
+    RATE_LIMIT_DB=os.path.join(WORKDIR, 'ratelimit.db'),
+    RATE_LIMITS='user=1000/1000,ip=1000/1000,login=1000/1000,pdf=1000/1000',
+    SHARED_CACHE_DB=os.path.join(WORKDIR, 'cache', 'cache.db'),
+    TENANT_CONTEXT_DIR=os.path.join(WORKDIR, 'context'),
+    SHARD_MAP_VERSION_PATH=os.path.join(WORKDIR, 'shard-map'),
+    EVENTS_DIR=os.path.join(WORKDIR, 'events'),
+    PROFILE_DIR=os.path.join(WORKDIR, 'profiles'),
+    BACKUP_DIR=os.path.join(WORKDIR, 'backups'),
+    ADMIN_EMAILS=ADMIN_EMAIL,
+    PASSWORD_HASH_METHOD='pbkdf2:sha256:1000',
+    SLOW_QUERY_MS='100000',
+)
+os.environ.pop('PROMETHEUS_MULTIPROC_DIR', None)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import app as flask_app  # noqa: E402
+from models import ensure_db, get_db, tenant_session, BusinessInfo, Invoice, InvoiceLineItem, User  # noqa: E402
+
+_emails = itertools.count(1)
+_invoice_numbers = itertools.count(1)
+
+
+@pytest.fixture(scope='session')
+def app():
+    ensure_db()
+    flask_app.config['TESTING'] = True
+    return flask_app
+
+
+def create_user(email=None, password=PASSWORD):
+    """New user with business info; returns its id"""
+    db = get_db()
+    try:
+        user = User(email=email or f"user{next(_emails)}@example.test", name='Test User')
+        user.set_password(password)
+        db.add(user)
+        db.flush()
+        db.add(BusinessInfo(user_id=user.id, company_name='Test Parts', address='1 Test St',
+                            phone='555-0100', email='shop@example.test', tax_id='00-0000000'))
+        db.commit()
+        return user.id
+    finally:
+        db.close()
+
+
+def login(app, email, password=PASSWORD):
+    client = app.test_client()
+    response = client.post('/api/auth/login', json={'email': email, 'password': password})
+    assert response.status_code == 200, response.data
+    return client
+
+
+def new_tenant(app):
+    """Test client signed in as a fresh tenant (client.user_id)"""
+    email = f"user{next(_emails)}@example.test"
+    user_id = create_user(email)
+    client = login(app, email)
+    client.user_id = user_id
+    return client
+
+
+@pytest.fixture
+def client(app):
+    return new_tenant(app)
+
+
+@pytest.fixture
+def other_client(app):
+    """A second tenant, for isolation checks"""
+    return new_tenant(app)
+
+
+@pytest.fixture
+def admin_client(app):
+    """Test client signed in as the ADMIN_EMAILS account"""
+    db = get_db()
+    try:
+        exists = db.query(User).filter_by(email=ADMIN_EMAIL).first() is not None
+    finally:
+        db.close()
+    if not exists:
+        create_user(ADMIN_EMAIL)
+    return login(app, ADMIN_EMAIL)
+
+
+def add_customer(client, name='Acme Garage', **fields):
+    response = client.post('/api/customers', json=dict(name=name, **fields))
+    assert response.status_code == 201, response.data
+    return response.get_json()['data']['id']
+
+
+def add_invoice(client, customer_id, total=100.0, **fields):
+    """
+    Invoice for client's tenant, inserted directly
+    invoice_number is unique across all tenants and POST /api/invoices
+    numbers by day, so only one tenant per day can create invoices through
+    the API; tests get numbers of their own.
+    """
+    db = tenant_session(client.user_id)
+    try:
+        invoice = Invoice(user_id=client.user_id, customer_id=customer_id,
+                          invoice_number=f"T-{next(_invoice_numbers):06d}", subtotal=total, tax_rate=0,
+                          tax_amount=0, total=total, **dict({'status': 'unpaid'}, **fields))
+        invoice.line_items.append(InvoiceLineItem(product_name='Brake Pads', part_number='BP-1', quantity=1,
+                                                  unit_price=total, line_total=total))
+        db.add(invoice)
+        db.commit()
+        return invoice.id
+    finally:
+        db.close()
+
+
+@pytest.fixture
+def customer_id(client):
+    return add_customer(client)
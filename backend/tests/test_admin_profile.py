@@ -0,0 +1,55 @@
+"""Operator endpoints: access control and the on-demand profiler"""
+import json
+import os
+import time
+
+import pytest
+
+import auth
+from services.profiler import Profiler
+
+
+def test_admin_endpoints_reject_regular_users(client):
+    assert client.post('/api/admin/profile', json={'mode': 'sample', 'seconds': 1}).status_code == 403
+    assert client.post('/api/admin/backup').status_code == 403
+
+
+def test_no_admins_unless_configured(admin_client, monkeypatch):
+    monkeypatch.setattr(auth, 'ADMIN_EMAILS', set())
+    assert admin_client.get('/api/admin/profile/missing').status_code == 403
+
+
+def test_requests_profile_collects_stats(admin_client, client):
+    response = admin_client.post('/api/admin/profile', json={
+        'mode': 'requests', 'endpoint': 'invoices.list_invoices', 'count': 2, 'seconds': 30
+    })
+    assert response.status_code == 201, response.data
+    job_id = response.get_json()['id']
+    for _ in range(2):
+        client.get('/api/invoices')
+    text = admin_client.get(f'/api/admin/profile/{job_id}?format=text')
+    assert text.status_code == 200
+    assert 'list_invoices' in text.get_data(as_text=True)
+    assert admin_client.get(f'/api/admin/profile/{job_id}?format=text&limit=abc').status_code == 400
+    admin_client.delete('/api/admin/profile')
+
+
+def test_profile_rejects_bad_input(admin_client):
+    assert admin_client.post('/api/admin/profile', json={'mode': 'bogus'}).status_code == 400
+    assert admin_client.post('/api/admin/profile', json={'mode': 'sample', 'seconds': 'x'}).status_code == 400
+
+
+def test_shared_profile_directory_is_refused(tmp_path):
+    directory = tmp_path / 'profiles'
+    directory.mkdir(mode=0o755)
+    os.chmod(directory, 0o755)
+    profiler = Profiler(str(directory))
+    with pytest.raises(PermissionError):
+        profiler.start('sample', 5)
+    # A control file planted by another local user is never trusted
+    job = {'id': 'planted', 'mode': 'requests', 'endpoint': 'auth.login', 'count': 1, 'until': time.time() + 60}
+    (directory / 'active.json').write_text(json.dumps(job))
+    assert profiler.poll(force=True) is None
+    os.chmod(directory, 0o700)
+    assert profiler.start('sample', 1)['id'] != 'planted'
+    profiler.stop()
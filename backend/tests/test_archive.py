@@ -0,0 +1,57 @@
+"""Hot/cold invoice archival with transparent reads"""
+from datetime import datetime, timedelta
+
+import pytest
+
+from conftest import add_invoice
+from services.archive_service import archive_invoices
+
+
+@pytest.fixture
+def archived(client, customer_id):
+    """(archived invoice id, recent invoice id) for client's tenant"""
+    old = add_invoice(client, customer_id, total=10.0, invoice_date=datetime.utcnow() - timedelta(days=1000))
+    recent = add_invoice(client, customer_id, total=20.0)
+    assert archive_invoices(older_than_days=730)['invoices'] >= 1
+    return old, recent
+
+
+def test_archived_invoices_leave_the_hot_list(client, archived):
+    old, recent = archived
+    assert [row['id'] for row in client.get('/api/invoices').get_json()['data']] == [recent]
+    cold = client.get('/api/invoices?archived=1').get_json()
+    assert [row['id'] for row in cold['data']] == [old]
+    assert cold['data'][0]['customer_name'] == 'Acme Garage'
+
+
+def test_detail_and_pdf_fall_back_to_the_archive(client, archived):
+    old, _ = archived
+    detail = client.get(f'/api/invoices/{old}').get_json()
+    assert detail['total'] == 10.0
+    assert [item['product_name'] for item in detail['line_items']] == ['Brake Pads']
+    response = client.get(f'/api/invoices/{old}/pdf')
+    assert response.status_code == 200 and response.mimetype == 'application/pdf'
+
+
+def test_customer_with_archived_invoices_is_kept(client, customer_id, archived):
+    assert client.delete(f'/api/customers/{customer_id}').status_code == 400
+
+
+def test_archived_invoices_stay_private(other_client, archived):
+    old, _ = archived
+    assert other_client.get(f'/api/invoices/{old}').status_code == 404
+
+
+def test_cutoff_must_spare_the_dashboard_year():
+    with pytest.raises(ValueError):
+        archive_invoices(older_than_days=30)
+
+
+def test_archived_invoices_are_deleted_for_sync_clients(client, customer_id):
+    old = add_invoice(client, customer_id, invoice_date=datetime.utcnow() - timedelta(days=1000))
+    add_invoice(client, customer_id)
+    token = client.get('/api/sync').get_json()['next']
+    archive_invoices(older_than_days=730)
+    delta = client.get(f'/api/sync?since={token}').get_json()
+    assert delta['deleted']['invoices'] == [old]
+    assert delta['invoices'] == []
@@ -0,0 +1,149 @@
+"""Online backup and per-tenant export/restore"""
+import gzip
+import io
+import json
+import os
+import subprocess
+import sys
+import time
+
+import pytest
+
+from api import admin
+from models import get_db, shard_engine, SyncTombstone
+from services.backup_service import (
+    backup_database, export_tenant, import_tenant, load_backup_job, restore_database, start_backup_job
+)
+from conftest import add_customer, add_invoice
+
+
+@pytest.fixture
+def transfers(monkeypatch):
+    monkeypatch.setattr(admin, 'TENANT_TRANSFER_ENABLED', True)
+
+
+def _export(user_id):
+    return b''.join(export_tenant(user_id))
+
+
+def _rewrite(data, edit):
+    """Export with edit(table, columns, row) applied to every row"""
+    lines, table, columns = [], None, None
+    for line in gzip.decompress(data).decode().splitlines():
+        item = json.loads(line)
+        if isinstance(item, dict) and 'table' in item:
+            table, columns = item['table'], item['columns']
+        elif isinstance(item, list):
+            item = edit(table, columns, item)
+        lines.append(json.dumps(item))
+    return gzip.compress('\n'.join(lines).encode() + b'\n')
+
+
+def test_routes_are_off_by_default(admin_client, client):
+    assert admin_client.get(f'/api/admin/tenants/{client.user_id}/export').status_code == 404
+    assert admin_client.post(f'/api/admin/tenants/{client.user_id}/restore', data=b'').status_code == 404
+
+
+def test_export_restore_round_trip(admin_client, client, customer_id, transfers):
+    kept = add_invoice(client, customer_id, 50)
+    exported = admin_client.get(f'/api/admin/tenants/{client.user_id}/export')
+    assert exported.status_code == 200
+    data = exported.data  # streamed: read before changing anything
+    dropped = add_invoice(client, customer_id, 75)
+
+    response = admin_client.post(f'/api/admin/tenants/{client.user_id}/restore', data=data)
+    assert response.status_code == 200, response.data
+    assert response.get_json()['rows']['invoices'] == 1
+
+    ids = [row['id'] for row in client.get('/api/invoices').get_json()['data']]
+    assert ids == [kept]
+    db = get_db()
+    try:
+        assert db.query(SyncTombstone).filter_by(user_id=client.user_id, entity='invoice', entity_id=dropped).count() == 1
+    finally:
+        db.close()
+
+
+def test_restore_rejects_line_items_of_foreign_invoices(client, other_client, customer_id):
+    add_invoice(client, customer_id)
+    victim = add_invoice(other_client, add_customer(other_client))
+
+    def retarget(table, columns, row):
+        if table == 'invoice_line_items':
+            row[columns.index('invoice_id')] = victim
+        return row
+
+    crafted = _rewrite(_export(client.user_id), retarget)
+    with pytest.raises(ValueError, match='outside the export'):
+        import_tenant(io.BytesIO(crafted))
+    # Nothing was replaced
+    assert len(client.get('/api/invoices').get_json()['data']) == 1
+    assert len(other_client.get(f'/api/invoices/{victim}').get_json()['line_items']) == 1
+
+
+def test_restore_reports_id_collisions_as_bad_request(admin_client, client, other_client, customer_id, transfers):
+    add_invoice(client, customer_id)
+    foreign = add_invoice(other_client, add_customer(other_client))
+
+    def collide(table, columns, row):
+        if table == 'invoices':
+            row[columns.index('id')] = foreign
+        if table == 'invoice_line_items':
+            row[columns.index('invoice_id')] = foreign
+        return row
+
+    crafted = _rewrite(_export(client.user_id), collide)
+    response = admin_client.post(f'/api/admin/tenants/{client.user_id}/restore', data=crafted)
+    assert response.status_code == 400
+    assert 'collide' in response.get_json()['error']
+    assert other_client.get(f'/api/invoices/{foreign}').status_code == 200
+
+
+def test_full_backup_writes_a_file_per_shard(tmp_path):
+    result = backup_database(str(tmp_path))
+    assert result['files']
+    assert all(os.path.getsize(f['path']) > 0 for f in result['files'])
+
+
+def test_backup_job_runs_in_its_own_process(tmp_path):
+    job = start_backup_job(str(tmp_path))
+    assert job['pid'] != os.getpid()
+    assert start_backup_job(str(tmp_path)) is None
+    deadline = time.monotonic() + 60
+    while load_backup_job(job['id'], str(tmp_path))['status'] == 'running':
+        assert time.monotonic() < deadline
+        time.sleep(0.1)
+    finished = load_backup_job(job['id'], str(tmp_path))
+    assert finished['status'] == 'done', finished
+    assert all(os.path.getsize(f['path']) > 0 for f in finished['files'])
+    while True:  # reaped by start_backup_job's thread once it exits
+        try:
+            os.kill(job['pid'], 0)
+        except ProcessLookupError:
+            break
+        assert time.monotonic() < deadline
+        time.sleep(0.05)
+
+
+def test_running_job_without_a_process_is_failed(tmp_path):
+    (tmp_path / 'jobs').mkdir()
+    (tmp_path / 'jobs' / 'abc123.json').write_text(json.dumps({'id': 'abc123', 'status': 'running'}))
+    assert load_backup_job('abc123', str(tmp_path))['status'] == 'failed'
+    assert json.loads((tmp_path / 'jobs' / 'abc123.json').read_text())['status'] == 'failed'
+
+
+def test_sqlite_restore_refuses_a_running_app(client, customer_id, tmp_path):
+    database = shard_engine('default').url.database
+    backup = backup_database(str(tmp_path))['files'][0]['path']
+    app = subprocess.Popen([sys.executable, '-c', (
+        "import sqlite3, sys; db = sqlite3.connect(sys.argv[1]); db.execute('SELECT 1 FROM users').fetchall()\n"
+        "print('open', flush=True); sys.stdin.read()"
+    ), database], stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True)
+    try:
+        assert app.stdout.readline() == 'open\n'
+        with pytest.raises(RuntimeError, match='stop the app'):
+            restore_database(backup)
+    finally:
+        app.communicate('')
+    restore_database(backup)
+    assert customer_id in [c['id'] for c in client.get('/api/customers').get_json()]
@@ -0,0 +1,38 @@
+"""POST /api/batch"""
+from api.batch import MAX_REQUESTS
+from conftest import add_customer, add_invoice
+
+
+def test_runs_gets_in_order_as_the_signed_in_user(client, customer_id):
+    invoice_id = add_invoice(client, customer_id)
+    response = client.post('/api/batch', json={'requests': [
+        {'id': 'list', 'path': '/api/invoices'},
+        {'id': 'detail', 'path': f'/api/invoices/{invoice_id}'},
+        {'id': 'customers', 'path': '/api/customers'},
+    ]})
+    assert response.status_code == 200
+    results = response.get_json()['responses']
+    assert [r['id'] for r in results] == ['list', 'detail', 'customers']
+    assert all(r['status'] == 200 for r in results)
+    assert results[0]['body']['total'] == 1
+    assert results[1]['body']['id'] == invoice_id
+
+
+def test_failures_stay_in_their_entry(client, other_client, customer_id):
+    foreign = add_invoice(other_client, add_customer(other_client, 'Other Garage'))
+    results = client.post('/api/batch', json={'requests': [
+        {'path': f'/api/invoices/{foreign}'},
+        {'path': '/api/invoices', 'method': 'POST'},
+        {'path': '/health'},
+        {'path': f'/api/invoices/{foreign}/pdf'},
+        {'path': '/api/customers'},
+    ]}).get_json()['responses']
+    assert [r['status'] for r in results] == [404, 405, 400, 400, 200]
+    assert [r['id'] for r in results] == [0, 1, 2, 3, 4]
+
+
+def test_rejects_empty_and_oversized_batches(client):
+    assert client.post('/api/batch', json={'requests': []}).status_code == 400
+    too_many = [{'path': '/api/customers'}] * (MAX_REQUESTS + 1)
+    assert client.post('/api/batch', json={'requests': too_many}).status_code == 400
+
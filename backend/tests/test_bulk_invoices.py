@@ -0,0 +1,62 @@
+"""PATCH /api/invoices/bulk"""
+import pytest
+
+from api import invoices
+from conftest import add_invoice
+
+
+@pytest.fixture
+def invoice_ids(client, customer_id):
+    return [add_invoice(client, customer_id, total) for total in (10, 20, 30)]
+
+
+def test_bulk_update_by_ids_changes_only_what_differs(client, invoice_ids):
+    client.patch('/api/invoices/bulk', json={'ids': invoice_ids[:1], 'status': 'paid'})
+    response = client.patch('/api/invoices/bulk', json={'ids': invoice_ids, 'status': 'paid'})
+    assert response.status_code == 200
+    assert response.get_json()['matched'] == 3
+    assert response.get_json()['updated'] == 2
+    statuses = {row['status'] for row in client.get('/api/invoices').get_json()['data']}
+    assert statuses == {'paid'}
+
+
+def test_bulk_update_by_filter(client, invoice_ids):
+    client.patch('/api/invoices/bulk', json={'ids': invoice_ids[:1], 'status': 'paid'})
+    response = client.patch('/api/invoices/bulk', json={'filter': {'status': 'unpaid'}, 'notes': 'Chased'})
+    assert response.get_json()['updated'] == 2
+
+
+def test_bulk_update_never_touches_other_tenants(client, other_client, invoice_ids):
+    response = other_client.patch('/api/invoices/bulk', json={'ids': invoice_ids, 'status': 'paid'})
+    assert response.get_json()['matched'] == 0
+    assert {row['status'] for row in client.get('/api/invoices').get_json()['data']} == {'unpaid'}
+
+
+@pytest.mark.parametrize('filters', [
+    {'start_date': 5}, {'customer_id': 'abc'}, {'status': ['paid']}, {'end_date': 'not-a-date'}, {'customer_id': True}
+])
+def test_bad_filters_are_bad_requests(client, invoice_ids, filters):
+    response = client.patch('/api/invoices/bulk', json={'filter': filters, 'status': 'paid'})
+    assert response.status_code == 400
+    assert 'Invalid filter' in response.get_json()['error']
+
+
+def test_list_rejects_bad_filters(client):
+    assert client.get('/api/invoices?start_date=yesterday').status_code == 400
+
+
+def test_bulk_event_carries_no_ids(client, invoice_ids, monkeypatch):
+    published = []
+    monkeypatch.setattr(invoices, 'publish', lambda user_id, kind, data: published.append((kind, data)))
+    client.patch('/api/invoices/bulk', json={'ids': invoice_ids, 'status': 'paid'})
+    kind, data = published[0]
+    assert kind == 'invoice.bulk_updated'
+    assert data == {'fields': ['status'], 'count': 3, 'status': 'paid', 'version': data['version']}
+    assert 'ids' not in data
+
+
+def test_cors_preflight_allows_patch(client):
+    response = client.options('/api/invoices/bulk', headers={
+        'Origin': 'http://localhost:5173', 'Access-Control-Request-Method': 'PATCH'
+    })
+    assert 'PATCH' in response.headers.get('Access-Control-Allow-Methods', '')
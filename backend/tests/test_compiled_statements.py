@@ -0,0 +1,48 @@
+"""Prebuilt statements with bound parameters"""
+from datetime import datetime
+
+from prometheus_client import REGISTRY
+
+from api.invoices import list_statements
+from conftest import add_customer, add_invoice
+from models import Invoice
+from services.serializers import INVOICE_LIST
+
+
+def _compiled(result):
+    return REGISTRY.get_sample_value('autoparts_cache_requests_total', {'cache': 'sql_compiled', 'result': result}) or 0
+
+
+def test_statements_are_built_once_per_filter_set():
+    assert list_statements(Invoice, INVOICE_LIST, ('status',)) is list_statements(Invoice, INVOICE_LIST, ('status',))
+    assert list_statements(Invoice, INVOICE_LIST, ('status',)) is not list_statements(Invoice, INVOICE_LIST, ())
+
+
+def test_new_filter_values_reuse_compiled_sql(client, customer_id):
+    invoice_id = add_invoice(client, customer_id)
+    client.get('/api/invoices?status=paid')
+    client.get(f'/api/invoices/{invoice_id}')
+    misses = _compiled('miss')
+    hits = _compiled('hit')
+    for status in ('unpaid', 'paid', 'unpaid'):
+        client.get(f'/api/invoices?status={status}&page=2')
+    client.get(f'/api/invoices/{invoice_id}')
+    assert _compiled('miss') == misses
+    assert _compiled('hit') > hits
+
+
+def test_bound_filters_select_the_right_rows(client, customer_id):
+    other = add_customer(client, 'Bolt Motors')
+    jan = add_invoice(client, customer_id, invoice_date=datetime(2024, 1, 15))
+    feb = add_invoice(client, other, status='paid', invoice_date=datetime(2024, 2, 15))
+
+    def ids(query):
+        return [row['id'] for row in client.get(f'/api/invoices?{query}').get_json()['data']]
+
+    assert ids('') == [feb, jan]
+    assert ids('status=paid') == [feb]
+    assert ids(f'customer_id={customer_id}') == [jan]
+    assert ids('start_date=2024-02-01') == [feb]
+    assert ids('end_date=2024-01-31') == [jan]
+    assert ids('per_page=1&page=2') == [jan]
+    assert client.get('/api/invoices?start_date=yesterday').status_code == 400
@@ -0,0 +1,72 @@
+"""Response compression middleware"""
+import gzip
+import zlib
+
+from werkzeug.test import Client
+from werkzeug.wrappers import Response
+
+from middleware.compression import CompressionMiddleware, negotiate
+
+BODY = b'{"data": "' + b'brake pads ' * 400 + b'"}'
+
+
+def _client(body=BODY, mimetype='application/json', headers=None, stream=False):
+    def app(environ, start_response):
+        response = Response(iter([body[:100], body[100:]]) if stream else body, mimetype=mimetype, headers=headers)
+        return response(environ, start_response)
+    middleware = CompressionMiddleware(app)
+    return Client(middleware), middleware
+
+
+def test_negotiate_honours_q_values():
+    encoders = {'br': None, 'gzip': None}
+    assert negotiate('gzip, br;q=0.5', encoders) == 'gzip'
+    assert negotiate('*', encoders) == 'br'
+    assert negotiate('gzip;q=0, identity', encoders) is None
+    assert negotiate('', encoders) is None
+
+
+def test_gzips_large_json_and_varies_on_encoding():
+    response = _client()[0].get('/', headers={'Accept-Encoding': 'gzip'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert 'Accept-Encoding' in response.headers['Vary']
+    assert int(response.headers['Content-Length']) < len(BODY)
+    assert gzip.decompress(response.data) == BODY
+
+
+def test_leaves_small_binary_and_unrequested_bodies_alone():
+    assert 'Content-Encoding' not in _client(body=b'{}')[0].get('/', headers={'Accept-Encoding': 'gzip'}).headers
+    assert 'Content-Encoding' not in _client(mimetype='image/png')[0].get('/', headers={'Accept-Encoding': 'gzip'}).headers
+    assert _client()[0].get('/').data == BODY
+
+
+def test_streams_without_content_length():
+    response = _client(stream=True)[0].get('/', headers={'Accept-Encoding': 'gzip'})
+    assert 'Content-Length' not in response.headers
+    assert zlib.decompress(response.data, 31) == BODY
+
+
+def test_etag_responses_are_weakened_and_cached():
+    client, middleware = _client(headers={'ETag': '"v1"'})
+    first = client.get('/', headers={'Accept-Encoding': 'gzip'})
+    second = client.get('/', headers={'Accept-Encoding': 'gzip'})
+    assert first.headers['ETag'] == 'W/"v1"'
+    assert first.data == second.data
+    assert list(middleware._cache) == [('/', '', '"v1"', 'gzip')]
+
+
+def test_api_responses_are_compressed(client):
+    for i in range(30):
+        client.post('/api/customers', json={'name': f'Customer {i}', 'address': 'Industrial Estate ' * 3})
+    response = client.get('/api/customers', headers={'Accept-Encoding': 'gzip'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert len(gzip.decompress(response.data)) > len(response.data)
+
+
+def test_app_that_never_starts_a_response_passes_through():
+    def silent(environ, start_response):
+        return iter(())
+    calls = []
+    body = CompressionMiddleware(silent)({'REQUEST_METHOD': 'GET', 'HTTP_ACCEPT_ENCODING': 'gzip'},
+                                         lambda *args: calls.append(args))
+    assert list(body) == [b''] and calls == []
@@ -0,0 +1,49 @@
+"""ETag / Last-Modified conditional GETs"""
+from conftest import add_customer, add_invoice
+
+
+def _revalidate(client, path):
+    first = client.get(path)
+    assert first.status_code == 200 and first.headers['Cache-Control'] == 'private, no-cache'
+    return first.headers['ETag'], client.get(path, headers={'If-None-Match': first.headers['ETag']})
+
+
+def test_invoice_list_revalidates_until_a_write(client, customer_id):
+    add_invoice(client, customer_id)
+    etag, repeat = _revalidate(client, '/api/invoices')
+    assert repeat.status_code == 304 and repeat.data == b''
+    add_invoice(client, customer_id)
+    assert client.get('/api/invoices', headers={'If-None-Match': etag}).status_code == 200
+
+
+def test_query_string_is_part_of_the_list_etag(client, customer_id):
+    etag, _ = _revalidate(client, '/api/invoices')
+    assert client.get('/api/invoices?status=paid', headers={'If-None-Match': etag}).status_code == 200
+
+
+def test_invoice_detail_changes_with_the_invoice(client, customer_id):
+    invoice_id = add_invoice(client, customer_id)
+    etag, repeat = _revalidate(client, f'/api/invoices/{invoice_id}')
+    assert repeat.status_code == 304
+    last_modified = client.get(f'/api/invoices/{invoice_id}').headers['Last-Modified']
+    assert client.get(f'/api/invoices/{invoice_id}', headers={'If-Modified-Since': last_modified}).status_code == 304
+    client.put(f'/api/invoices/{invoice_id}', json={'notes': 'called'})
+    assert client.get(f'/api/invoices/{invoice_id}', headers={'If-None-Match': etag}).status_code == 200
+
+
+def test_customers_and_business(client):
+    add_customer(client)
+    etag, repeat = _revalidate(client, '/api/customers')
+    assert repeat.status_code == 304
+    add_customer(client, 'Bolt Motors')
+    assert client.get('/api/customers', headers={'If-None-Match': etag}).status_code == 200
+
+    etag, repeat = _revalidate(client, '/api/business')
+    assert repeat.status_code == 304
+    client.put('/api/business', json={'company_name': 'Renamed Parts', 'address': '2 Test St'})
+    assert client.get('/api/business', headers={'If-None-Match': etag}).status_code == 200
+
+
+def test_etags_are_per_tenant(client, other_client):
+    etag, _ = _revalidate(client, '/api/invoices')
+    assert other_client.get('/api/invoices', headers={'If-None-Match': etag}).status_code == 200
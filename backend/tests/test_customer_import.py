@@ -0,0 +1,51 @@
+"""Customer CSV import"""
+import io
+
+from conftest import add_customer
+from services.import_service import import_customers, normalize_key
+
+CSV = (
+    'Name,Phone,Email,Notes\n'
+    'Acme  Garage,(555) 010-0000,ACME@example.test,existing\n'
+    'Bolt Motors,555-0101,bolt@example.test,\n'
+    'bolt motors,5550101, Bolt@Example.test ,duplicate in file\n'
+    ',555-0102,,no name\n'
+    'Cog Repairs,,,\n'
+)
+
+
+def _names(client):
+    return sorted(c['name'] for c in client.get('/api/customers').get_json())
+
+
+def test_import_skips_duplicates_and_reports_errors(client):
+    add_customer(client, 'Acme Garage', phone='5550100000', email='acme@example.test')
+    response = client.post('/api/customers/import', data=CSV, content_type='text/csv')
+    assert response.status_code == 200
+    summary = response.get_json()
+    assert (summary['inserted'], summary['skipped'], summary['errored']) == (2, 2, 1)
+    assert summary['errors'] == [{'line': 5, 'error': 'Customer name is required'}]
+    assert _names(client) == ['Acme Garage', 'Bolt Motors', 'Cog Repairs']
+
+
+def test_multipart_upload_and_rerun_is_idempotent(client):
+    for expected in (3, 0):
+        response = client.post('/api/customers/import', content_type='multipart/form-data',
+                               data={'file': (io.BytesIO(CSV.encode()), 'customers.csv')})
+        assert response.get_json()['inserted'] == expected
+
+
+def test_rejects_files_without_a_name_column(client):
+    response = client.post('/api/customers/import', data='phone,email\n555,a@b.c\n', content_type='text/csv')
+    assert response.status_code == 400
+
+
+def test_chunks_commit_independently(client):
+    rows = ''.join(f'Customer {i}\n' for i in range(25))
+    summary = import_customers(io.BytesIO(('name\n' + rows).encode()), client.user_id, chunk_size=10)
+    assert summary['inserted'] == 25
+    assert len(_names(client)) == 25
+
+
+def test_normalize_key_ignores_case_spacing_and_punctuation():
+    assert normalize_key(' Bolt  Motors', '(555) 0101', 'Bolt@X.test ') == normalize_key('bolt motors', '5550101', 'bolt@x.test')
@@ -0,0 +1,43 @@
+"""GET /api/customers keyset pages and ?fields= projection"""
+from conftest import add_customer, add_invoice
+
+
+def test_cursor_pages_cover_every_customer_once(client):
+    ids = [add_customer(client, name) for name in ('Cog', 'Acme', 'Bolt', 'Acme', 'Dyno')]
+    seen, cursor = [], ''
+    while True:
+        page = client.get(f'/api/customers?limit=2&cursor={cursor}').get_json()
+        assert len(page['data']) <= 2
+        seen += [(c['name'], c['id']) for c in page['data']]
+        cursor = page['next_cursor']
+        if not cursor:
+            break
+    assert sorted(i for _, i in seen) == sorted(ids)
+    assert seen == sorted(seen)
+
+
+def test_unpaged_listing_is_a_plain_list(client):
+    add_customer(client, 'Acme')
+    assert [c['name'] for c in client.get('/api/customers').get_json()] == ['Acme']
+
+
+def test_fields_projection(client):
+    used = add_customer(client, 'Acme')
+    add_customer(client, 'Bolt')
+    add_invoice(client, used)
+    rows = client.get('/api/customers?fields=name,has_invoices').get_json()
+    assert rows == [{'id': used, 'name': 'Acme', 'has_invoices': True},
+                    {'id': rows[1]['id'], 'name': 'Bolt', 'has_invoices': False}]
+
+
+def test_rejects_bad_fields_limits_and_cursors(client):
+    assert client.get('/api/customers?fields=name,password').status_code == 400
+    assert client.get('/api/customers?limit=ten').status_code == 400
+    assert client.get('/api/customers?cursor=not-a-cursor').status_code == 400
+
+
+def test_limit_is_clamped(client):
+    add_customer(client, 'Acme')
+    add_customer(client, 'Bolt')
+    page = client.get('/api/customers?limit=0').get_json()
+    assert len(page['data']) == 1 and page['next_cursor']
@@ -0,0 +1,81 @@
+"""Live update events (SSE)"""
+import queue
+import time
+
+from api import events as events_api
+from conftest import add_invoice
+from services.events import broker, publish
+
+
+def _next(subscription):
+    return subscription.get(timeout=5)
+
+
+def test_events_reach_only_the_owners_streams(client, other_client):
+    mine = broker.subscribe(client.user_id)
+    theirs = broker.subscribe(other_client.user_id)
+    try:
+        publish(client.user_id, 'invoice.created', {'id': 1})
+        assert _next(mine) == {'user_id': client.user_id, 'type': 'invoice.created', 'data': {'id': 1}}
+        assert theirs.empty()
+    finally:
+        broker.unsubscribe(client.user_id, mine)
+        broker.unsubscribe(other_client.user_id, theirs)
+
+
+def test_status_change_is_published(client, customer_id):
+    invoice_id = add_invoice(client, customer_id)
+    subscription = broker.subscribe(client.user_id)
+    try:
+        client.put(f'/api/invoices/{invoice_id}', json={'notes': 'called'})
+        client.put(f'/api/invoices/{invoice_id}', json={'status': 'paid'})
+        message = _next(subscription)
+        assert message['type'] == 'invoice.status_changed'
+        assert message['data']['id'] == invoice_id and message['data']['status'] == 'paid'
+        try:
+            extra = subscription.get(timeout=0.2)
+        except queue.Empty:
+            extra = None
+        assert extra is None
+    finally:
+        broker.unsubscribe(client.user_id, subscription)
+
+
+def test_stream_delivers_events(client):
+    response = client.get('/api/events', buffered=False)
+    assert response.mimetype == 'text/event-stream'
+    chunks = iter(response.response)
+    assert next(chunks) == b'retry: 3000\n\n'
+    publish(client.user_id, 'dashboard.overview', {'total_invoices': 3})
+    assert next(chunks) == b'event: dashboard.overview\ndata: {"total_invoices": 3}\n\n'
+    response.close()
+    assert broker.stream_count() == 0
+
+
+def test_streams_are_capped(client, monkeypatch):
+    monkeypatch.setattr(events_api, 'MAX_STREAMS', 0)
+    response = client.get('/api/events')
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == '30'
+
+
+def test_stream_ends_after_its_lifetime_despite_steady_events(client, monkeypatch):
+    monkeypatch.setattr(events_api, 'STREAM_LIFETIME_SECONDS', 0.3)
+    response = client.get('/api/events', buffered=False)
+    chunks = iter(response.response)
+    assert next(chunks) == b'retry: 3000\n\n'
+    start = time.monotonic()
+    delivered = 0
+    for _ in range(50):
+        publish(client.user_id, 'dashboard.overview', {'total_invoices': delivered})
+        try:
+            chunk = next(chunks)
+        except StopIteration:
+            break
+        delivered += chunk.startswith(b'event:')
+        time.sleep(0.05)
+    else:
+        raise AssertionError('stream outlived STREAM_LIFETIME_SECONDS')
+    assert delivered and time.monotonic() - start < 2
+    response.close()
+    assert broker.stream_count() == 0
@@ -0,0 +1,74 @@
+"""gunicorn_config.py concurrency profiles"""
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+from conftest import WORKDIR
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PROBE = """
+import json, runpy
+config = runpy.run_path('gunicorn_config.py')
+print(json.dumps({name: config[name] for name in ('workers', 'worker_class', 'threads', 'keepalive', 'preload_app')}
+                 | {name: config['os'].environ[name] for name in ('DB_POOL_SIZE', 'SSE_MAX_STREAMS', 'CONCURRENCY_LIMITS')}))
+"""
+
+
+def _config(**env):
+    environ = {key: value for key, value in os.environ.items()
+               if key not in ('DB_POOL_SIZE', 'SSE_MAX_STREAMS', 'CONCURRENCY_LIMITS', 'WEB_CONCURRENCY')}
+    environ['PROMETHEUS_MULTIPROC_DIR'] = os.path.join(WORKDIR, 'gunicorn-metrics')
+    environ.update(env)
+    result = subprocess.run([sys.executable, '-c', PROBE], cwd=BACKEND_DIR, env=environ,
+                            capture_output=True, text=True)
+    if result.returncode:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+    return json.loads(result.stdout)
+
+
+def test_sync_profile_is_the_default():
+    config = _config(WEB_CONCURRENCY='3')
+    assert (config['worker_class'], config['workers'], config['threads']) == ('sync', 3, 1)
+    assert config['preload_app'] is True
+    assert config['DB_POOL_SIZE'] == '1'
+    assert config['SSE_MAX_STREAMS'] == '0'
+    assert config['CONCURRENCY_LIMITS'].startswith('pdf=1,')
+
+
+def test_gthread_profile_sizes_pool_and_streams_by_threads():
+    config = _config(GUNICORN_PROFILE='gthread', WEB_CONCURRENCY='2', GUNICORN_THREADS='8')
+    assert (config['worker_class'], config['threads'], config['keepalive']) == ('gthread', 8, 5)
+    assert config['DB_POOL_SIZE'] == '8'
+    assert config['SSE_MAX_STREAMS'] == '4'
+    assert config['CONCURRENCY_LIMITS'].startswith('pdf=8,')
+
+
+def test_derived_worker_count_respects_memory():
+    assert _config(WORKER_MEMORY_MB='100000000')['workers'] == 2
+
+
+def test_unknown_profile_is_rejected():
+    with pytest.raises(RuntimeError, match='Unknown GUNICORN_PROFILE'):
+        _config(GUNICORN_PROFILE='eventlet')
+
+
+def test_threads_need_the_gthread_profile():
+    with pytest.raises(RuntimeError, match='GUNICORN_PROFILE=gthread'):
+        _config(GUNICORN_THREADS='4')
+    assert _config(GUNICORN_THREADS='1')['threads'] == 1
+
+
+def test_only_on_starting_clears_old_metrics(tmp_path):
+    stale = tmp_path / 'counter_4242.db'
+    stale.write_bytes(b'')
+    _config(PROMETHEUS_MULTIPROC_DIR=str(tmp_path))
+    assert stale.exists()
+
+    start = "import os, runpy; open(f'counter_{os.getpid()}.db', 'w').close(); runpy.run_path(%r)['on_starting'](None)"
+    subprocess.run([sys.executable, '-c', start % os.path.join(BACKEND_DIR, 'gunicorn_config.py')],
+                   cwd=tmp_path, env=dict(os.environ, PROMETHEUS_MULTIPROC_DIR=str(tmp_path)), check=True)
+    assert not stale.exists() and len(list(tmp_path.iterdir())) == 1
@@ -0,0 +1,47 @@
+"""benchmarks/loadtest.py report and regression check"""
+import json
+import os
+import socket
+import subprocess
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'benchmarks'))
+
+import loadtest  # noqa: E402
+
+
+def _level(p95_ms, queries=3.0, concurrency=8):
+    return {'concurrency': concurrency, 'endpoints': {'list_invoices': {'p95_ms': p95_ms, 'queries_per_request': queries}}}
+
+
+def test_summarize_counts_errors_and_percentiles():
+    samples = [('list_invoices', 0.010 * n, 200, 3) for n in range(1, 101)] + [('list_invoices', 0.5, 500, 1)]
+    stats = loadtest.summarize(samples, elapsed=10)['endpoints']['list_invoices']
+    assert (stats['count'], stats['errors'], stats['rps']) == (101, 1, 10.1)
+    assert stats['p50_ms'] == 510.0 and stats['p99_ms'] == 1000.0
+    assert stats['queries_per_request'] == round(301 / 101, 2)
+
+
+def test_compare_flags_latency_and_query_regressions():
+    baseline = {'levels': [_level(100)]}
+    assert loadtest.compare({'levels': [_level(120)]}, baseline, tolerance=0.25) == []
+    assert len(loadtest.compare({'levels': [_level(130)]}, baseline, tolerance=0.25)) == 1
+    assert 'queries 3.0 -> 4.0' in loadtest.compare({'levels': [_level(100, queries=4.0)]}, baseline, 0.25)[0]
+    assert loadtest.compare({'levels': [_level(500, concurrency=32)]}, baseline, 0.25) == []
+
+
+def test_end_to_end_report(tmp_path):
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        port = sock.getsockname()[1]
+    output = tmp_path / 'load.json'
+    subprocess.run(
+        [sys.executable, 'benchmarks/loadtest.py', '--users', '1', '--customers-per-user', '5', '--invoices', '50',
+         '--concurrency', '2', '--duration', '1', '--port', str(port), '--output', str(output)],
+        cwd=loadtest.BACKEND_DIR, check=True, capture_output=True, timeout=120
+    )
+    report = json.loads(output.read_text())
+    level, = report['levels']
+    assert level['concurrency'] == 2 and level['requests'] > 0
+    assert all(stats['errors'] == 0 for stats in level['endpoints'].values())
+    assert level['endpoints']['list_invoices']['queries_per_request'] >= 1
@@ -0,0 +1,21 @@
+"""Prometheus endpoint: request histograms and scrape access"""
+from services import metrics
+
+
+def test_request_latency_is_recorded_per_endpoint(client):
+    client.get('/api/invoices')
+    body = client.get('/api/metrics').get_data(as_text=True)
+    assert 'autoparts_request_duration_seconds_count{blueprint="invoices",endpoint="invoices.list_invoices",method="GET"}' in body
+
+
+def test_token_is_required_when_configured(client, monkeypatch):
+    monkeypatch.setattr(metrics, 'METRICS_TOKEN', 's3cret')
+    assert client.get('/api/metrics').status_code == 404
+    assert client.get('/api/metrics', headers={'Authorization': 'Bearer wrong'}).status_code == 404
+    assert client.get('/api/metrics', headers={'Authorization': 'Bearer s3cret'}).status_code == 200
+
+
+def test_production_without_token_serves_nothing(client, monkeypatch):
+    monkeypatch.setattr(metrics, 'METRICS_TOKEN', None)
+    monkeypatch.setenv('FLASK_ENV', 'production')
+    assert client.get('/api/metrics').status_code == 404
@@ -0,0 +1,96 @@
+"""Password hashing pool, cost upgrades and login backpressure"""
+import threading
+
+import pytest
+from werkzeug.security import generate_password_hash
+
+from conftest import PASSWORD, create_user
+from models import get_db, User
+from services import passwords
+from services.passwords import PasswordHashingBusy, needs_rehash, normalize_method
+
+
+def _stored_hash(user_id):
+    db = get_db()
+    try:
+        return db.get(User, user_id).password_hash
+    finally:
+        db.close()
+
+
+def _set_hash(user_id, password_hash):
+    db = get_db()
+    try:
+        db.get(User, user_id).password_hash = password_hash
+        db.commit()
+    finally:
+        db.close()
+
+
+def _email(user_id):
+    db = get_db()
+    try:
+        return db.get(User, user_id).email
+    finally:
+        db.close()
+
+
+def test_method_defaults_are_filled_in():
+    assert normalize_method('scrypt') == 'scrypt:32768:8:1'
+    assert normalize_method('scrypt:16384') == 'scrypt:16384:8:1'
+    assert normalize_method('pbkdf2:sha256:1000') == 'pbkdf2:sha256:1000'
+    with pytest.raises(ValueError):
+        normalize_method('md5')
+
+
+def test_verify_reports_outdated_hashes():
+    current = passwords.hash_password('hunter2hunter2')
+    assert not needs_rehash(current)
+    assert passwords.verify_password(current, 'hunter2hunter2') == (True, None)
+    old = generate_password_hash('hunter2hunter2', 'pbkdf2:sha256:2000')
+    matches, new_hash = passwords.verify_password(old, 'hunter2hunter2')
+    assert matches and new_hash.startswith(passwords.HASH_METHOD + '$')
+    assert passwords.verify_password(old, 'wrong') == (False, None)
+
+
+def test_login_upgrades_an_outdated_hash(app):
+    user_id = create_user()
+    old = generate_password_hash(PASSWORD, 'pbkdf2:sha256:2000')
+    _set_hash(user_id, old)
+    client = app.test_client()
+    assert client.post('/api/auth/login', json={'email': _email(user_id), 'password': 'wrong-password'}).status_code == 401
+    assert _stored_hash(user_id) == old
+    assert client.post('/api/auth/login', json={'email': _email(user_id), 'password': PASSWORD}).status_code == 200
+    assert _stored_hash(user_id).startswith(passwords.HASH_METHOD + '$')
+
+
+def test_saturated_pool_rejects_instead_of_queueing(monkeypatch):
+    monkeypatch.setattr(passwords, 'HASH_THREADS', 1)
+    monkeypatch.setattr(passwords, 'HASH_QUEUE', 0)
+    pool = passwords._Pool()
+    running, release = threading.Event(), threading.Event()
+
+    def slow_hash():
+        running.set()
+        release.wait()
+    blocker = threading.Thread(target=pool.run, args=(slow_hash,))
+    blocker.start()
+    try:
+        assert running.wait(5)
+        with pytest.raises(PasswordHashingBusy):
+            pool.run(lambda: None)
+    finally:
+        release.set()
+        blocker.join()
+    assert pool.run(lambda: 'free again') == 'free again'
+
+
+def test_busy_login_answers_503(app, monkeypatch):
+    user_id = create_user()
+
+    def busy(*args):
+        raise PasswordHashingBusy()
+    monkeypatch.setattr(passwords._pool, 'run', busy)
+    response = app.test_client().post('/api/auth/login', json={'email': _email(user_id), 'password': PASSWORD})
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == '1'
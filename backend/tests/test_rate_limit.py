@@ -0,0 +1,67 @@
+"""Token buckets and concurrency caps"""
+import subprocess
+import sys
+
+import pytest
+
+from conftest import add_invoice
+from services import rate_limit
+from services.rate_limit import SQLiteStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    return SQLiteStore(str(tmp_path / 'ratelimit.db'))
+
+
+def test_bucket_allows_burst_then_reports_wait(store):
+    assert [store.take('user:1', 1.0, 3) for _ in range(3)] == [0, 0, 0]
+    wait = store.take('user:1', 1.0, 3)
+    assert 0 < wait <= 1
+    assert store.take('user:2', 1.0, 3) == 0
+
+
+def test_slots_are_capped_and_released(store):
+    first, second = store.acquire('pdf', 2), store.acquire('pdf', 2)
+    assert first and second
+    assert store.acquire('pdf', 2) is None
+    store.release(first)
+    assert store.acquire('pdf', 2) is not None
+
+
+def test_slots_of_dead_workers_are_reclaimed(store):
+    dead = subprocess.Popen([sys.executable, '-c', 'pass'])
+    dead.wait()
+    store._conn().execute("INSERT INTO slots (name, pid, started) VALUES ('pdf', ?, 0)", (dead.pid,))
+    assert store.acquire('pdf', 1) is not None
+
+
+def test_bucket_overrides_parse():
+    assert rate_limit._parse_bucket('2/5') == (2.0, 5)
+    assert rate_limit._parse_bucket('0.5') == (0.5, 1)
+    assert rate_limit._parse_overrides('pdf=1/2, login=3', rate_limit._parse_bucket) == {
+        'pdf': (1.0, 2), 'login': (3.0, 3)
+    }
+
+
+def test_pdf_bucket_answers_429(client, customer_id, monkeypatch):
+    invoice_id = add_invoice(client, customer_id)
+    monkeypatch.setitem(rate_limit.BUCKETS, 'pdf', (0.01, 1))
+    assert client.get(f'/api/invoices/{invoice_id}/pdf').status_code == 200
+    response = client.get(f'/api/invoices/{invoice_id}/pdf')
+    assert response.status_code == 429
+    assert int(response.headers['Retry-After']) >= 1
+    assert client.get('/api/invoices').status_code == 200
+
+
+def test_full_concurrency_class_answers_429(client, monkeypatch):
+    monkeypatch.setitem(rate_limit.CONCURRENCY, 'bulk', 0)
+    response = client.patch('/api/invoices/bulk', json={'ids': [1], 'set': {'status': 'paid'}})
+    assert response.status_code == 429
+    assert response.get_json()['error'] == 'Server busy, please retry shortly'
+
+
+def test_health_is_exempt(app, monkeypatch):
+    monkeypatch.setitem(rate_limit.BUCKETS, 'ip', (0.001, 1))
+    client = app.test_client()
+    assert all(client.get('/api/health').status_code == 200 for _ in range(3))
@@ -0,0 +1,23 @@
+"""Bulk data generator"""
+from sqlalchemy import select
+
+from models import get_db, Invoice
+from seed import generate_bulk_data
+
+
+def test_reruns_continue_invoice_numbers():
+    first = generate_bulk_data(users=2, customers_per_user=3, invoices=40, years=1, chunk_size=15)
+    second = generate_bulk_data(users=2, customers_per_user=3, invoices=40, years=1, chunk_size=15)
+    assert first['invoices'] == second['invoices'] == 40
+    db = get_db()
+    try:
+        numbers = db.execute(select(Invoice.invoice_number).where(Invoice.invoice_number.like('________-%'))).scalars().all()
+        assert len(numbers) == len(set(numbers)) >= 80
+    finally:
+        db.close()
+
+
+def test_same_seed_same_shape():
+    a = generate_bulk_data(users=1, customers_per_user=2, invoices=10, years=1, seed=7)
+    b = generate_bulk_data(users=1, customers_per_user=2, invoices=10, years=1, seed=7)
+    assert a['line_items'] == b['line_items']
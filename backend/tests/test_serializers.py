@@ -0,0 +1,40 @@
+"""Shared response schemas (services/serializers.py)"""
+import json
+from datetime import date, datetime
+
+from conftest import add_invoice
+from services.serializers import CUSTOMER, INVOICE_LIST, dumps, json_response
+
+
+def test_dumps_encodes_dates_compactly():
+    payload = {'at': datetime(2024, 5, 1, 12, 30), 'on': date(2024, 5, 1), 'n': [1, 2.5, None]}
+    assert json.loads(dumps(payload)) == {'at': '2024-05-01T12:30:00', 'on': '2024-05-01', 'n': [1, 2.5, None]}
+    assert b' ' not in dumps({'a': [1, 2]})
+
+
+def test_schema_maps_rows_in_column_order():
+    assert CUSTOMER.row((1, 'Acme', 'Main St', '555', 'a@b.c')) == {
+        'id': 1, 'name': 'Acme', 'address': 'Main St', 'phone': '555', 'email': 'a@b.c'
+    }
+    assert INVOICE_LIST.names[-1] == 'customer_name'
+    response = json_response({'ok': True}, 201)
+    assert response.status_code == 201 and response.mimetype == 'application/json'
+
+
+def test_endpoints_return_schema_shapes(client, customer_id):
+    invoice_id = add_invoice(client, customer_id, total=42.5)
+
+    listing = client.get('/api/invoices').get_json()
+    assert listing['total'] == 1
+    assert set(listing['data'][0]) == set(INVOICE_LIST.names)
+    assert listing['data'][0]['customer_name'] == 'Acme Garage'
+
+    detail = client.get(f'/api/invoices/{invoice_id}').get_json()
+    assert detail['total'] == 42.5
+    assert set(detail['customer']) == set(CUSTOMER.names)
+    assert [item['product_name'] for item in detail['line_items']] == ['Brake Pads']
+
+    assert client.get('/api/auth/user').get_json()['id'] == client.user_id
+    assert set(client.get('/api/auth/check').get_json()['user']) == {'id', 'email', 'name'}
+    business = client.get('/api/business').get_json()
+    assert business['company_name'] == 'Test Parts'
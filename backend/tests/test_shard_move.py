@@ -0,0 +1,109 @@
+"""Tenant shard moves"""
+import time
+
+import pytest
+from sqlalchemy import insert, select
+
+import models
+from conftest import WORKDIR, add_customer, add_invoice
+from models import engine, shard_engine, tenant_shard, Invoice, TenantShard
+from services import shard_service
+
+
+@pytest.fixture
+def east(monkeypatch):
+    """A second shard, with short shard map TTLs and sleeps recorded instead of slept"""
+    monkeypatch.setitem(models.SHARD_URLS, 'east', f"sqlite:///{WORKDIR}/east.db")
+    monkeypatch.setattr(models, 'SHARD_MAP_TTL', 0.05)
+    monkeypatch.setattr(shard_service, 'SHARD_MAP_TTL', 0.05)
+    models.init_db()
+    return 'east'
+
+
+def _invoice_ids(shard, user_id):
+    with shard_engine(shard).connect() as conn:
+        return set(conn.execute(select(Invoice.id).where(Invoice.user_id == user_id)).scalars())
+
+
+def test_move_keeps_source_until_workers_expire_the_map(client, customer_id, east, monkeypatch):
+    invoice_id = add_invoice(client, customer_id)
+    sleeps = []
+
+    def sleep(seconds):
+        # Second wait: the directory already points at the target, the source copy must still be there
+        if sleeps:
+            assert tenant_shard(client.user_id) == (east, 'active')
+            assert _invoice_ids('default', client.user_id) == {invoice_id}
+        sleeps.append(seconds)
+
+    monkeypatch.setattr(shard_service.time, 'sleep', sleep)
+    stats = shard_service.move_tenant(client.user_id, east, grace=0)
+
+    assert stats['source'] == 'default' and stats['rows']['invoices'] == 1
+    assert sleeps == [0.05, 0.05]
+    assert _invoice_ids('default', client.user_id) == set()
+    assert _invoice_ids(east, client.user_id) == {invoice_id}
+    response = client.get('/api/invoices')
+    assert [row['id'] for row in response.get_json()['data']] == [invoice_id]
+
+
+def test_cached_entry_expires_without_version_bump(client, east):
+    assert tenant_shard(client.user_id) == ('default', 'active')
+    with engine.begin() as conn:
+        conn.execute(insert(TenantShard).values(user_id=client.user_id, shard='default', status='moving'))
+    assert tenant_shard(client.user_id) == ('default', 'active')
+    time.sleep(0.06)
+    assert tenant_shard(client.user_id) == ('default', 'moving')
+
+
+def test_move_to_current_shard_is_refused(client, east):
+    with pytest.raises(ValueError):
+        shard_service.move_tenant(client.user_id, 'default', grace=0)
+
+
+def test_round_trip_keeps_each_shard_in_its_own_id_range(client, other_client, east, monkeypatch):
+    monkeypatch.setattr(shard_service.time, 'sleep', lambda seconds: None)
+    span, east_start = models.SHARD_ID_SPAN, models.shard_offset(east)
+    shard_service.move_tenant(client.user_id, east, grace=0)
+    made_on_east = add_customer(client, 'Made on east')
+    assert east_start <= made_on_east < east_start + span
+    # Brings an id from east's range back to the default shard
+    shard_service.move_tenant(client.user_id, 'default', grace=0)
+
+    assert add_customer(client, 'Back home') < span
+    other = add_customer(other_client, 'Other tenant')
+    assert other < span
+    shard_service.move_tenant(other_client.user_id, east, grace=0)
+    assert [row['id'] for row in other_client.get('/api/customers').get_json()] == [other]
+    assert east_start <= add_customer(other_client, 'Made on east') < east_start + span
+
+
+def test_shard_offsets_survive_reordered_shard_urls(east, monkeypatch):
+    east_start = models.shard_offset(east)
+    assert models.shard_offset('default') == 0 and east_start > 0
+    monkeypatch.setattr(models, '_shard_offsets', {})
+    monkeypatch.setattr(models, 'SHARD_URLS', {'west': f"sqlite:///{WORKDIR}/west.db", **models.SHARD_URLS})
+    assert models.shard_offset(east) == east_start
+    assert models.shard_offset('west') not in (0, east_start)
+
+
+def test_failed_cleanup_is_logged_and_release_reenables_writes(client, east, monkeypatch, caplog):
+    monkeypatch.setattr(shard_service.time, 'sleep', lambda seconds: None)
+    set_directory = shard_service._set_directory
+
+    def catch_up(*args):
+        # The directory is down as well: the tenant can't be put back to 'active'
+        monkeypatch.setattr(shard_service, '_set_directory', lambda *args: 1 / 0)
+        raise RuntimeError('target went away')
+
+    monkeypatch.setattr(shard_service, '_catch_up', catch_up)
+    with pytest.raises(RuntimeError):
+        shard_service.move_tenant(client.user_id, east, grace=0)
+    assert 'stuck' in caplog.text
+    assert tenant_shard(client.user_id) == ('default', 'moving')
+
+    monkeypatch.setattr(shard_service, '_set_directory', set_directory)
+    assert shard_service.release_tenant(client.user_id) == 'default'
+    assert tenant_shard(client.user_id) == ('default', 'active')
+    with pytest.raises(ValueError):
+        shard_service.release_tenant(client.user_id)
@@ -0,0 +1,101 @@
+"""Cross-worker result cache"""
+import os
+import pickle
+import sqlite3
+import time
+
+import pytest
+
+from services import shared_cache
+from services.shared_cache import SharedCache, cached, _MISS
+
+
+@pytest.fixture
+def store(tmp_path):
+    directory = tmp_path / 'cache'
+    return SharedCache(str(directory / 'cache.db'), max_bytes=64 * 1024)
+
+
+def test_values_round_trip_as_json(store):
+    store.set('k', {'total': 1.5, 'rows': [1, 2]}, ttl=60)
+    assert store.get('k') == {'total': 1.5, 'rows': [1, 2]}
+    assert store.get('missing') is _MISS
+
+
+def test_stored_blobs_are_never_unpickled(store):
+    class Boom:
+        def __reduce__(self):
+            return (os.system, ('false',))
+
+    store.set('k', 1, ttl=60)
+    store._conn().execute('UPDATE entries SET value = ? WHERE key = ?', (pickle.dumps(Boom()), 'k'))
+    with pytest.raises(ValueError):
+        store.get('k')
+
+
+def test_expired_entries_miss(store):
+    store.set('k', 1, ttl=-1)
+    assert store.get('k') is _MISS
+
+
+def test_eviction_keeps_store_under_max_bytes(store):
+    for i in range(200):
+        store.set(f'k{i}', 'x' * 1000, ttl=60)
+    store.evict()
+    total = store._conn().execute('SELECT SUM(size) FROM entries').fetchone()[0]
+    assert total <= store.max_bytes
+    assert store.get('k199') == 'x' * 1000
+
+
+def test_refuses_directory_open_to_others(tmp_path):
+    directory = tmp_path / 'shared'
+    directory.mkdir(mode=0o777)
+    os.chmod(directory, 0o777)
+    with pytest.raises(sqlite3.OperationalError):
+        SharedCache(str(directory / 'cache.db'), max_bytes=1024).get('k')
+
+
+def test_decorator_hits_after_first_call_and_fails_open(store, monkeypatch):
+    monkeypatch.setattr(shared_cache, 'store', store)
+    monkeypatch.setattr(shared_cache, 'ENABLED', True)
+    calls = []
+
+    @cached('test', ttl=60, key=lambda user_id, version: (user_id, version))
+    def compute(user_id, version):
+        calls.append(version)
+        return {'version': version, 'at': time.time()}
+
+    first = compute(1, 1)
+    assert compute(1, 1) == first
+    compute(1, 2)
+    assert calls == [1, 2]
+
+    def broken(key):
+        raise sqlite3.OperationalError('unavailable')
+
+    monkeypatch.setattr(store, 'get', broken)
+    assert compute(1, 3)['version'] == 3
+
+
+def test_decorator_treats_corrupt_entries_as_unavailable(store, monkeypatch):
+    monkeypatch.setattr(shared_cache, 'store', store)
+    monkeypatch.setattr(shared_cache, 'ENABLED', True)
+
+    @cached('test', ttl=60)
+    def compute(x):
+        return x * 2
+
+    compute(2)
+    store._conn().execute("UPDATE entries SET value = x'80'")
+    assert compute(2) == 4
+
+
+def test_business_context_survives_the_cache(client, store, monkeypatch):
+    from services.tenant_context import _load
+    monkeypatch.setattr(shared_cache, 'store', store)
+    monkeypatch.setattr(shared_cache, 'ENABLED', True)
+    computed = _load(client.user_id, 42).business
+    hit = _load(client.user_id, 42).business
+    assert store.get(f"business:{((client.user_id, 42), [])!r}") is not _MISS
+    assert hit.company_name == 'Test Parts'
+    assert hit.updated_at == computed.updated_at and hit.updated_at is not None
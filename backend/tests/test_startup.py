@@ -0,0 +1,41 @@
+"""Worker cold start: one-time schema setup, lazy ReportLab, fork-safe pools"""
+import os
+import subprocess
+import sys
+
+from sqlalchemy import text
+
+import models
+from conftest import WORKDIR
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_ensure_db_creates_schema_once(app, monkeypatch):
+    calls = []
+    monkeypatch.setattr(models, 'init_db', lambda: calls.append(1))
+    models.ensure_db()
+    assert calls == []
+    assert app.test_client().get('/api/db-status').get_json()['tables_created'] is True
+
+
+def _imports_reportlab(**env):
+    probe = "import sys, app; print('reportlab' in sys.modules)"
+    result = subprocess.run(
+        [sys.executable, '-c', probe], cwd=BACKEND_DIR, capture_output=True, text=True, check=True,
+        env=dict(os.environ, DATABASE_URL=f"sqlite:///{WORKDIR}/startup.db", **env)
+    )
+    return result.stdout.strip().splitlines()[-1] == 'True'
+
+
+def test_reportlab_loads_on_demand():
+    assert not _imports_reportlab()
+    assert _imports_reportlab(PDF_PREWARM='1')
+
+
+def test_engine_usable_after_dispose():
+    with models.engine.connect() as conn:
+        conn.execute(text('SELECT 1'))
+    models.dispose_engine()
+    with models.engine.connect() as conn:
+        assert conn.execute(text('SELECT 1')).scalar() == 1
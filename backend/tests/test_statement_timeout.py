@@ -0,0 +1,44 @@
+"""Per-request statement budgets"""
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+from models import get_db, is_statement_timeout, reset_statement_timeout, set_statement_timeout, _statement_timeout_ms
+
+SLOW_QUERY = text(
+    "WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < 50000000) SELECT count(*) FROM n"
+)
+
+
+def test_budget_ends_with_the_request(client):
+    assert client.get('/api/invoices').status_code == 200
+    assert _statement_timeout_ms.get() == 0
+
+
+def test_slow_statement_is_interrupted():
+    token = set_statement_timeout(50)
+    db = get_db()
+    try:
+        with pytest.raises(OperationalError) as caught:
+            db.execute(SLOW_QUERY)
+        assert is_statement_timeout(caught.value)
+    finally:
+        db.close()
+        reset_statement_timeout(token)
+
+
+def test_connection_returns_to_pool_without_deadline():
+    token = set_statement_timeout(50)
+    db = get_db()
+    try:
+        db.execute(text('SELECT 1'))
+    finally:
+        db.close()
+        reset_statement_timeout(token)
+    db = get_db()
+    try:
+        assert db.execute(text(
+            "WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < 200000) SELECT count(*) FROM n"
+        )).scalar() == 200000
+    finally:
+        db.close()
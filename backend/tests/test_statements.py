@@ -0,0 +1,63 @@
+"""Customer monthly statement PDFs"""
+from datetime import date, datetime
+
+import pytest
+
+from conftest import add_invoice
+from models import tenant_session
+from services.pdf_service import STATEMENT_CHUNK_ROWS, statement_period, statement_query
+
+
+def test_statement_period():
+    assert statement_period('2024-12') == (datetime(2024, 12, 1), datetime(2025, 1, 1))
+    start, end = statement_period()
+    assert start.day == end.day == 1 and end <= datetime.utcnow()
+    with pytest.raises(ValueError):
+        statement_period('12/2024')
+
+
+def test_totals_running_balance_and_aging(client, customer_id):
+    add_invoice(client, customer_id, total=100.0, invoice_date=datetime(2024, 1, 10))
+    add_invoice(client, customer_id, total=50.0, status='paid', invoice_date=datetime(2024, 2, 5))
+    add_invoice(client, customer_id, total=30.0, invoice_date=datetime(2024, 2, 20))
+    add_invoice(client, customer_id, total=999.0, invoice_date=datetime(2024, 3, 2))
+    start, end = statement_period('2024-02')
+    db = tenant_session(client.user_id)
+    try:
+        rows = db.execute(statement_query(client.user_id, customer_id, start, end, date(2024, 3, 1))).mappings().all()
+    finally:
+        db.close()
+    assert [row['total'] for row in rows] == [50.0, 30.0]
+    assert [row['running_outstanding'] for row in rows] == [0, 30.0]
+    totals = rows[0]
+    assert (totals['opening_balance'], totals['period_total'], totals['period_outstanding']) == (100.0, 80.0, 30.0)
+    # Jan 10 is 51 days before Mar 1, Feb 20 is 10
+    assert (totals['aging_0'], totals['aging_1'], totals['aging_2'], totals['aging_3']) == (30.0, 100.0, 0, 0)
+
+
+def test_empty_period_still_has_totals(client, customer_id):
+    db = tenant_session(client.user_id)
+    try:
+        rows = db.execute(statement_query(client.user_id, customer_id, *statement_period('2024-02'),
+                                          date(2024, 3, 1))).mappings().all()
+    finally:
+        db.close()
+    assert len(rows) == 1 and rows[0]['id'] is None and rows[0]['opening_balance'] == 0
+
+
+def test_statement_download(client, customer_id):
+    for day in range(1, STATEMENT_CHUNK_ROWS + 6):
+        add_invoice(client, customer_id, total=10.0, invoice_date=datetime(2024, 2, 1 + day % 28))
+    response = client.get(f'/api/customers/{customer_id}/statement?month=2024-02')
+    assert response.status_code == 200 and response.mimetype == 'application/pdf'
+    assert response.data.startswith(b'%PDF')
+    assert f'Statement_{customer_id}_2024-02.pdf' in response.headers['Content-Disposition']
+    repeat = client.get(f'/api/customers/{customer_id}/statement?month=2024-02',
+                        headers={'If-None-Match': response.headers['ETag']})
+    assert repeat.status_code == 304
+
+
+def test_statement_errors(client, other_client, customer_id):
+    assert client.get(f'/api/customers/{customer_id}/statement?month=Feb').status_code == 400
+    assert other_client.get(f'/api/customers/{customer_id}/statement?month=2024-02').status_code == 404
+    assert client.get('/api/customers/999999999/statement').status_code == 404
@@ -0,0 +1,48 @@
+"""GET /api/sync delta sync"""
+from conftest import add_customer, add_invoice
+
+
+def test_full_then_delta_with_tombstones(client, customer_id):
+    invoice_id = add_invoice(client, customer_id)
+    full = client.get('/api/sync').get_json()
+    assert full['full'] is True
+    assert [c['id'] for c in full['customers']] == [customer_id]
+    assert [i['id'] for i in full['invoices']] == [invoice_id]
+
+    token = full['next']
+    assert client.get(f'/api/sync?since={token}').get_json()['customers'] == []
+
+    spare = add_customer(client, 'Spare Co')
+    client.put(f'/api/customers/{customer_id}', json={'name': 'Renamed'})
+    client.delete(f'/api/customers/{spare}')
+    delta = client.get(f'/api/sync?since={token}').get_json()
+    assert delta['full'] is False
+    assert [c['name'] for c in delta['customers']] == ['Renamed']
+    assert delta['deleted']['customers'] == [spare]
+    assert delta['invoices'] == []
+
+
+def test_pages_resume_without_skipping(client):
+    ids = {add_customer(client, f'Customer {i}') for i in range(5)}
+    seen, token = set(), ''
+    while True:
+        page = client.get(f'/api/sync?since={token}&limit=2').get_json()
+        seen |= {c['id'] for c in page['customers']}
+        token = page['next']
+        if not page['has_more']:
+            break
+    assert seen == ids
+
+
+def test_other_tenants_changes_are_invisible(client, other_client, customer_id):
+    assert other_client.get('/api/sync').get_json()['customers'] == []
+
+
+def test_bad_parameters_are_bad_requests(client, customer_id):
+    assert client.get('/api/sync?limit=abc').status_code == 400
+    assert client.get('/api/sync?since=garbage').status_code == 400
+    # Out-of-range limits are clamped
+    response = client.get('/api/sync?limit=-5')
+    assert response.status_code == 200
+    assert len(response.get_json()['customers']) == 1
+    assert client.get('/api/sync?limit=0').status_code == 200
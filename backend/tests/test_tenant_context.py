@@ -0,0 +1,68 @@
+"""Per-tenant context cache"""
+import os
+import time
+
+from sqlalchemy import update
+
+from conftest import create_user
+from models import tenant_session, BusinessInfo
+from services import tenant_context
+from services.tenant_context import get_context, invalidate
+
+
+def _rename_behind_the_cache(user_id, name):
+    db = tenant_session(user_id)
+    try:
+        db.execute(update(BusinessInfo).where(BusinessInfo.user_id == user_id).values(company_name=name))
+        db.commit()
+    finally:
+        db.close()
+
+
+def test_snapshot_is_reused_until_invalidated(client):
+    context = get_context(client.user_id)
+    assert context.business.company_name == 'Test Parts'
+    assert context.tax_rate == tenant_context.DEFAULT_TAX_RATE
+    assert get_context(client.user_id) is context
+
+    _rename_behind_the_cache(client.user_id, 'Renamed Parts')
+    assert get_context(client.user_id).business.company_name == 'Test Parts'
+    invalidate(client.user_id)
+    assert get_context(client.user_id).business.company_name == 'Renamed Parts'
+
+
+def test_another_workers_invalidation_is_seen(client):
+    get_context(client.user_id)
+    _rename_behind_the_cache(client.user_id, 'Other Worker Parts')
+    # What invalidate() in another process leaves behind: a newer version file
+    path = os.path.join(tenant_context.CONTEXT_DIR, str(client.user_id))
+    os.makedirs(tenant_context.CONTEXT_DIR, exist_ok=True)
+    with open(path, 'a'):
+        pass
+    os.utime(path, ns=(time.time_ns(), time.time_ns() + 10 ** 9))
+    assert get_context(client.user_id).business.company_name == 'Other Worker Parts'
+
+
+def test_api_update_is_visible_immediately(client):
+    assert client.get('/api/business').get_json()['company_name'] == 'Test Parts'
+    client.put('/api/business', json={'company_name': 'New Name', 'address': '2 Test St'})
+    assert client.get('/api/business').get_json()['company_name'] == 'New Name'
+    assert get_context(client.user_id).business.updated_at is not None
+
+
+def test_ttl_bounds_staleness(client, monkeypatch):
+    context = get_context(client.user_id)
+    monkeypatch.setattr(tenant_context, 'TTL', 0)
+    assert get_context(client.user_id) is not context
+
+
+def test_tenant_without_business_info(app):
+    user_id = create_user()
+    db = tenant_session(user_id)
+    try:
+        db.query(BusinessInfo).filter_by(user_id=user_id).delete()
+        db.commit()
+    finally:
+        db.close()
+    invalidate(user_id)
+    assert get_context(user_id).business is None
@@ -1,29 +1,21 @@
 #!/bin/bash
-# Automatic database backup script for Railway PostgreSQL
-
-# Set your Railway DATABASE_URL (get from Railway dashboard)
-DATABASE_URL="your_database_url_here"
+# Automatic database backup script (SQLite and PostgreSQL)
+# Runs the backend's online backup: SQLite is copied page by page without
+# blocking writers, PostgreSQL is dumped with pg_dump (custom format).
+# Uses the same DATABASE_URL / SHARD_URLS as the app.
 
 # Backup directory
 BACKUP_DIR="$HOME/autoparts_backups"
 mkdir -p "$BACKUP_DIR"
 
-# Create backup with timestamp
-TIMESTAMP=$(date +"%Y%m%d_%H%M%S")
-BACKUP_FILE="$BACKUP_DIR/autoparts_backup_$TIMESTAMP.sql"
+cd "$(dirname "$0")/backend" || exit 1
 
 echo "Starting backup at $(date)"
-pg_dump "$DATABASE_URL" > "$BACKUP_FILE"
-
-if [ $? -eq 0 ]; then
-    echo "✅ Backup successful: $BACKUP_FILE"
-    
-    # Compress backup
-    gzip "$BACKUP_FILE"
-    echo "✅ Compressed: $BACKUP_FILE.gz"
+if python -m services.backup_service backup --dest "$BACKUP_DIR"; then
+    echo "✅ Backup successful: $BACKUP_DIR"
     
     # Delete backups older than 30 days
-    find "$BACKUP_DIR" -name "*.sql.gz" -mtime +30 -delete
+    find "$BACKUP_DIR" -mindepth 1 -maxdepth 1 -type d -name "20*" -mtime +30 -exec rm -rf {} +
     echo "✅ Cleaned old backups"
 else
     echo "❌ Backup failed!"
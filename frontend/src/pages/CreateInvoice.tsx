@@ -25,7 +25,7 @@ export default function CreateInvoice() {
 
   const loadCustomers = async () => {
     try {
-      const data = await customersAPI.list();
+      const data = await customersAPI.list({ fields: 'id,name' });
       setCustomers(data);
     } catch (err: any) {
       setToast({ message: err.message || 'Failed to load customers', type: 'error' });
@@ -67,7 +67,10 @@ export const businessAPI = {
 
 // Customers API
 export const customersAPI = {
-  list: () => fetchAPI<any[]>('/customers'),
+  list: (params?: Record<string, any>) => {
+    const query = params ? '?' + new URLSearchParams(params).toString() : '';
+    return fetchAPI<any[]>(`/customers${query}`);
+  },
 
   create: (data: any) =>
     fetchAPI<any>('/customers', {